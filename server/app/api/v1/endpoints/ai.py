@@ -1,17 +1,40 @@
 # app/api/v1/endpoints/ai.py
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Query, Header
+from fastapi.responses import StreamingResponse
 from app.models.schemas import (
     HealthSummaryRequest, HealthSummaryResponse,
-    PredictionRequest, PredictionResponse, UserRole
+    PredictionRequest, PredictionResponse, UserRole,
+    RiskJobCreate, RiskJobResponse, RiskJobStatus
 )
-from app.core.security import get_current_active_user
+from app.core.config import settings
+from app.core.security import get_current_active_user, require_role
 from app.core.database import get_database
+from app.services.ai_cache import ai_cache
 from app.services.ai_service import ai_service
+from app.services.health_summary import health_summary_service, SUMMARY_PROJECTION
+from app.services.prompt_builder import RECORD_PROJECTION
+from app.services.llm_client import LLMError
+from app.services.authorization import authorization_service
+from app.services.patient_panel import patient_panel_service
+from app.services.risk_engine import risk_engine
+from app.services.risk_jobs import risk_job_service
 from bson import ObjectId
-from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter()
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+EMPTY_SUMMARY = HealthSummaryResponse(
+    summary="No medical records available for analysis.",
+    key_conditions=[],
+    medications=[],
+    recommendations=["Upload medical records to get personalized health insights"],
+    risk_factors=[]
+)
+
 # ============================================================================
 # AUTHORIZATION HELPER
 # ============================================================================
@@ -20,44 +43,67 @@ async def verify_patient_access(patient_id: str, current_user: dict, db):
     """
     Verify that the current user has access to the patient's data.
     - Patients can access their own data
-    - Doctors can access data of patients they have appointments with
+    - Doctors can access data of patients they have appointments with,
+      or the records covered by an active consent
     - Admins can access all data
+    Returns the medical_records filter limiting which records may be used.
     """
     current_user_id = str(current_user["_id"])
     
     # If accessing own data
     if current_user_id == patient_id:
-        return True
+        return {}
     
     # If admin, allow access
     if current_user.get("role") == UserRole.ADMIN.value:
-        return True
+        return {}
     
-    # If doctor, check if they have appointments with this patient
+    # If doctor, check for an appointment or active consent with this patient
     if current_user.get("role") == UserRole.DOCTOR.value:
-        appointment = await db.appointments.find_one({
-            "doctor_id": current_user_id,
-            "patient_id": patient_id
-        })
-        
-        if appointment:
-            return True
-        
-        # Also check for active consent (backward compatibility)
-        has_consent = await db.consent_logs.find_one({
-            "patient_id": patient_id,
-            "doctor_id": current_user_id,
-            "status": "approved"
-        })
-        
-        if has_consent:
-            return True
+        record_filter = await authorization_service.visible_records_filter(
+            db, patient_id, current_user_id
+        )
+        if record_filter is not None:
+            return record_filter
     
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="You do not have permission to access this patient's data"
     )
 
+async def run_ai_call(http_request: Request, call):
+    """
+    Await an AI service call, cancelling it if the client disconnects
+    (the LLM request is abandoned and its concurrency slot freed).
+    """
+    task = asyncio.ensure_future(call)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=1.0)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                print("AI request cancelled: client disconnected")
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except LLMError as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def load_record_hashes(db, query: dict, limit: int = 0) -> List[str]:
+    """record_hash of each record matching query (newest first when limited)"""
+    cursor = db.medical_records.find(query, {"record_hash": 1})
+    if limit:
+        cursor = cursor.sort("created_at", -1).limit(limit)
+    return [record["record_hash"] async for record in cursor]
+
+def sse_event(event: str, data, event_id: Optional[int] = None) -> str:
+    """Format one server-sent event"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # ============================================================================
 # HEALTH SUMMARY ENDPOINT
 # ============================================================================
@@ -65,13 +111,14 @@ async def verify_patient_access(patient_id: str, current_user: dict, db):
 @router.post("/health-summary", response_model=HealthSummaryResponse)
 async def get_health_summary(
     request: HealthSummaryRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get AI-powered health summary for a patient"""
     db = await get_database()
     
     # Verify access to patient data
-    await verify_patient_access(request.patient_id, current_user, db)
+    record_filter = await verify_patient_access(request.patient_id, current_user, db)
     
     # Verify patient exists
     patient = await db.users.find_one({"_id": ObjectId(request.patient_id)})
@@ -81,26 +128,36 @@ async def get_health_summary(
             detail="Patient not found"
         )
     
-    # Get medical records
-    records = []
-    cursor = db.medical_records.find({"patient_id": request.patient_id})
-    async for record in cursor:
-        records.append(record)
+    query = {"patient_id": request.patient_id, **record_filter, "deleted": {"$ne": True}}
+    record_hashes = await load_record_hashes(db, query)
     
-    if not records:
+    if not record_hashes:
         # Return empty summary instead of error
-        return HealthSummaryResponse(
-            summary="No medical records available for analysis.",
-            key_conditions=[],
-            medications=[],
-            recommendations=["Upload medical records to get personalized health insights"],
-            risk_factors=[]
-        )
+        return EMPTY_SUMMARY
     
-    print(f"Generating health summary for patient {request.patient_id} with {len(records)} records")
+    cache_key = ai_service.cache_key("summary", request.patient_id, record_hashes)
+    result = await ai_cache.get(db, cache_key)
     
-    # Generate summary using AI
-    result = await ai_service.summarize_medical_history(records)
+    if result is None:
+        user_id = str(current_user["_id"])
+        
+        async def summarize():
+            # A request that finished since the check above may have cached it
+            cached = await ai_cache.get(db, cache_key)
+            if cached is not None:
+                return cached
+            records = await db.medical_records.find(query, SUMMARY_PROJECTION).to_list(None)
+            print(f"Generating health summary for patient {request.patient_id} with {len(records)} records")
+            # Per-period summaries first, then the final summary over them
+            history = await health_summary_service.history(
+                db, request.patient_id, records, scoped=bool(record_filter), user_id=user_id
+            )
+            return await ai_service.summarize_medical_history(
+                history, user_id=user_id, cache_key=cache_key
+            )
+        
+        # Concurrent requests for the same summary share one upstream call
+        result = await run_ai_call(http_request, ai_service.single_flight(cache_key, summarize))
     
     # Check for errors
     if "error" in result:
@@ -138,25 +195,38 @@ async def get_health_summary(
 @router.post("/summarize", response_model=HealthSummaryResponse)
 async def get_health_summary_legacy(
     request: HealthSummaryRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Legacy endpoint - redirects to /health-summary"""
-    return await get_health_summary(request, current_user)
+    return await get_health_summary(request, http_request, current_user)
 
 # ============================================================================
 # PREDICTION ENDPOINT
 # ============================================================================
 
+def prediction_response(prediction_type: str, result: dict) -> PredictionResponse:
+    """PredictionResponse from an AI or local risk engine result"""
+    recommendations = result.get("recommendations", [])
+    return PredictionResponse(
+        prediction_type=prediction_type,
+        result=result.get("risks", {}),
+        confidence=float(result.get("confidence", 0.0)),
+        recommendations=recommendations if isinstance(recommendations, list) else [],
+        source=result.get("source", "ai")
+    )
+
 @router.post("/predict", response_model=PredictionResponse)
 async def predict_health_risks(
     request: PredictionRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Predict health risks using AI"""
     db = await get_database()
     
     # Verify access to patient data
-    await verify_patient_access(request.patient_id, current_user, db)
+    record_filter = await verify_patient_access(request.patient_id, current_user, db)
     
     # Get patient data
     print("Fetching patient data for prediction:", request.patient_id)
@@ -167,39 +237,15 @@ async def predict_health_risks(
             detail="Patient not found"
         )
     
-    # Get medical records
-    records = []
-    cursor = db.medical_records.find({"patient_id": request.patient_id})
-    async for record in cursor:
-        records.append(record)
-    
-    patient_data = {
-        "age": patient.get("age", "Unknown"),
-        "gender": patient.get("gender", "Unknown"),
-        "medical_history": records
-    }
-    
-    # Generate prediction
-    result = await ai_service.predict_disease_risk(patient_data)
+    # Generate prediction (cached and coalesced per record set)
+    result = await run_ai_call(
+        http_request,
+        ai_service.predict_for_patient(db, patient, record_filter, user_id=str(current_user["_id"]))
+    )
     print("Prediction Result:", result)
     
-    if "error" in result:
-        print(f"AI Prediction Error: {result['error']}")
-        # Return safe default
-        return PredictionResponse(
-            prediction_type=request.prediction_type,
-            result={},
-            confidence=0.0,
-            recommendations=[f"Unable to generate prediction: {result['error']}"]
-        )
-    
     try:
-        return PredictionResponse(
-            prediction_type=request.prediction_type,
-            result=result.get("risks", {}),
-            confidence=float(result.get("confidence", 0.0)),
-            recommendations=result.get("recommendations", []) if isinstance(result.get("recommendations"), list) else []
-        )
+        return prediction_response(request.prediction_type, result)
     except Exception as e:
         print(f"Error creating prediction response: {e}")
         print(f"Result was: {result}")
@@ -208,6 +254,37 @@ async def predict_health_risks(
             detail=f"Error formatting prediction response: {str(e)}"
         )
 
+@router.post("/predict/stream")
+async def stream_health_risks(
+    request: PredictionRequest,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Risk prediction over server-sent events: a `preliminary` event with the
+    instant local risk score, then `result` with the AI prediction.
+    """
+    db = await get_database()
+    record_filter = await verify_patient_access(request.patient_id, current_user, db)
+    
+    patient = await db.users.find_one({"_id": ObjectId(request.patient_id)})
+    if not patient:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    
+    async def events():
+        preliminary = await ai_service.local_prediction(db, patient, record_filter)
+        yield sse_event(
+            "preliminary", prediction_response(request.prediction_type, preliminary).model_dump()
+        )
+        result = await ai_service.predict_for_patient(
+            db, patient, record_filter, user_id=str(current_user["_id"])
+        )
+        yield sse_event("result", prediction_response(request.prediction_type, result).model_dump())
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ============================================================================
 # RECOMMENDATIONS ENDPOINT
 # ============================================================================
@@ -215,13 +292,14 @@ async def predict_health_risks(
 @router.get("/recommendations/{patient_id}")
 async def get_health_recommendations_by_patient(
     patient_id: str,
+    http_request: Request,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get personalized health recommendations for a specific patient"""
     db = await get_database()
     
     # Verify access to patient data
-    await verify_patient_access(patient_id, current_user, db)
+    record_filter = await verify_patient_access(patient_id, current_user, db)
     
     # Get user profile
     user = await db.users.find_one({"_id": ObjectId(patient_id)})
@@ -231,44 +309,59 @@ async def get_health_recommendations_by_patient(
             detail="Patient not found"
         )
 
-    # Get recent medical records
-    records = []
-    cursor = db.medical_records.find(
-        {"patient_id": patient_id}
-    ).sort("created_at", -1).limit(10)
-
-    async for record in cursor:
-        # Sanitize record for JSON serialization
-        record["_id"] = str(record["_id"])
-        record["patient_id"] = str(record["patient_id"])
-
-        # Convert datetime to str
-        if "created_at" in record and isinstance(record["created_at"], datetime):
-            record["created_at"] = record["created_at"].isoformat()
+    query = {"patient_id": patient_id, **record_filter, "deleted": {"$ne": True}}
+    age = user.get("age", "Unknown")
+    gender = user.get("gender", "Unknown")
+    cache_key = ai_service.cache_key(
+        "recommendations", patient_id, await load_record_hashes(db, query, limit=10),
+        age=age, gender=gender
+    )
+    cached = await ai_cache.get(db, cache_key)
+    if cached is not None:
+        return {"recommendations": cached}
 
-        if "updated_at" in record and isinstance(record["updated_at"], datetime):
-            record["updated_at"] = record["updated_at"].isoformat()
+    async def recommend():
+        cached = await ai_cache.get(db, cache_key)
+        if cached is not None:
+            return cached
 
-        records.append(record)
+        # Get recent medical records
+        records = await db.medical_records.find(
+            query, RECORD_PROJECTION
+        ).sort("created_at", -1).limit(10).to_list(10)
 
-    # Build patient profile
-    patient_profile = {
-        "id": patient_id,
-        "age": user.get("age", "Unknown"),
-        "gender": user.get("gender", "Unknown"),
-        "recent_records": records
-    }
-    
-    print("Generating health recommendations for patient:", patient_profile)
+        # Build patient profile
+        patient_profile = {
+            "id": patient_id,
+            "age": age,
+            "gender": gender,
+            "recent_records": records
+        }
+        
+        print(f"Generating health recommendations for patient {patient_id} from {len(records)} records")
+        try:
+            return await ai_service.generate_health_recommendations(
+                patient_profile, user_id=str(current_user["_id"]), cache_key=cache_key
+            )
+        except LLMError as e:
+            # AI busy or unavailable (e.g. circuit open): local recommendations, not cached
+            print(f"AI recommendations unavailable ({e.detail}), using local risk engine")
+            return risk_engine.predict({
+                "age": age, "gender": gender, "medical_history": records
+            })["recommendations"]
     
     try:
-        recommendations = await ai_service.generate_health_recommendations(patient_profile)
+        recommendations = await run_ai_call(
+            http_request, ai_service.single_flight(cache_key, recommend)
+        )
         
         # Ensure recommendations is a list
         if not isinstance(recommendations, list):
             recommendations = [str(recommendations)]
         
         return {"recommendations": recommendations}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating recommendations: {e}")
         return {
@@ -283,11 +376,235 @@ async def get_health_recommendations_by_patient(
 
 @router.get("/recommendations")
 async def get_health_recommendations(
+    http_request: Request,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get personalized health recommendations for current user"""
     # Redirect to patient-specific endpoint
     return await get_health_recommendations_by_patient(
         str(current_user["_id"]), 
+        http_request,
         current_user
-    )
\ No newline at end of file
+    )
+
+# ============================================================================
+# STREAMING ENDPOINTS (server-sent events)
+# ============================================================================
+
+async def stream_ai_events(stream):
+    """Forward (event, data) pairs from an AIService stream as SSE, reporting LLM errors as an event"""
+    try:
+        async for event, data in stream:
+            yield sse_event(event, data)
+    except LLMError as e:
+        yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+
+@router.post("/health-summary/stream")
+async def stream_health_summary(
+    request: HealthSummaryRequest,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Streaming health summary: `token` events carry raw model output, a
+    `field` event is sent as each summary field completes and `result`
+    carries the final HealthSummaryResponse.
+    """
+    db = await get_database()
+    record_filter = await verify_patient_access(request.patient_id, current_user, db)
+    
+    patient = await db.users.find_one({"_id": ObjectId(request.patient_id)}, {"_id": 1})
+    if not patient:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    
+    query = {"patient_id": request.patient_id, **record_filter, "deleted": {"$ne": True}}
+    record_hashes = await load_record_hashes(db, query)
+    user_id = str(current_user["_id"])
+    
+    async def events():
+        if not record_hashes:
+            yield sse_event("result", EMPTY_SUMMARY.model_dump())
+            return
+        
+        cache_key = ai_service.cache_key("summary", request.patient_id, record_hashes)
+        cached = await ai_cache.get(db, cache_key)
+        if cached is not None:
+            for field, value in cached.items():
+                yield sse_event("field", {"field": field, "value": value})
+            yield sse_event("result", cached)
+            return
+        
+        async def summarize():
+            records = await db.medical_records.find(query, SUMMARY_PROJECTION).to_list(None)
+            history = await health_summary_service.history(
+                db, request.patient_id, records, scoped=bool(record_filter), user_id=user_id
+            )
+            async for event in ai_service.stream_medical_summary(history, user_id, cache_key):
+                yield event
+        
+        async for event in stream_ai_events(summarize()):
+            yield event
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/recommendations/{patient_id}/stream")
+async def stream_health_recommendations(
+    patient_id: str,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Streaming recommendations: `token` events carry raw model output, a
+    `field` event ({index, value}) is sent per completed recommendation and
+    `result` carries the full list.
+    """
+    db = await get_database()
+    record_filter = await verify_patient_access(patient_id, current_user, db)
+    
+    user = await db.users.find_one({"_id": ObjectId(patient_id)})
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    
+    query = {"patient_id": patient_id, **record_filter, "deleted": {"$ne": True}}
+    age = user.get("age", "Unknown")
+    gender = user.get("gender", "Unknown")
+    cache_key = ai_service.cache_key(
+        "recommendations", patient_id, await load_record_hashes(db, query, limit=10),
+        age=age, gender=gender
+    )
+    user_id = str(current_user["_id"])
+    
+    async def events():
+        cached = await ai_cache.get(db, cache_key)
+        if cached is not None:
+            for index, value in enumerate(cached):
+                yield sse_event("field", {"index": index, "value": value})
+            yield sse_event("result", cached)
+            return
+        
+        async def recommend():
+            records = await db.medical_records.find(
+                query, RECORD_PROJECTION
+            ).sort("created_at", -1).limit(10).to_list(10)
+            patient_profile = {
+                "id": patient_id,
+                "age": age,
+                "gender": gender,
+                "recent_records": records
+            }
+            async for event in ai_service.stream_health_recommendations(
+                patient_profile, user_id, cache_key
+            ):
+                yield event
+        
+        async for event in stream_ai_events(recommend()):
+            yield event
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# ============================================================================
+# BATCH RISK JOBS
+# ============================================================================
+
+@router.post("/risk-jobs", response_model=RiskJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_risk_job(
+    request: RiskJobCreate,
+    current_user: dict = Depends(require_role([UserRole.DOCTOR]))
+):
+    """Queue risk predictions for a list of patients or the doctor's whole panel"""
+    db = await get_database()
+    doctor_id = str(current_user["_id"])
+    
+    if request.my_panel:
+        patient_ids = await patient_panel_service.patient_ids(db, doctor_id)
+    else:
+        patient_ids = request.patient_ids or []
+    patient_ids = list(dict.fromkeys(patient_ids))
+    
+    if not patient_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No patients to predict"
+        )
+    if len(patient_ids) > settings.RISK_JOB_MAX_PATIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A job can cover at most {settings.RISK_JOB_MAX_PATIENTS} patients"
+        )
+    
+    job = await risk_job_service.create_job(db, doctor_id, patient_ids)
+    job["id"] = str(job.pop("_id"))
+    return RiskJobResponse(**job)
+
+@router.get("/risk-jobs/{job_id}", response_model=RiskJobResponse)
+async def get_risk_job(
+    job_id: str,
+    after: int = Query(0, ge=0),
+    current_user: dict = Depends(require_role([UserRole.DOCTOR]))
+):
+    """Job status and progress, with results from index `after` on (for polling)"""
+    db = await get_database()
+    job = await risk_job_service.get_job(db, job_id, str(current_user["_id"]), after)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    job["id"] = str(job.pop("_id"))
+    return RiskJobResponse(**job)
+
+@router.get("/risk-jobs/{job_id}/events")
+async def stream_risk_job(
+    job_id: str,
+    http_request: Request,
+    after: int = Query(0, ge=0),
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(require_role([UserRole.DOCTOR]))
+):
+    """
+    Server-sent events: `preliminary` with the local risk scores (unless
+    resuming), one `result` event per finished patient (the event id is its
+    result index, so reconnects resume via Last-Event-ID), a `progress`
+    event when counts change and `done` when the job completes.
+    """
+    db = await get_database()
+    doctor_id = str(current_user["_id"])
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    if not await risk_job_service.get_job(db, job_id, doctor_id, after):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    async def events():
+        sent = after
+        last_progress = None
+        if not after:
+            job = await risk_job_service.get_job(db, job_id, doctor_id)
+            yield sse_event("preliminary", job.get("preliminary", []) if job else [])
+        while True:
+            job = await risk_job_service.get_job(db, job_id, doctor_id, sent)
+            if job is None:
+                return
+            for result in job["results"]:
+                sent += 1
+                yield sse_event("result", result, sent)
+            
+            progress = {key: job[key] for key in ("status", "total", "completed", "failed")}
+            if progress != last_progress:
+                yield sse_event("progress", progress)
+                last_progress = progress
+            
+            if job["status"] == RiskJobStatus.COMPLETED.value and sent >= job["completed"] + job["failed"]:
+                yield sse_event("done", {})
+                return
+            if await http_request.is_disconnected():
+                return
+            await asyncio.sleep(settings.RISK_JOB_POLL_SECONDS)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
\ No newline at end of file
@@ -1,24 +1,43 @@
 # app/api/v1/endpoints/appointments.py
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import List, Optional
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
 from app.models.schemas import (
     AppointmentCreate, AppointmentResponse, AppointmentUpdate,
     AppointmentStatus, UserRole, DoctorAvailabilityCreate,
-    DoctorAvailabilityResponse
+    DoctorAvailabilityResponse, AvailabilityTemplateCreate,
+    AvailabilityTemplateResponse, FreeWindowResponse, NextSlotResponse
 )
 from app.core.security import get_current_active_user, require_role
 from app.core.database import get_database
+from app.core.timeutils import to_instant, day_range
+from app.services.booking import booking_service, BookingError
+from app.services.availability import availability_service
+from app.services.slot_index import slot_index
+from app.services.slot_search import free_slot_index
+from app.services.calendar_counters import calendar_counters
+from app.services.patient_panel import patient_panel_service
+from app.services.doctor_directory import doctor_directory
+from app.services.waitlist import waitlist_service
 
 router = APIRouter()
 
+# Page size for list endpoints when a cursor is given without a limit
+DEFAULT_PAGE_SIZE = 50
+
 # ============================================================================
 # HELPER FUNCTIONS FOR DATE/TIME CONVERSION
 # ============================================================================
 
 def prepare_for_db(data_dict: dict) -> dict:
-    """Convert date and time objects to ISO strings for MongoDB storage"""
+    """
+    Convert date and time objects to ISO strings for MongoDB storage.
+    Slots and appointments also get `start`/`end` UTC instants, which is
+    what range queries and sorting use; the strings are kept for display
+    and parse straight into the response models.
+    """
     if isinstance(data_dict.get('date'), date):
         data_dict['date'] = data_dict['date'].isoformat()
     if isinstance(data_dict.get('appointment_date'), date):
@@ -27,31 +46,28 @@ def prepare_for_db(data_dict: dict) -> dict:
         data_dict['start_time'] = data_dict['start_time'].isoformat()
     if isinstance(data_dict.get('end_time'), time):
         data_dict['end_time'] = data_dict['end_time'].isoformat()
+    day = data_dict.get('date') or data_dict.get('appointment_date')
+    if isinstance(day, str) and isinstance(data_dict.get('start_time'), str):
+        data_dict['start'] = to_instant(day, data_dict['start_time'])
+        data_dict['end'] = to_instant(day, data_dict['end_time'])
     return data_dict
 
-def prepare_for_response(data_dict: dict) -> dict:
-    """Convert ISO strings back to date and time objects for API response"""
-    if isinstance(data_dict.get('date'), str):
-        try:
-            data_dict['date'] = date.fromisoformat(data_dict['date'])
-        except (ValueError, AttributeError):
-            pass
-    if isinstance(data_dict.get('appointment_date'), str):
-        try:
-            data_dict['appointment_date'] = date.fromisoformat(data_dict['appointment_date'])
-        except (ValueError, AttributeError):
-            pass
-    if isinstance(data_dict.get('start_time'), str):
-        try:
-            data_dict['start_time'] = time.fromisoformat(data_dict['start_time'])
-        except (ValueError, AttributeError):
-            pass
-    if isinstance(data_dict.get('end_time'), str):
-        try:
-            data_dict['end_time'] = time.fromisoformat(data_dict['end_time'])
-        except (ValueError, AttributeError):
-            pass
-    return data_dict
+def date_range_query(date_from: Optional[str], date_to: Optional[str]) -> dict:
+    """Index-bounded `start` filter for clinic-local ISO dates"""
+    try:
+        if date_from and date_to:
+            lower, upper = day_range(date_from, date_to)
+            return {"$gte": lower, "$lt": upper}
+        if date_from:
+            return {"$gte": day_range(date_from, date_from)[0]}
+        if date_to:
+            return {"$lt": day_range(date_to, date_to)[1]}
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from and date_to must be ISO dates (YYYY-MM-DD)"
+        )
+    return {}
 
 # ============================================================================
 # AVAILABILITY ENDPOINTS
@@ -76,35 +92,195 @@ async def set_availability(
         "updated_at": datetime.utcnow()
     })
     
-    # Check for overlapping slots
-    existing_slot = await db.doctor_availability.find_one({
-        "doctor_id": availability_dict["doctor_id"],
-        "date": availability_dict["date"],
-        "is_available": True,
-        "$or": [
-            {
-                "start_time": {"$lt": availability_dict["end_time"]},
-                "end_time": {"$gt": availability_dict["start_time"]}
-            }
-        ]
-    })
-    
-    if existing_slot:
+    # Check for overlapping slots (open or booked) in Mongo, then re-check
+    # after the insert in case another worker raced us
+    doctor_id = availability_dict["doctor_id"]
+    slot_date = availability_dict["date"]
+    availability_dict["_id"] = ObjectId()
+    conflicts = await availability_service.find_conflicts(db, doctor_id, [availability_dict])
+    if not conflicts:
+        await db.doctor_availability.insert_one(availability_dict)
+        conflicts = await availability_service.discard_conflicts(db, doctor_id, [availability_dict])
+    if conflicts:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="This time slot overlaps with an existing availability slot"
         )
     
-    # Insert into database
-    result = await db.doctor_availability.insert_one(availability_dict)
-    created = await db.doctor_availability.find_one({"_id": result.inserted_id})
+    slot_id = str(availability_dict["_id"])
+    if availability_dict["is_available"]:
+        slot_index.add_slot(
+            doctor_id, slot_date, availability_dict["start_time"], availability_dict["end_time"], slot_id
+        )
+        free_slot_index.add(slot_id, availability_dict)
     
     # Prepare for response
+    created = dict(availability_dict)
     created["id"] = str(created.pop("_id"))
-    created = prepare_for_response(created)
     
     return DoctorAvailabilityResponse(**created)
 
+def validate_template(template: AvailabilityTemplateCreate):
+    """Reject templates that cannot produce a sensible schedule"""
+    if any(day < 0 or day > 6 for day in template.weekdays):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="weekdays must be between 0 (Monday) and 6 (Sunday)"
+        )
+    if template.end_time <= template.start_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_time must be after start_time"
+        )
+    if template.end_date < template.start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    if template.end_date - template.start_date > timedelta(days=366):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Templates can span at most one year"
+        )
+
+@router.post("/availability/templates", response_model=AvailabilityTemplateResponse, status_code=status.HTTP_201_CREATED)
+async def create_availability_template(
+    template: AvailabilityTemplateCreate,
+    current_user: dict = Depends(require_role([UserRole.DOCTOR]))
+):
+    """Doctor publishes a recurring schedule, generating all its slots in bulk"""
+    db = await get_database()
+    validate_template(template)
+    
+    template_dict = prepare_for_db(template.dict())
+    template_dict["start_date"] = template.start_date.isoformat()
+    template_dict["end_date"] = template.end_date.isoformat()
+    template_dict.update({
+        "doctor_id": str(current_user["_id"]),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
+    
+    result = await db.availability_templates.insert_one(template_dict)
+    counts = await availability_service.apply_template(
+        db, template_dict["doctor_id"], result.inserted_id, template.dict()
+    )
+    
+    return AvailabilityTemplateResponse(
+        **template.dict(),
+        id=str(result.inserted_id),
+        doctor_id=template_dict["doctor_id"],
+        created_at=template_dict["created_at"],
+        updated_at=template_dict["updated_at"],
+        **counts
+    )
+
+@router.put("/availability/templates/{template_id}", response_model=AvailabilityTemplateResponse)
+async def update_availability_template(
+    template_id: str,
+    template: AvailabilityTemplateCreate,
+    current_user: dict = Depends(require_role([UserRole.DOCTOR]))
+):
+    """Regenerate a recurring schedule, touching only the slots that changed"""
+    db = await get_database()
+    validate_template(template)
+    
+    existing = await db.availability_templates.find_one({
+        "_id": ObjectId(template_id),
+        "doctor_id": str(current_user["_id"])
+    })
+    
+    if not existing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Availability template not found"
+        )
+    
+    template_dict = prepare_for_db(template.dict())
+    template_dict["start_date"] = template.start_date.isoformat()
+    template_dict["end_date"] = template.end_date.isoformat()
+    template_dict["updated_at"] = datetime.utcnow()
+    
+    await db.availability_templates.update_one(
+        {"_id": existing["_id"]},
+        {"$set": template_dict}
+    )
+    counts = await availability_service.apply_template(
+        db, existing["doctor_id"], existing["_id"], template.dict()
+    )
+    
+    return AvailabilityTemplateResponse(
+        **template.dict(),
+        id=template_id,
+        doctor_id=existing["doctor_id"],
+        created_at=existing["created_at"],
+        updated_at=template_dict["updated_at"],
+        **counts
+    )
+
+@router.get("/availability/next-available", response_model=List[NextSlotResponse])
+async def get_next_available_slots(
+    specialization: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Earliest open slots across all doctors, optionally by specialization"""
+    db = await get_database()
+    
+    try:
+        for value in (date_from, date_to):
+            if value:
+                date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from and date_to must be ISO dates (YYYY-MM-DD)"
+        )
+    
+    slots = await free_slot_index.search(
+        db, limit, specialization=specialization, date_from=date_from, date_to=date_to
+    )
+    return [NextSlotResponse(**slot) for slot in slots]
+
+@router.get("/availability/{doctor_id}/free-windows", response_model=List[FreeWindowResponse])
+async def get_doctor_free_windows(
+    doctor_id: str,
+    date_from: str,
+    date_to: str,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get a doctor's open time merged into contiguous windows, per day"""
+    db = await get_database()
+    
+    try:
+        span = date.fromisoformat(date_to) - date.fromisoformat(date_from)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from and date_to must be ISO dates (YYYY-MM-DD)"
+        )
+    
+    if span.days < 0 or span.days > 92:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date range must be between 0 and 92 days"
+        )
+    
+    days = await slot_index.get_days(db, doctor_id, date_from, date_to)
+    
+    windows = []
+    for day_str, intervals in days.items():
+        for start_time, end_time in intervals.free_windows():
+            windows.append(FreeWindowResponse(
+                date=day_str,
+                start_time=start_time,
+                end_time=end_time
+            ))
+    
+    return windows
+
 @router.get("/availability/{doctor_id}", response_model=List[DoctorAvailabilityResponse])
 async def get_doctor_availability(
     doctor_id: str,
@@ -123,20 +299,14 @@ async def get_doctor_availability(
     
     # Add date range filter if provided
     if date_from or date_to:
-        date_filter = {}
-        if date_from:
-            date_filter["$gte"] = date_from
-        if date_to:
-            date_filter["$lte"] = date_to
-        query["date"] = date_filter
+        query["start"] = date_range_query(date_from, date_to)
     
     # Get availability slots
     slots = []
-    cursor = db.doctor_availability.find(query).sort("date", 1).sort("start_time", 1)
+    cursor = db.doctor_availability.find(query).sort("start", 1)
     
     async for slot in cursor:
         slot["id"] = str(slot.pop("_id"))
-        slot = prepare_for_response(slot)
         slots.append(DoctorAvailabilityResponse(**slot))
     
     return slots
@@ -147,30 +317,46 @@ async def get_doctor_availability(
 
 @router.get("/doctors", response_model=List[dict])
 async def list_doctors(
+    response: Response,
     specialization: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_active_user)
 ):
-    """List all doctors with optional specialization filter"""
+    """
+    List doctors by name with optional specialization filter. Without
+    limit or cursor every doctor is returned; otherwise pages of `limit`
+    (default 50), with the next page's cursor in X-Next-Cursor.
+    """
     db = await get_database()
+    if cursor and limit is None:
+        limit = DEFAULT_PAGE_SIZE
     
-    query = {"role": UserRole.DOCTOR.value, "is_active": True}
-    if specialization:
-        query["specialization"] = specialization
-    
-    doctors = []
-    cursor = db.users.find(query).sort("full_name", 1)
+    try:
+        doctors, next_cursor = await doctor_directory.list_doctors(
+            db, limit, specialization=specialization, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    async for doctor in cursor:
-        doctors.append({
-            "id": str(doctor["_id"]),
-            "full_name": doctor["full_name"],
-            "email": doctor["email"],
-            "specialization": doctor.get("specialization", "General Practitioner"),
-            "phone": doctor.get("phone")
-        })
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return doctors
 
+@router.get("/doctors/search", response_model=List[dict])
+async def search_doctors(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Typeahead over doctor names and specializations (word prefixes)"""
+    db = await get_database()
+    return await doctor_directory.search(db, q, limit)
+
 # ============================================================================
 # APPOINTMENT BOOKING ENDPOINTS
 # ============================================================================
@@ -183,62 +369,19 @@ async def book_appointment(
     """Patient books an appointment with a doctor"""
     db = await get_database()
     
-    # Verify doctor exists
-    doctor = await db.users.find_one({"_id": ObjectId(appointment.doctor_id)})
-    if not doctor or doctor["role"] != UserRole.DOCTOR.value:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Doctor not found"
+    try:
+        created_appointment = await booking_service.book(
+            db,
+            patient=current_user,
+            doctor_id=appointment.doctor_id,
+            slot_id=appointment.slot_id,
+            reason=appointment.reason,
+            notes=appointment.notes
         )
+    except BookingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
-    # Check if slot is available
-    slot = await db.doctor_availability.find_one({
-        "_id": ObjectId(appointment.slot_id),
-        "doctor_id": appointment.doctor_id,
-        "is_available": True
-    })
-    
-    if not slot:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Slot is not available"
-        )
-    
-    # Create appointment
-    appointment_dict = {
-        "patient_id": str(current_user["_id"]),
-        "patient_name": current_user["full_name"],
-        "doctor_id": appointment.doctor_id,
-        "doctor_name": doctor["full_name"],
-        "slot_id": appointment.slot_id,
-        "appointment_date": slot["date"],  # Already ISO string from DB
-        "start_time": slot["start_time"],  # Already ISO string from DB
-        "end_time": slot["end_time"],  # Already ISO string from DB
-        "reason": appointment.reason,
-        "notes": appointment.notes,
-        "status": AppointmentStatus.SCHEDULED.value,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
-    
-    result = await db.appointments.insert_one(appointment_dict)
-    
-    # Mark slot as unavailable
-    await db.doctor_availability.update_one(
-        {"_id": ObjectId(appointment.slot_id)},
-        {"$set": {"is_available": False, "updated_at": datetime.utcnow()}}
-    )
-    
-    # Add patient to doctor's patient list if not already there
-    await db.users.update_one(
-        {"_id": ObjectId(appointment.doctor_id)},
-        {"$addToSet": {"patient_list": str(current_user["_id"])}}
-    )
-    
-    # Get created appointment
-    created_appointment = await db.appointments.find_one({"_id": result.inserted_id})
     created_appointment["id"] = str(created_appointment.pop("_id"))
-    created_appointment = prepare_for_response(created_appointment)
     
     return AppointmentResponse(**created_appointment)
 
@@ -268,15 +411,33 @@ async def get_my_appointments(
     
     # Get appointments
     appointments = []
-    cursor = db.appointments.find(query).sort("appointment_date", -1).sort("start_time", 1)
+    cursor = db.appointments.find(query).sort("start", -1)
     
     async for apt in cursor:
         apt["id"] = str(apt.pop("_id"))
-        apt = prepare_for_response(apt)
         appointments.append(AppointmentResponse(**apt))
     
     return appointments
 
+@router.get("/reminders", response_model=List[dict])
+async def get_my_reminders(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get the current user's appointment reminders, newest first"""
+    db = await get_database()
+    
+    cursor = db.notifications.find(
+        {"user_id": str(current_user["_id"]), "type": "appointment_reminder"}
+    ).sort("created_at", -1).limit(limit)
+    
+    reminders = []
+    async for reminder in cursor:
+        reminder["id"] = str(reminder.pop("_id"))
+        reminders.append(reminder)
+    
+    return reminders
+
 @router.get("/appointments/date/{date_str}")
 async def get_appointments_by_date(
     date_str: str,
@@ -286,14 +447,16 @@ async def get_appointments_by_date(
     db = await get_database()
     
     appointments = []
-    cursor = db.appointments.find({
-        "doctor_id": str(current_user["_id"]),
-        "appointment_date": date_str
-    }).sort("start_time", 1)
+    cursor = db.appointments.find(
+        {
+            "doctor_id": str(current_user["_id"]),
+            "start": date_range_query(date_str, date_str)
+        },
+        {"start": 0, "end": 0}
+    ).sort("start", 1)
     
     async for apt in cursor:
         apt["id"] = str(apt.pop("_id"))
-        apt = prepare_for_response(apt)
         appointments.append(apt)
     
     return appointments
@@ -314,37 +477,10 @@ async def get_appointments_summary(
     start_date = f"{year}-{month:02d}-01"
     end_date = f"{year}-{month:02d}-{last_day}"
     
-    # Aggregate appointments by date
-    pipeline = [
-        {
-            "$match": {
-                "doctor_id": str(current_user["_id"]),
-                "appointment_date": {"$gte": start_date, "$lte": end_date}
-            }
-        },
-        {
-            "$group": {
-                "_id": "$appointment_date",
-                "count": {"$sum": 1}
-            }
-        },
-        {
-            "$project": {
-                "date": "$_id",
-                "count": 1,
-                "_id": 0
-            }
-        },
-        {
-            "$sort": {"date": 1}
-        }
-    ]
-    
-    result = []
-    async for doc in db.appointments.aggregate(pipeline):
-        result.append(doc)
-    
-    return result
+    # Read the per-day counters maintained on booking/status change
+    return await calendar_counters.get_range(
+        db, str(current_user["_id"]), start_date, end_date
+    )
 
 # ============================================================================
 # APPOINTMENT UPDATE ENDPOINTS
@@ -384,89 +520,64 @@ async def update_appointment_status(
             update_dict["status"] = update_dict["status"].value
     update_dict["updated_at"] = datetime.utcnow()
     
-    # Update appointment
-    await db.appointments.update_one(
+    # Update appointment; the previous status drives the calendar counters
+    previous = await db.appointments.find_one_and_update(
         {"_id": ObjectId(appointment_id)},
-        {"$set": update_dict}
+        {"$set": update_dict},
+        return_document=ReturnDocument.BEFORE
     )
+    if not previous:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Appointment not found"
+        )
     
-    # If cancelled, make slot available again
-    if update.status == AppointmentStatus.CANCELLED:
-        await db.doctor_availability.update_one(
-            {"_id": ObjectId(appointment["slot_id"])},
-            {"$set": {"is_available": True, "updated_at": datetime.utcnow()}}
+    if "status" in update_dict:
+        await calendar_counters.status_changed(
+            db, previous["doctor_id"], previous["appointment_date"],
+            previous["status"], update_dict["status"]
         )
     
-    # Get updated appointment
-    updated_appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)})
+    # If newly cancelled, offer the slot to the waitlist (or reopen it)
+    if (update.status == AppointmentStatus.CANCELLED
+            and previous["status"] != AppointmentStatus.CANCELLED.value):
+        await waitlist_service.slot_freed(db, appointment["slot_id"])
+    
+    updated_appointment = {**previous, **update_dict}
     updated_appointment["id"] = str(updated_appointment.pop("_id"))
-    updated_appointment = prepare_for_response(updated_appointment)
     
     return AppointmentResponse(**updated_appointment)
 # Add this endpoint to app/api/v1/endpoints/appointments.py
 
 @router.get("/my-patients", response_model=List[dict])
 async def get_my_patients(
+    response: Response,
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(require_role([UserRole.DOCTOR]))
 ):
-    """Get list of all patients who have had appointments with this doctor"""
+    """
+    Get patients who have had appointments with this doctor, most recent first.
+    `q` filters by name prefix. Without limit or cursor the whole panel is
+    returned; otherwise pages of `limit` (default 50), with the next page's
+    cursor in X-Next-Cursor.
+    """
     db = await get_database()
+    if cursor and limit is None:
+        limit = DEFAULT_PAGE_SIZE
     
-    # Get unique patient IDs from appointments
-    pipeline = [
-        {
-            "$match": {
-                "doctor_id": str(current_user["_id"]),
-            }
-        },
-        {
-            "$group": {
-                "_id": "$patient_id",
-                "patient_name": {"$first": "$patient_name"},
-                "last_appointment": {"$max": "$appointment_date"},
-                "total_appointments": {"$sum": 1}
-            }
-        },
-        {
-            "$sort": {"last_appointment": -1}
-        }
-    ]
-    
-    # Get aggregated appointment data
-    appointment_data = {}
-    async for doc in db.appointments.aggregate(pipeline):
-        appointment_data[doc["_id"]] = {
-            "last_appointment": doc["last_appointment"],
-            "total_appointments": doc["total_appointments"],
-            "patient_name": doc["patient_name"]
-        }
-    
-    # Get full patient details
-    patient_ids = [ObjectId(pid) for pid in appointment_data.keys()]
-    patients = []
-    
-    cursor = db.users.find({
-        "_id": {"$in": patient_ids},
-        "role": UserRole.PATIENT.value
-    })
+    try:
+        patients, next_cursor = await patient_panel_service.list_patients(
+            db, str(current_user["_id"]), limit, cursor=cursor, name_prefix=q
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    async for patient in cursor:
-        patient_id = str(patient["_id"])
-        apt_data = appointment_data.get(patient_id, {})
-        
-        patients.append({
-            "id": patient_id,
-            "full_name": patient["full_name"],
-            "email": patient["email"],
-            "phone": patient.get("phone"),
-            "last_appointment": apt_data.get("last_appointment"),
-            "total_appointments": apt_data.get("total_appointments", 0)
-        })
-    
-    # Sort by last appointment date (most recent first)
-    patients.sort(
-        key=lambda x: x.get("last_appointment") or "", 
-        reverse=True
-    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    return patients
\ No newline at end of file
+    return patients
@@ -1,12 +1,13 @@
 # app/api/v1/endpoints/auth.py
 from fastapi import APIRouter, HTTPException, status, Depends
 from app.core.security import get_current_active_user
-from app.models.schemas import UserCreate, UserLogin, UserResponse, Token
+from app.models.schemas import UserCreate, UserLogin, UserResponse, Token, UserRole
 from app.core.security import (
     get_password_hash, verify_password,
     create_access_token, create_refresh_token
 )
 from app.core.database import get_database
+from app.services.doctor_directory import doctor_directory
 from datetime import datetime
 from bson import ObjectId
 import secrets
@@ -41,6 +42,8 @@ async def register(user: UserCreate):
     result = await db.users.insert_one(user_dict)
     
     created_user = await db.users.find_one({"_id": result.inserted_id})
+    if created_user["role"] == UserRole.DOCTOR.value:
+        doctor_directory.upsert(created_user)
     created_user["id"] = str(created_user.pop("_id"))
     
     return UserResponse(**created_user)
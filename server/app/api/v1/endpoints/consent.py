@@ -8,6 +8,7 @@ from app.models.schemas import (
 from app.core.security import get_current_active_user, require_role
 from app.core.database import get_database
 from app.services.blockchain import blockchain_service
+from app.services.authorization import authorization_service
 from datetime import datetime, timedelta
 from bson import ObjectId
 
@@ -118,17 +119,27 @@ async def approve_consent(
     granted_at = datetime.utcnow()
     expires_at = granted_at + timedelta(hours=consent["duration_hours"])
     
+    consent_update = {
+        "status": ConsentStatus.APPROVED,
+        "granted_at": granted_at,
+        "expires_at": expires_at,
+        "blockchain_tx_id": blockchain_tx,
+        "updated_at": datetime.utcnow()
+    }
+    
+    # Resolve record-scoped consent to the patient's records once, at grant time
+    if consent.get("record_ids"):
+        consent_update["resolved_record_ids"] = await authorization_service.resolve_consent_scope(
+            db, str(current_user["_id"]), consent["record_ids"]
+        )
+    
     await db.consent_logs.update_one(
         {"_id": ObjectId(consent_id)},
-        {
-            "$set": {
-                "status": ConsentStatus.APPROVED,
-                "granted_at": granted_at,
-                "expires_at": expires_at,
-                "blockchain_tx_id": blockchain_tx,
-                "updated_at": datetime.utcnow()
-            }
-        }
+        {"$set": consent_update}
+    )
+    
+    await authorization_service.record_consent_granted(
+        db, str(current_user["_id"]), consent["doctor_id"], expires_at
     )
     
     updated_consent = await db.consent_logs.find_one({"_id": ObjectId(consent_id)})
@@ -168,6 +179,8 @@ async def deny_consent(
         }
     )
     
+    authorization_service.invalidate(str(current_user["_id"]), consent["doctor_id"])
+    
     updated_consent = await db.consent_logs.find_one({"_id": ObjectId(consent_id)})
     updated_consent["id"] = str(updated_consent.pop("_id"))
     
@@ -210,6 +223,10 @@ async def revoke_consent(
             }
         }
     )
+    
+    await authorization_service.refresh_consent(
+        db, str(current_user["_id"]), consent["doctor_id"]
+    )
 
 @router.get("/my-consents", response_model=List[ConsentResponse])
 async def get_my_consents(
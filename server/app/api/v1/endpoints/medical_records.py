@@ -1,15 +1,23 @@
 from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from app.models.schemas import MedicalRecordResponse, UserRole
+from app.models.schemas import (
+    MedicalRecordResponse, UserRole,
+    EmergencyAccessRequest, EmergencyAccessResponse
+)
+from app.core.config import settings
 from app.core.security import get_current_active_user, require_role
 from app.core.database import get_database
 from app.services.encryption import encryption_service
 from app.services.ipfs import ipfs_service
 from app.services.blockchain import blockchain_service
-from datetime import datetime
+from app.services.authorization import authorization_service
+from app.services.emergency import emergency_summary_service
+from app.services.health_summary import health_summary_service
+from datetime import datetime, timedelta
 from bson import ObjectId
 from pymongo.errors import DuplicateKeyError
+import asyncio
 import hashlib
 import base64
 from io import BytesIO
@@ -57,12 +65,9 @@ async def upload_medical_record(
             )
         
         # Verify doctor has treated this patient
-        appointment = await db.appointments.find_one({
-            "doctor_id": str(current_user["_id"]),
-            "patient_id": patient_id
-        })
-        
-        if not appointment:
+        if not await authorization_service.is_treating_doctor(
+            db, patient_id, str(current_user["_id"])
+        ):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only upload records for patients you have treated"
@@ -144,6 +149,8 @@ async def upload_medical_record(
     
     try:
         result = await db.medical_records.insert_one(record_dict)
+        await emergency_summary_service.record_changed(db, actual_patient_id, record_type)
+        health_summary_service.record_changed(db, actual_patient_id)
         created_record = await db.medical_records.find_one({"_id": result.inserted_id})
         created_record["id"] = str(created_record.pop("_id"))
         
@@ -197,22 +204,23 @@ async def get_patient_records(
             detail="Patient not found"
         )
     
-    # Verify doctor has treated this patient
-    appointment = await db.appointments.find_one({
-        "doctor_id": str(current_user["_id"]),
-        "patient_id": patient_id
-    })
+    # Treating doctors see every record; consent holders only the consented
+    # ones, and break-glass grants only the critical record types
+    record_filter = await authorization_service.visible_records_filter(
+        db, patient_id, str(current_user["_id"]), emergency=True
+    )
     
-    if not appointment:
+    if record_filter is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only view records for patients you have treated"
+            detail="You can only view records for patients you have treated or have consent from"
         )
     
     records = []
     cursor = db.medical_records.find({
         "patient_id": patient_id,
-        "deleted": {"$ne": True}
+        "deleted": {"$ne": True},
+        **record_filter
     }).sort("created_at", -1)
     
     async for record in cursor:
@@ -243,10 +251,12 @@ async def get_record(
     is_patient = str(record["patient_id"]) == str(current_user["_id"])
     
     if not is_patient:
-        has_consent = await check_consent(
-            db, record["patient_id"], str(current_user["_id"])
+        is_emergency = await authorization_service.has_emergency_access(
+            db, record["patient_id"], str(current_user["_id"]), record
         )
-        if not has_consent:
+        if not is_emergency and not await check_consent(
+            db, record["patient_id"], str(current_user["_id"]), record_id
+        ):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No consent to access this record"
@@ -256,7 +266,8 @@ async def get_record(
             patient_id=record["patient_id"],
             accessor_id=str(current_user["_id"]),
             record_id=record_id,
-            action="view"
+            action="view",
+            is_emergency=is_emergency
         )
     
     record["id"] = str(record.pop("_id"))
@@ -285,32 +296,29 @@ async def download_record(
     is_patient = str(record["patient_id"]) == str(current_user["_id"])
     
     if not is_patient:
-        # Check if user is a doctor who has treated this patient
-        is_treating_doctor = False
-        if current_user["role"] == UserRole.DOCTOR.value:
-            appointment = await db.appointments.find_one({
-                "doctor_id": str(current_user["_id"]),
-                "patient_id": record["patient_id"]
-            })
-            is_treating_doctor = appointment is not None
-        
-        # If not treating doctor, check for consent
-        if not is_treating_doctor:
-            has_consent = await check_consent(
-                db, record["patient_id"], str(current_user["_id"])
+        # Treating doctors, break-glass grants (critical record types only)
+        # and holders of consent covering this record may download
+        is_treating_doctor = await authorization_service.is_treating_doctor(
+            db, record["patient_id"], str(current_user["_id"])
+        )
+        is_emergency = not is_treating_doctor and await authorization_service.has_emergency_access(
+            db, record["patient_id"], str(current_user["_id"]), record
+        )
+        if not is_treating_doctor and not is_emergency and not await check_consent(
+            db, record["patient_id"], str(current_user["_id"]), record_id
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No consent to download this record"
             )
-            if not has_consent:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No consent to download this record"
-                )
         
         # Record access for audit trail (only if not the patient)
         await blockchain_service.record_access(
             patient_id=record["patient_id"],
             accessor_id=str(current_user["_id"]),
             record_id=record_id,
-            action="download"
+            action="download",
+            is_emergency=is_emergency
         )
     
     if "encrypted_file_data" not in record:
@@ -377,13 +385,71 @@ async def delete_record(
         {"_id": ObjectId(record_id)},
         {"$set": {"deleted": True, "deleted_at": datetime.utcnow()}}
     )
+    await emergency_summary_service.record_changed(
+        db, record["patient_id"], record.get("record_type")
+    )
+    health_summary_service.record_changed(db, record["patient_id"])
 
-async def check_consent(db, patient_id: str, doctor_id: str) -> bool:
-    """Check if doctor has active consent"""
-    consent = await db.consent_logs.find_one({
-        "patient_id": patient_id,
-        "doctor_id": doctor_id,
-        "status": "approved",
-        "expires_at": {"$gt": datetime.utcnow()}
-    })
-    return consent is not None
\ No newline at end of file
+@router.post("/emergency/{patient_id}", response_model=EmergencyAccessResponse)
+async def emergency_access(
+    patient_id: str,
+    request: EmergencyAccessRequest,
+    current_user: dict = Depends(require_role([UserRole.DOCTOR, UserRole.HOSPITAL]))
+):
+    """Break-glass access to a patient's critical records, without consent"""
+    db = await get_database()
+    
+    accessor_id = str(current_user["_id"])
+    granted_at = datetime.utcnow()
+    expires_at = granted_at + timedelta(minutes=settings.EMERGENCY_ACCESS_MINUTES)
+    
+    # Nothing is granted or logged for a patient that does not exist
+    summary = None
+    if ObjectId.is_valid(patient_id):
+        summary = await emergency_summary_service.get_summary(db, patient_id)
+    if summary is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    
+    # Audit before any data is returned, committed immediately on the ledger
+    blockchain_tx = await blockchain_service.record_access(
+        patient_id=patient_id,
+        accessor_id=accessor_id,
+        record_id="emergency_summary",
+        action="emergency_access",
+        is_emergency=True
+    )
+    
+    await asyncio.gather(
+        authorization_service.grant_emergency(db, patient_id, accessor_id, expires_at),
+        db.access_logs.insert_one({
+            "patient_id": patient_id,
+            "accessor_id": accessor_id,
+            "accessor_role": current_user["role"],
+            "record_id": "emergency_summary",
+            "action": "emergency_access",
+            "reason": request.reason,
+            "is_emergency": True,
+            "blockchain_tx_id": blockchain_tx,
+            "accessed_at": granted_at,
+            "expires_at": expires_at
+        })
+    )
+    
+    return EmergencyAccessResponse(
+        patient_id=patient_id,
+        patient_name=summary["patient_name"],
+        granted_at=granted_at,
+        expires_at=expires_at,
+        blockchain_tx_id=blockchain_tx,
+        records=[MedicalRecordResponse(**record) for record in summary["records"]]
+    )
+
+async def check_consent(db, patient_id: str, doctor_id: str,
+                        record_id: Optional[str] = None) -> bool:
+    """Check if doctor has active consent (covering record_id, if given)"""
+    return await authorization_service.has_record_consent(
+        db, patient_id, doctor_id, record_id
+    )
\ No newline at end of file
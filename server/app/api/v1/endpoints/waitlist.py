@@ -0,0 +1,160 @@
+# app/api/v1/endpoints/waitlist.py
+from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List
+from datetime import datetime
+from bson import ObjectId
+from app.models.schemas import (
+    WaitlistCreate, WaitlistEntryResponse, WaitlistStatus,
+    AppointmentResponse, UserRole
+)
+from app.core.security import require_role
+from app.core.timeutils import to_local
+from app.core.database import get_database
+from app.services.booking import BookingError
+from app.services.waitlist import waitlist_service
+
+router = APIRouter()
+
+def entry_response(entry: dict) -> WaitlistEntryResponse:
+    entry = dict(entry)
+    entry["id"] = str(entry.pop("_id"))
+    return WaitlistEntryResponse(**entry)
+
+def parse_entry_id(entry_id: str) -> ObjectId:
+    if not ObjectId.is_valid(entry_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Waitlist entry not found"
+        )
+    return ObjectId(entry_id)
+
+@router.post("", response_model=WaitlistEntryResponse, status_code=status.HTTP_201_CREATED)
+async def join_waitlist(
+    request: WaitlistCreate,
+    current_user: dict = Depends(require_role([UserRole.PATIENT]))
+):
+    """Patient joins a doctor's waitlist for a date window"""
+    db = await get_database()
+    patient_id = str(current_user["_id"])
+    
+    if request.date_to < request.date_from or request.date_to < to_local(datetime.utcnow()).date():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_to must not be before date_from or in the past"
+        )
+    
+    doctor = None
+    if ObjectId.is_valid(request.doctor_id):
+        doctor = await db.users.find_one(
+            {"_id": ObjectId(request.doctor_id), "role": UserRole.DOCTOR.value},
+            {"full_name": 1}
+        )
+    if not doctor:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Doctor not found"
+        )
+    
+    existing = await db.waitlist_entries.find_one({
+        "patient_id": patient_id,
+        "doctor_id": request.doctor_id,
+        "status": {"$in": [WaitlistStatus.WAITING.value, WaitlistStatus.OFFERED.value]}
+    })
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already on this doctor's waitlist"
+        )
+    
+    now = datetime.utcnow()
+    entry = {
+        "patient_id": patient_id,
+        "doctor_id": request.doctor_id,
+        "doctor_name": doctor["full_name"],
+        "date_from": request.date_from.isoformat(),
+        "date_to": request.date_to.isoformat(),
+        "reason": request.reason,
+        "status": WaitlistStatus.WAITING.value,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.waitlist_entries.insert_one(entry)
+    
+    return entry_response(entry)
+
+@router.get("/my", response_model=List[WaitlistEntryResponse])
+async def get_my_waitlist(
+    current_user: dict = Depends(require_role([UserRole.PATIENT]))
+):
+    """Get the patient's waitlist entries, including pending offers"""
+    db = await get_database()
+    
+    cursor = db.waitlist_entries.find(
+        {"patient_id": str(current_user["_id"])}
+    ).sort("created_at", -1)
+    
+    return [entry_response(entry) async for entry in cursor]
+
+@router.post("/{entry_id}/accept", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
+async def accept_offer(
+    entry_id: str,
+    current_user: dict = Depends(require_role([UserRole.PATIENT]))
+):
+    """Book the slot offered to this waitlist entry"""
+    db = await get_database()
+    
+    entry = await db.waitlist_entries.find_one({
+        "_id": parse_entry_id(entry_id),
+        "patient_id": str(current_user["_id"]),
+        "status": WaitlistStatus.OFFERED.value
+    })
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No pending offer for this waitlist entry"
+        )
+    
+    try:
+        appointment = await waitlist_service.accept(db, entry, current_user)
+    except BookingError as e:
+        if e.status_code == status.HTTP_400_BAD_REQUEST:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The offer has expired"
+            )
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    appointment["id"] = str(appointment.pop("_id"))
+    return AppointmentResponse(**appointment)
+
+@router.post("/{entry_id}/decline", response_model=WaitlistEntryResponse)
+async def decline_offer(
+    entry_id: str,
+    current_user: dict = Depends(require_role([UserRole.PATIENT]))
+):
+    """Decline an offer; the slot goes to the next patient in line"""
+    return await _withdraw(entry_id, current_user, WaitlistStatus.DECLINED)
+
+@router.delete("/{entry_id}", response_model=WaitlistEntryResponse)
+async def leave_waitlist(
+    entry_id: str,
+    current_user: dict = Depends(require_role([UserRole.PATIENT]))
+):
+    """Leave the waitlist (any pending offer is passed on)"""
+    return await _withdraw(entry_id, current_user, WaitlistStatus.CANCELLED)
+
+async def _withdraw(entry_id: str, current_user: dict, new_status: WaitlistStatus):
+    db = await get_database()
+    
+    entry = await waitlist_service.withdraw(
+        db, parse_entry_id(entry_id), str(current_user["_id"]), new_status
+    )
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No pending offer for this waitlist entry"
+            if new_status == WaitlistStatus.DECLINED else "No active waitlist entry found"
+        )
+    
+    entry["status"] = new_status.value
+    return entry_response(entry)
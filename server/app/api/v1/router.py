@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, medical_records, consent, appoinments, ai
+from app.api.v1.endpoints import auth, medical_records, consent, appoinments, ai, waitlist
 
 api_router = APIRouter()
 
@@ -30,4 +30,9 @@ api_router.include_router(
     appoinments.router,
     prefix="/appointments",
     tags=["appointments"]
-)
\ No newline at end of file
+)
+api_router.include_router(
+    waitlist.router,
+    prefix="/waitlist",
+    tags=["Waitlist"]
+)
@@ -30,9 +30,69 @@ class Settings(BaseSettings):
     FABRIC_CHANNEL_NAME: str = "healthchannel"
     FABRIC_CHAINCODE_NAME: str = "swasthyachain"
     
-    # AI (Google Gemini)
+    # AI (Google Gemini, or any OpenAI-compatible API with AI_BACKEND=openai)
+    AI_BACKEND: str = os.getenv("AI_BACKEND", "gemini")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = "gemini-pro"
+    AI_BASE_URL: str = os.getenv("AI_BASE_URL", "https://api.openai.com/v1")
+    AI_API_KEY: str = os.getenv("AI_API_KEY", "")
+    AI_MODEL: str = os.getenv("AI_MODEL", "gpt-4o-mini")
+    AI_MAX_CONCURRENCY: int = 8
+    AI_MAX_CONCURRENCY_PER_USER: int = 2
+    AI_QUEUE_TIMEOUT_SECONDS: float = 10
+    AI_REQUEST_TIMEOUT_SECONDS: float = 60
+    AI_MIN_TIMEOUT_SECONDS: float = 5
+    AI_TIMEOUT_MULTIPLIER: float = 3
+    AI_LATENCY_WINDOW: int = 200
+    AI_LATENCY_MIN_SAMPLES: int = 20
+    AI_HEDGE_PERCENTILE: float = 95
+    AI_HEDGE_BUDGET_RATIO: float = 0.1
+    AI_BREAKER_WINDOW: int = 20
+    AI_BREAKER_MIN_CALLS: int = 10
+    AI_BREAKER_ERROR_RATE: float = 0.5
+    AI_BREAKER_SLOW_SECONDS: float = 30
+    AI_BREAKER_SLOW_RATE: float = 0.5
+    AI_BREAKER_OPEN_SECONDS: float = 30
+    AI_CACHE_MAX_SIZE: int = 2000
+    AI_CACHE_TTL_DAYS: int = 30
+    AI_SUMMARY_FOLD_BATCH: int = 10
+    AI_SUMMARY_BACKGROUND_REFRESHES: int = 1
+    AI_PROMPT_TOKEN_BUDGET: int = 3000
+    RISK_JOB_WORKERS: int = 4
+    RISK_JOB_MAX_PATIENTS: int = 500
+    RISK_JOB_POLL_SECONDS: float = 1.0
+    RISK_JOB_LEASE_SECONDS: int = 60
+    RISK_JOB_MAX_ATTEMPTS: int = 5
+    
+    # Authorization
+    AUTHZ_CACHE_TTL_SECONDS: int = 60
+    AUTHZ_CACHE_MAX_SIZE: int = 10000
+    CONSENT_CACHE_MAX_SIZE: int = 50000
+    CONSENT_CACHE_NEGATIVE_TTL_SECONDS: int = 30
+    CONSENT_SWEEP_INTERVAL_SECONDS: int = 60
+    CONSENT_SWEEP_BATCH_SIZE: int = 500
+    
+    # Appointments
+    CLINIC_TIMEZONE: str = "UTC"  # IANA zone that slot dates/times are entered in
+    SLOT_INDEX_MAX_DAYS: int = 20000
+    SLOT_INDEX_TTL_SECONDS: int = 60
+    CALENDAR_RECONCILE_INTERVAL_SECONDS: int = 3600
+    CALENDAR_RECONCILE_SETTLE_SECONDS: int = 60
+    DOCTOR_DIRECTORY_REFRESH_SECONDS: int = 300
+    SLOT_SEARCH_REFRESH_SECONDS: int = 300
+    WAITLIST_HOLD_MINUTES: int = 15
+    WAITLIST_SWEEP_INTERVAL_SECONDS: int = 30
+    REMINDER_LEAD_MINUTES: int = 1440
+    NO_SHOW_GRACE_MINUTES: int = 30
+    SCHEDULER_TICK_SECONDS: int = 5
+    SCHEDULER_HORIZON_HOURS: int = 6
+    SCHEDULER_BATCH_SIZE: int = 1000
+    SCHEDULER_RECOVERY_HOURS: int = 24
+    
+    # Emergency (break-glass) access
+    EMERGENCY_ACCESS_MINUTES: int = 60
+    EMERGENCY_SUMMARY_MAX_RECORDS: int = 50
+    EMERGENCY_SUMMARY_CACHE_TTL_SECONDS: int = 300
     
     # Encryption
     ENCRYPTION_KEY: str = os.getenv("ENCRYPTION_KEY", "")  # AES-256 key
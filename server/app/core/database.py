@@ -27,6 +27,8 @@ async def create_indexes():
     await db.db.users.create_index("email", unique=True)
     await db.db.users.create_index("blockchain_address")
     await db.db.users.create_index("role")
+    await db.db.users.create_index([("role", 1), ("is_active", 1), ("full_name", 1)])
+    await db.db.users.create_index([("role", 1), ("is_active", 1), ("specialization", 1), ("full_name", 1)])
     
     # Medical records
     await db.db.medical_records.create_index("patient_id")
@@ -41,11 +43,16 @@ async def create_indexes():
     await db.db.consent_logs.create_index("expires_at")
     await db.db.consent_logs.create_index("status")
     await db.db.consent_logs.create_index([("patient_id", 1), ("status", 1)])
+    await db.db.consent_logs.create_index([("status", 1), ("expires_at", 1)])
     
     # Access logs
     await db.db.access_logs.create_index([("patient_id", 1), ("accessed_at", -1)])
     await db.db.access_logs.create_index("record_id")
     await db.db.access_logs.create_index("accessor_id")
+    await db.db.access_logs.create_index([("is_emergency", 1), ("accessed_at", -1)])
+    
+    # Emergency summaries
+    await db.db.emergency_summaries.create_index("patient_id", unique=True)
     
     # Appointments collection (NEW)
     await db.db.appointments.create_index("patient_id")
@@ -55,6 +62,13 @@ async def create_indexes():
     await db.db.appointments.create_index([("doctor_id", 1), ("appointment_date", 1)])
     await db.db.appointments.create_index([("patient_id", 1), ("status", 1)])
     await db.db.appointments.create_index([("doctor_id", 1), ("status", 1)])
+    await db.db.appointments.create_index([("doctor_id", 1), ("start", 1)])
+    await db.db.appointments.create_index([("patient_id", 1), ("start", -1)])
+    await db.db.appointments.create_index([("status", 1), ("start", 1)])
+    await db.db.appointments.create_index([("status", 1), ("end", 1)])
+    
+    # Notifications (appointment reminders)
+    await db.db.notifications.create_index([("user_id", 1), ("created_at", -1)])
     
     # Doctor availability collection (NEW)
     await db.db.doctor_availability.create_index("doctor_id")
@@ -62,6 +76,44 @@ async def create_indexes():
     await db.db.doctor_availability.create_index("is_available")
     await db.db.doctor_availability.create_index([("doctor_id", 1), ("date", 1)])
     await db.db.doctor_availability.create_index([("doctor_id", 1), ("date", 1), ("is_available", 1)])
+    await db.db.doctor_availability.create_index([("doctor_id", 1), ("template_id", 1)])
+    await db.db.doctor_availability.create_index([("doctor_id", 1), ("start", 1)])
+    
+    # Doctor patient panels
+    await db.db.doctor_patients.create_index([("doctor_id", 1), ("patient_id", 1)], unique=True)
+    await db.db.doctor_patients.create_index([("doctor_id", 1), ("last_appointment", -1), ("patient_id", -1)])
+    await db.db.doctor_patients.create_index([("doctor_id", 1), ("name_lower", 1), ("patient_id", 1)])
+    
+    # Waitlist (per-doctor FIFO queue, offer expiry sweep)
+    await db.db.waitlist_entries.create_index([("doctor_id", 1), ("status", 1), ("created_at", 1)])
+    await db.db.waitlist_entries.create_index([("patient_id", 1), ("created_at", -1)])
+    await db.db.waitlist_entries.create_index([("status", 1), ("offer_expires_at", 1)])
+    await db.db.waitlist_entries.create_index([("status", 1), ("date_to", 1)])
+    
+    # AI result cache
+    await db.db.ai_results.create_index(
+        "created_at", expireAfterSeconds=settings.AI_CACHE_TTL_DAYS * 86400
+    )
+    
+    # Rolling per-period health summaries
+    await db.db.health_period_summaries.create_index(
+        [("patient_id", 1), ("period", 1)], unique=True
+    )
+    
+    # Batch risk prediction jobs
+    await db.db.risk_jobs.create_index([("doctor_id", 1), ("created_at", -1)])
+    await db.db.risk_jobs.create_index("status")
+    await db.db.risk_jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+    
+    # Doctor day counters (month calendar)
+    await db.db.doctor_day_counters.create_index([("doctor_id", 1), ("date", 1)], unique=True)
+    
+    # Availability templates
+    await db.db.availability_templates.create_index("doctor_id")
+    
+    # Care relationships (doctor <-> patient authorization index)
+    await db.db.care_relationships.create_index([("doctor_id", 1), ("patient_id", 1)], unique=True)
+    await db.db.care_relationships.create_index("patient_id")
     
     print("✅ Database indexes created successfully")
 
@@ -0,0 +1,29 @@
+# app/core/timeutils.py
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Tuple, Union
+from zoneinfo import ZoneInfo
+from app.core.config import settings
+
+# Slot dates and times are entered as clinic-local wall clock time; the
+# stored `start`/`end` instants are naive UTC, like every other datetime
+# pymongo hands back.
+CLINIC_TZ = ZoneInfo(settings.CLINIC_TIMEZONE)
+
+def to_instant(day: Union[date, str], at: Union[time, str]) -> datetime:
+    """Clinic-local date + time -> naive UTC datetime"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    if isinstance(at, str):
+        at = time.fromisoformat(at)
+    local = datetime.combine(day, at, tzinfo=CLINIC_TZ)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+def to_local(instant: datetime) -> datetime:
+    """Naive UTC datetime -> naive clinic-local datetime"""
+    return instant.replace(tzinfo=timezone.utc).astimezone(CLINIC_TZ).replace(tzinfo=None)
+
+def day_range(date_from: Union[date, str], date_to: Union[date, str]) -> Tuple[datetime, datetime]:
+    """UTC bounds [start, end) covering the clinic-local days date_from..date_to"""
+    if isinstance(date_to, str):
+        date_to = date.fromisoformat(date_to)
+    return to_instant(date_from, time.min), to_instant(date_to + timedelta(days=1), time.min)
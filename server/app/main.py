@@ -5,16 +5,65 @@ from contextlib import asynccontextmanager
 import uvicorn
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, get_database
 from app.api.v1.router import api_router
+from app.services.authorization import authorization_service
+from app.services.consent_sweeper import consent_sweeper
+from app.services.calendar_counters import calendar_reconciler
+from app.services.patient_panel import patient_panel_service
+from app.services.doctor_directory import doctor_directory
+from app.services.waitlist import waitlist_sweeper
+from app.services.appointment_scheduler import appointment_scheduler
+from app.services.slot_search import free_slot_index
+from app.services.risk_jobs import risk_job_service
+from app.services.ai_service import ai_service
+from app.services.health_summary import health_summary_service
+from app.services.migrations import migrate_slot_instants
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
     print("✅ Database initialized")
+    
+    # Give legacy slots/appointments native start/end datetimes
+    db = await get_database()
+    await migrate_slot_instants(db)
+    
+    # Backfill the care relationship index on first run
+    if await db.care_relationships.estimated_document_count() == 0:
+        await authorization_service.rebuild(db)
+    if await db.doctor_patients.estimated_document_count() == 0:
+        await patient_panel_service.rebuild(db)
+    
+    # Warm the cross-doctor slot search index (searches fall back to Mongo until loaded)
+    try:
+        await free_slot_index.load(db)
+    except Exception as e:
+        print(f"⚠️ Free slot index not loaded: {e}")
+    
+    # Doctor directory snapshot (otherwise loaded on first use)
+    try:
+        await doctor_directory.load(db)
+    except Exception as e:
+        print(f"⚠️ Doctor directory not loaded: {e}")
+    
+    # Background jobs
+    consent_sweeper.start()
+    calendar_reconciler.start()
+    waitlist_sweeper.start()
+    appointment_scheduler.start()
+    await risk_job_service.start(db)
+    health_summary_service.start()
     yield
     # Shutdown
+    await consent_sweeper.stop()
+    await calendar_reconciler.stop()
+    await waitlist_sweeper.stop()
+    await appointment_scheduler.stop()
+    await risk_job_service.stop()
+    await health_summary_service.stop()
+    await ai_service.close()
     print("🔴 Application shutting down")
 
 app = FastAPI(
@@ -31,6 +80,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors must be readable by cross-origin clients
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API router
@@ -48,7 +99,8 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "version": settings.VERSION
+        "version": settings.VERSION,
+        "ai": ai_service.status()
     }
 
 if __name__ == "__main__":
@@ -143,6 +143,18 @@ class AccessLogResponse(BaseModel):
     blockchain_tx_id: str
     accessed_at: datetime
 
+# Emergency Access Models
+class EmergencyAccessRequest(BaseModel):
+    reason: str
+
+class EmergencyAccessResponse(BaseModel):
+    patient_id: str
+    patient_name: str
+    granted_at: datetime
+    expires_at: datetime
+    blockchain_tx_id: str
+    records: List[MedicalRecordResponse]
+
 # AI Models
 class HealthSummaryRequest(BaseModel):
     patient_id: str
@@ -163,6 +175,7 @@ class PredictionResponse(BaseModel):
     result: Dict
     confidence: float
     recommendations: List[str]
+    source: str = "ai"  # "ai" or "local" (risk engine)
 # Add these to app/models/schemas.py
 
 
@@ -194,6 +207,44 @@ class DoctorAvailabilityResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class FreeWindowResponse(BaseModel):
+    date: date
+    start_time: time
+    end_time: time
+
+class NextSlotResponse(BaseModel):
+    slot_id: str
+    doctor_id: str
+    doctor_name: str
+    specialization: str
+    date: date
+    start_time: time
+    end_time: time
+
+# Recurring availability templates, e.g. Mon-Fri 09:00-13:00 in 15 minute slots
+class AvailabilityTemplateCreate(BaseModel):
+    weekdays: List[int] = Field(min_length=1)  # 0 = Monday ... 6 = Sunday
+    start_time: time
+    end_time: time
+    slot_minutes: int = Field(ge=5, le=480)
+    start_date: date
+    end_date: date
+
+class AvailabilityTemplateResponse(BaseModel):
+    id: str
+    doctor_id: str
+    weekdays: List[int]
+    start_time: time
+    end_time: time
+    slot_minutes: int
+    start_date: date
+    end_date: date
+    slots_created: int
+    slots_removed: int
+    slots_skipped: int
+    created_at: datetime
+    updated_at: datetime
+
 # Appointment Models
 class AppointmentCreate(BaseModel):
     doctor_id: str
@@ -222,4 +273,65 @@ class AppointmentResponse(BaseModel):
 
 class AppointmentUpdate(BaseModel):
     status: Optional[AppointmentStatus] = None
-    notes: Optional[str] = None
\ No newline at end of file
+    notes: Optional[str] = None
+
+# Waitlist Models
+class WaitlistStatus(str, Enum):
+    WAITING = "waiting"
+    OFFERED = "offered"
+    BOOKED = "booked"
+    DECLINED = "declined"
+    EXPIRED = "expired"
+    CANCELLED = "cancelled"
+
+class WaitlistCreate(BaseModel):
+    doctor_id: str
+    date_from: date
+    date_to: date
+    reason: str
+
+class WaitlistEntryResponse(BaseModel):
+    id: str
+    patient_id: str
+    doctor_id: str
+    doctor_name: str
+    date_from: date
+    date_to: date
+    reason: str
+    status: WaitlistStatus
+    offer_slot_id: Optional[str] = None
+    offer_expires_at: Optional[datetime] = None
+    appointment_id: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+# Batch Risk Job Models
+class RiskJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+class RiskJobCreate(BaseModel):
+    patient_ids: Optional[List[str]] = None
+    my_panel: bool = False  # every patient in the doctor's panel
+
+class RiskJobResult(BaseModel):
+    patient_id: str
+    patient_name: Optional[str] = None
+    result: Dict = {}
+    confidence: float = 0.0
+    recommendations: List[str] = []
+    source: str = "ai"
+    error: Optional[str] = None
+
+class RiskJobResponse(BaseModel):
+    id: str
+    status: RiskJobStatus
+    total: int
+    completed: int
+    failed: int
+    results: List[RiskJobResult] = []
+    preliminary: List[RiskJobResult] = []  # local risk engine scores, available immediately
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
\ No newline at end of file
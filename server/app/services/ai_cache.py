@@ -0,0 +1,48 @@
+# app/services/ai_cache.py
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Optional
+from cachetools import LRUCache
+from app.core.config import settings
+
+class AIResultCache:
+    """
+    Content-addressed cache of AI results.
+
+    A key is a digest of everything that determines the result (operation,
+    prompt version, patient and the record_hash of every record used), so
+    entries never need invalidating: an upload or soft delete changes the
+    record set and therefore the key. Entries live in `ai_results` (expired
+    by a TTL index) behind an in-process LRU.
+    """
+
+    def __init__(self, max_size: int = 2000):
+        self._lru: LRUCache = LRUCache(maxsize=max_size)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get(self, db, key: str) -> Optional[Any]:
+        """Cached result for key, or None"""
+        if key in self._lru:
+            return self._lru[key]
+        doc = await db.ai_results.find_one({"_id": key}, {"result": 1})
+        if doc is None:
+            return None
+        self._lru[key] = doc["result"]
+        return doc["result"]
+
+    async def put(self, db, key: str, operation: str, result: Any):
+        """Store a successful result"""
+        self._lru[key] = result
+        await db.ai_results.replace_one(
+            {"_id": key},
+            {"operation": operation, "result": result, "created_at": datetime.utcnow()},
+            upsert=True
+        )
+
+# Global AI result cache instance
+ai_cache = AIResultCache(max_size=settings.AI_CACHE_MAX_SIZE)
@@ -1,82 +1,206 @@
 # app/services/ai_service.py
-import google.generativeai as genai
 from app.core.config import settings
-from typing import Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import json
 import re
-from bson.objectid import ObjectId
-from datetime import datetime
+from app.core.database import get_database
+from app.services.ai_cache import ai_cache
+from app.services.json_stream import IncrementalJSONParser
+from app.services.llm_backends import LLMBackend, create_backend
+from app.services.llm_client import LLMClient, LLMError
+from app.services.prompt_builder import prompt_builder, RECORD_PROJECTION
+from app.services.risk_engine import risk_engine
+from app.services.single_flight import SingleFlight
+
+# Bump when a prompt changes so cached results from the old prompt are not reused
+PROMPT_VERSIONS = {
+    "summary": 2,
+    "predict": 2,
+    "recommendations": 2
+}
 
 class AIService:
     """
-    AI Service using Google Gemini for health insights
+    AI Service for health insights over a pluggable LLM backend (AI_BACKEND)
     """
     
     def __init__(self):
-        print("Initializing AI Service with Gemini model")
-        if settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        else:
-            self.model = None
+        print(f"Initializing AI Service with {settings.AI_BACKEND} backend")
+        self.use_backend(create_backend())
+        self._flights = SingleFlight()
+
+    def use_backend(self, backend: Optional[LLMBackend]):
+        """Route AI calls through backend (None disables the AI)"""
+        self.backend = backend
+        self.llm = LLMClient(backend) if backend else None
+
+    def status(self) -> Dict:
+        """Backend name plus circuit breaker and latency state"""
+        if not self.llm:
+            return {"backend": None}
+        return {"backend": self.backend.name, **self.llm.status()}
+
+    async def close(self):
+        """Close the backend's connections"""
+        if self.backend:
+            await self.backend.close()
+
+    def cache_key(self, operation: str, patient_id: str, record_hashes: List[str],
+                  **inputs) -> str:
+        """Result cache key for an operation over a patient's records"""
+        return ai_cache.make_key(
+            operation, PROMPT_VERSIONS[operation], patient_id, sorted(record_hashes), inputs
+        )
+
+    async def single_flight(self, key: str, factory):
+        """Run factory() once for all concurrent callers with the same key"""
+        return await self._flights.run(key, factory)
+
+    async def predict_for_patient(self, db, patient: Dict, record_filter: Dict,
+                                  user_id: Optional[str] = None, fallback: bool = True) -> Dict:
+        """
+        Risk prediction over a patient's visible records, served from the
+        result cache when possible and coalesced with identical calls.
+        With fallback, a busy or timed-out LLM yields the local score instead.
+        """
+        patient_id = str(patient["_id"])
+        query = {"patient_id": patient_id, **record_filter, "deleted": {"$ne": True}}
+        age = patient.get("age", "Unknown")
+        gender = patient.get("gender", "Unknown")
+        record_hashes = [
+            record["record_hash"]
+            async for record in db.medical_records.find(query, {"record_hash": 1})
+        ]
+        cache_key = self.cache_key("predict", patient_id, record_hashes, age=age, gender=gender)
+        cached = await ai_cache.get(db, cache_key)
+        if cached is not None:
+            return cached
+
+        async def predict():
+            # A call that finished since the check above may have cached it
+            cached = await ai_cache.get(db, cache_key)
+            if cached is not None:
+                return cached
+            records = await db.medical_records.find(query, RECORD_PROJECTION).to_list(None)
+            patient_data = {
+                "age": age,
+                "gender": gender,
+                "medical_history": records
+            }
+            return await self.predict_disease_risk(patient_data, user_id, cache_key)
+
+        try:
+            return await self.single_flight(cache_key, predict)
+        except LLMError as e:
+            if not fallback:
+                raise
+            print(f"AI prediction unavailable ({e.detail}), using local risk engine")
+            return await self.local_prediction(db, patient, record_filter)
 
-    def _sanitize_for_json(self, data):
-        """Convert non-serializable objects to serializable formats"""
-        if isinstance(data, dict):
-            return {k: self._sanitize_for_json(v) for k, v in data.items()}
-        if isinstance(data, list):
-            return [self._sanitize_for_json(i) for i in data]
-        if isinstance(data, ObjectId):
-            return str(data)
-        if isinstance(data, datetime):
-            return data.isoformat()
-        return data
+    async def local_prediction(self, db, patient: Dict, record_filter: Dict) -> Dict:
+        """Instant local risk score over a patient's visible records"""
+        records = await db.medical_records.find(
+            {"patient_id": str(patient["_id"]), **record_filter, "deleted": {"$ne": True}},
+            RECORD_PROJECTION
+        ).to_list(None)
+        return risk_engine.predict({
+            "age": patient.get("age", "Unknown"),
+            "gender": patient.get("gender", "Unknown"),
+            "medical_history": records
+        })
+
+    async def _remember(self, cache_key: Optional[str], operation: str, result):
+        if cache_key:
+            await ai_cache.put(await get_database(), cache_key, operation, result)
+    
+    async def summarize_record(self, record: Dict, user_id: Optional[str] = None) -> str:
+        """
+        Summarize a single medical record (the map step of the history summary)
+        """
+        prompt = f"""
+        You are a medical AI assistant. Summarize this medical record in at most 3 sentences.
+        Keep diagnoses, medications, test results and dates; drop everything else.
+        
+        Medical Record:
+        {prompt_builder.format_record(record)}
+        
+        Return ONLY the summary text, no markdown.
+        """
+        return (await self.llm.generate(prompt, user_id)).strip()
+    
+    async def fold_summaries(self, previous: Optional[str], summaries: List[str],
+                             user_id: Optional[str] = None) -> str:
+        """
+        Fold record summaries into a running period summary (the reduce step)
+        """
+        entries = "\n".join(f"- {summary}" for summary in summaries)
+        prompt = f"""
+        You are a medical AI assistant maintaining a running summary of a patient's medical history.
+        
+        Current summary:
+        {previous or "None yet"}
+        
+        New entries, oldest first:
+        {entries}
+        
+        Rewrite the summary to include the new entries in at most 6 sentences.
+        Keep chronic conditions, current medications and notable results; drop routine details.
+        Return ONLY the summary text, no markdown.
+        """
+        return (await self.llm.generate(prompt, user_id)).strip()
     
-    async def summarize_medical_history(self, medical_records: List[Dict]) -> Dict:
+    def _summary_prompt(self, history: List[str]) -> str:
+        history_text = "\n\n".join(history)
+        return f"""
+        You are a medical AI assistant. Analyze the following summaries of a patient's medical history, grouped by period, and provide a structured analysis.
+        
+        Medical History:
+        {history_text}
+        
+        Provide your response in this EXACT JSON format (no markdown, no code blocks):
+        {{
+            "summary": "A concise 2-3 sentence summary of the patient's overall health status",
+            "key_conditions": ["condition1", "condition2", "condition3"],
+            "medications": ["medication1", "medication2"],
+            "recommendations": ["recommendation1", "recommendation2", "recommendation3"],
+            "risk_factors": ["risk1", "risk2"]
+        }}
+        
+        Important rules:
+        - All fields must be present
+        - key_conditions, medications, recommendations, and risk_factors must be arrays of strings
+        - If no data available for a field, use an empty array []
+        - Do not include any markdown formatting or code blocks
+        - Return ONLY valid JSON
         """
-        Summarize patient's medical history using AI
+
+    async def summarize_medical_history(self, history: List[str],
+                                        user_id: Optional[str] = None,
+                                        cache_key: Optional[str] = None) -> Dict:
         """
-        if not self.model:
-            return {"error": "Gemini API key not configured"}
+        Summarize patient's medical history using AI, from per-period summaries
+        """
+        if not self.llm:
+            return {"error": "AI backend not configured"}
         
         try:
-            # Prepare medical data
-            records_text = self._format_records_for_ai(medical_records)
-            print("Medical Records for AI:\n", records_text)
+            prompt = self._summary_prompt(history)
             
-            prompt = f"""
-            You are a medical AI assistant. Analyze the following patient medical records and provide a structured analysis.
+            response_text = await self.llm.generate(prompt, user_id)
+            print("AI Response:\n", response_text)
             
-            Medical Records:
-            {records_text}
-            
-            Provide your response in this EXACT JSON format (no markdown, no code blocks):
-            {{
-                "summary": "A concise 2-3 sentence summary of the patient's overall health status",
-                "key_conditions": ["condition1", "condition2", "condition3"],
-                "medications": ["medication1", "medication2"],
-                "recommendations": ["recommendation1", "recommendation2", "recommendation3"],
-                "risk_factors": ["risk1", "risk2"]
-            }}
-            
-            Important rules:
-            - All fields must be present
-            - key_conditions, medications, recommendations, and risk_factors must be arrays of strings
-            - If no data available for a field, use an empty array []
-            - Do not include any markdown formatting or code blocks
-            - Return ONLY valid JSON
-            """
-            
-            response = self.model.generate_content(prompt)
-            print("AI Response:\n", response.text)
-            
-            result = self._parse_ai_response(response.text)
+            result = self._parse_ai_response(response_text)
+            parsed = "error" not in result
             
             # Ensure all required fields are lists
             result = self._ensure_valid_summary_format(result)
             
+            if parsed:
+                await self._remember(cache_key, "summary", result)
             return result
             
+        except LLMError:
+            raise
         except Exception as e:
             print("AI Summarization Error:", str(e))
             return {
@@ -87,6 +211,41 @@ class AIService:
                 "risk_factors": []
             }
     
+    async def stream_medical_summary(self, history: List[str], user_id: Optional[str] = None,
+                                     cache_key: Optional[str] = None
+                                     ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming summarize_medical_history: yields ("token", text) deltas,
+        ("field", {"field", "value"}) as each top-level field completes and
+        finally ("result", summary)
+        """
+        if not self.llm:
+            yield "error", {"status_code": 503, "detail": "AI backend not configured"}
+            return
+        
+        chunks = []
+        async for event, data in self._stream_json(self._summary_prompt(history), user_id, chunks):
+            if event == "field":
+                data = {"field": data[0], "value": data[1]}
+            yield event, data
+        
+        result = self._parse_ai_response("".join(chunks))
+        parsed = "error" not in result
+        result = self._ensure_valid_summary_format(result)
+        if parsed:
+            await self._remember(cache_key, "summary", result)
+        yield "result", result
+    
+    async def _stream_json(self, prompt: str, user_id: Optional[str],
+                           chunks: List[str]) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream a JSON response as ("token", text) and ("field", (key, value)) events, collecting the text in chunks"""
+        parser = IncrementalJSONParser()
+        async for text in self.llm.stream(prompt, user_id):
+            chunks.append(text)
+            yield "token", text
+            for member in parser.feed(text):
+                yield "field", member
+    
     def _ensure_valid_summary_format(self, result: Dict) -> Dict:
         """Ensure the summary response has the correct format"""
         # Default structure
@@ -122,22 +281,28 @@ class AIService:
         
         return formatted
     
-    async def predict_disease_risk(self, patient_data: Dict) -> Dict:
+    async def predict_disease_risk(self, patient_data: Dict,
+                                   user_id: Optional[str] = None,
+                                   cache_key: Optional[str] = None) -> Dict:
         """
-        Predict disease risk based on patient data
+        Predict disease risk based on patient data (local risk engine when
+        the AI is not configured or its answer is unusable)
         """
-        if not self.model:
-            return {"error": "Gemini API key not configured"}
+        if not self.llm:
+            return risk_engine.predict(patient_data)
         
         try:
-            clean_data = self._sanitize_for_json(patient_data)
-            print("Patient Data for Prediction:\n", json.dumps(clean_data, indent=2))
+            context = prompt_builder.patient_context(
+                patient_data.get("medical_history", []),
+                age=patient_data.get("age"),
+                gender=patient_data.get("gender")
+            )
             
             prompt = f"""
             As a medical AI, analyze this patient data and predict potential disease risks.
 
             Patient Data:
-            {json.dumps(clean_data, indent=2)}
+            {context}
             
             Provide your response in this EXACT JSON format (no markdown, no code blocks):
             {{
@@ -158,27 +323,24 @@ class AIService:
             - Return ONLY valid JSON, no markdown
             """
             
-            response = self.model.generate_content(prompt)
-            print("AI Prediction Response:\n", response.text)
+            response_text = await self.llm.generate(prompt, user_id)
+            print("AI Prediction Response:\n", response_text)
             
-            result = self._parse_ai_response(response.text)
+            result = self._parse_ai_response(response_text)
+            if "error" in result:
+                return risk_engine.predict(patient_data)
             
             # Ensure valid format
             result = self._ensure_valid_prediction_format(result)
             
+            await self._remember(cache_key, "predict", result)
             return result
             
+        except LLMError:
+            raise
         except Exception as e:
             print(f"Risk prediction error: {str(e)}")
-            return {
-                "risks": {
-                    "cardiovascular": {"risk_level": "unknown", "confidence": 0.0, "probability": 0},
-                    "diabetes": {"risk_level": "unknown", "confidence": 0.0, "probability": 0},
-                    "respiratory": {"risk_level": "unknown", "confidence": 0.0, "probability": 0}
-                },
-                "confidence": 0.0,
-                "recommendations": [f"Error: {str(e)}"]
-            }
+            return risk_engine.predict(patient_data)
     
     def _ensure_valid_prediction_format(self, result: Dict) -> Dict:
         """Ensure prediction response has correct format"""
@@ -218,71 +380,97 @@ class AIService:
         
         return formatted
     
-    async def generate_health_recommendations(self, patient_profile: Dict) -> List[str]:
+    def _recommendations_prompt(self, patient_profile: Dict) -> str:
+        context = prompt_builder.patient_context(
+            patient_profile.get("recent_records", []),
+            age=patient_profile.get("age"),
+            gender=patient_profile.get("gender")
+        )
+        return f"""
+        Based on this patient profile, provide 5-7 actionable health recommendations.
+        
+        Patient Profile:
+        {context}
+        
+        Provide your response as a JSON array of strings in this EXACT format:
+        ["recommendation 1", "recommendation 2", "recommendation 3", "recommendation 4", "recommendation 5"]
+        
+        Focus on:
+        - Diet improvements
+        - Exercise suggestions
+        - Medication adherence
+        - Lifestyle changes
+        - Preventive care
+        
+        Return ONLY a JSON array, no markdown, no code blocks.
+        """
+
+    def _recommendations_from(self, result) -> Optional[List[str]]:
+        """Recommendation strings from a parsed response, or None if it has none"""
+        # Ensure it's a list
+        if isinstance(result, list):
+            return [str(item) for item in result]
+        if isinstance(result, dict) and "recommendations" in result:
+            recs = result["recommendations"]
+            if isinstance(recs, list):
+                return [str(item) for item in recs]
+            return [str(recs)]
+        return None
+
+    async def generate_health_recommendations(self, patient_profile: Dict,
+                                              user_id: Optional[str] = None,
+                                              cache_key: Optional[str] = None) -> List[str]:
         """
         Generate personalized health recommendations
         """
-        if not self.model:
-            return ["Gemini API key not configured"]
+        if not self.llm:
+            return ["AI backend not configured"]
         
         try:
-            clean_profile = self._sanitize_for_json(patient_profile)
-            
-            prompt = f"""
-            Based on this patient profile, provide 5-7 actionable health recommendations.
+            prompt = self._recommendations_prompt(patient_profile)
             
-            Patient Profile:
-            {json.dumps(clean_profile, indent=2)}
-            
-            Provide your response as a JSON array of strings in this EXACT format:
-            ["recommendation 1", "recommendation 2", "recommendation 3", "recommendation 4", "recommendation 5"]
-            
-            Focus on:
-            - Diet improvements
-            - Exercise suggestions
-            - Medication adherence
-            - Lifestyle changes
-            - Preventive care
-            
-            Return ONLY a JSON array, no markdown, no code blocks.
-            """
+            response_text = await self.llm.generate(prompt, user_id)
+            print("Health Recommendations AI Response:\n", response_text)
             
-            response = self.model.generate_content(prompt)
-            print("Health Recommendations AI Response:\n", response.text)
-            
-            result = self._parse_ai_response(response.text)
-            
-            # Ensure it's a list
-            if isinstance(result, list):
-                return [str(item) for item in result]
-            elif isinstance(result, dict) and "recommendations" in result:
-                recs = result["recommendations"]
-                if isinstance(recs, list):
-                    return [str(item) for item in recs]
-                return [str(recs)]
-            else:
+            recommendations = self._recommendations_from(self._parse_ai_response(response_text))
+            if recommendations is None:
                 return ["Unable to generate recommendations at this time"]
             
+            await self._remember(cache_key, "recommendations", recommendations)
+            return recommendations
+            
+        except LLMError:
+            raise
         except Exception as e:
             print(f"Error generating recommendations: {str(e)}")
             return [f"Error generating recommendations: {str(e)}"]
     
-    def _format_records_for_ai(self, records: List[Dict]) -> str:
-        """Format medical records for AI processing"""
-        if not records:
-            return "No medical records available"
+    async def stream_health_recommendations(self, patient_profile: Dict,
+                                            user_id: Optional[str] = None,
+                                            cache_key: Optional[str] = None
+                                            ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming generate_health_recommendations: yields ("token", text)
+        deltas, ("field", {"index", "value"}) per completed recommendation and
+        finally ("result", recommendations)
+        """
+        if not self.llm:
+            yield "error", {"status_code": 503, "detail": "AI backend not configured"}
+            return
         
-        formatted = []
-        for record in records:
-            formatted.append(f"""
-            Type: {record.get('record_type', 'Unknown')}
-            Title: {record.get('title', 'No title')}
-            Description: {record.get('description', 'N/A')}
-            Date: {record.get('created_at', 'Unknown date')}
-            Diagnosis: {record.get('diagnosis', 'N/A')}
-            Medications: {', '.join(record.get('medications', [])) or 'None'}
-            """)
-        return "\n---\n".join(formatted)
+        chunks = []
+        prompt = self._recommendations_prompt(patient_profile)
+        async for event, data in self._stream_json(prompt, user_id, chunks):
+            if event == "field":
+                data = {"index": data[0], "value": str(data[1])}
+            yield event, data
+        
+        recommendations = self._recommendations_from(self._parse_ai_response("".join(chunks)))
+        if recommendations is None:
+            recommendations = ["Unable to generate recommendations at this time"]
+        else:
+            await self._remember(cache_key, "recommendations", recommendations)
+        yield "result", recommendations
     
     def _parse_ai_response(self, response_text: str) -> Dict:
         """Parse AI response, handle JSON extraction"""
@@ -0,0 +1,218 @@
+# app/services/appointment_scheduler.py
+import asyncio
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.database import get_database
+from app.models.schemas import AppointmentStatus
+from app.services.calendar_counters import calendar_counters
+from app.services.timer_wheel import HierarchicalTimerWheel
+
+REMINDER = "reminder"
+NO_SHOW = "no_show"
+ACTIVE_STATUSES = [AppointmentStatus.SCHEDULED.value, AppointmentStatus.CONFIRMED.value]
+
+def _ts(instant: datetime) -> float:
+    return instant.replace(tzinfo=timezone.utc).timestamp()
+
+class AppointmentScheduler:
+    """
+    Reminder and no-show timers on a hierarchical timer wheel.
+
+    Appointments are the persistent timer store: a reminder is due at
+    `start - REMINDER_LEAD_MINUTES` until `reminder_sent_at` is set, and a
+    still-unconfirmed appointment becomes a no-show at
+    `end + NO_SHOW_GRACE_MINUTES`. Only timers due within
+    SCHEDULER_HORIZON_HOURS are held in the wheel; it is refilled from
+    Mongo as time moves on and rebuilt after a restart, when reminders and
+    no-shows missed within SCHEDULER_RECOVERY_HOURS are caught up first.
+    Timers that fire together are handled in one batched query each; the
+    batch is then claimed with one guarded update_many that stamps a claim
+    token, and only the appointments carrying it are notified or counted,
+    so a concurrent status change or a second scheduler never
+    double-handles one.
+    """
+
+    def __init__(self):
+        self.tick = settings.SCHEDULER_TICK_SECONDS
+        self.lead = timedelta(minutes=settings.REMINDER_LEAD_MINUTES)
+        self.grace = timedelta(minutes=settings.NO_SHOW_GRACE_MINUTES)
+        self.horizon = timedelta(hours=settings.SCHEDULER_HORIZON_HOURS)
+        self.recovery = timedelta(hours=settings.SCHEDULER_RECOVERY_HOURS)
+        self.batch_size = settings.SCHEDULER_BATCH_SIZE
+        self._wheel: Optional[HierarchicalTimerWheel] = None
+        self._loaded_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the scheduler loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the scheduler loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                db = await get_database()
+                await self.run_once(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Appointment scheduler error: {e}")
+            await asyncio.sleep(self.tick)
+
+    def appointment_booked(self, appointment: Dict):
+        """Add timers for a new appointment that fall inside the loaded horizon"""
+        if self._wheel is None:
+            return
+        for kind, due_at in ((REMINDER, appointment["start"] - self.lead),
+                             (NO_SHOW, appointment["end"] + self.grace)):
+            if due_at <= self._loaded_until:
+                self._wheel.add(_ts(due_at), (kind, appointment["_id"]))
+
+    async def run_once(self, db, now: Optional[datetime] = None):
+        """Advance the wheel to now and fire whatever came due"""
+        now = now or datetime.utcnow()
+        if self._wheel is None:
+            await self._recover(db, now)
+        if self._loaded_until - now < self.horizon / 2:
+            await self._load(db, self._loaded_until, now + self.horizon)
+
+        due = self._wheel.advance(_ts(now))
+        reminders = [appointment_id for kind, appointment_id in due if kind == REMINDER]
+        no_shows = [appointment_id for kind, appointment_id in due if kind == NO_SHOW]
+        for i in range(0, len(reminders), self.batch_size):
+            await self._send_reminders(db, {"_id": {"$in": reminders[i:i + self.batch_size]}}, now)
+        for i in range(0, len(no_shows), self.batch_size):
+            await self._mark_no_shows(db, {"_id": {"$in": no_shows[i:i + self.batch_size]}}, now)
+
+    async def _recover(self, db, now: datetime):
+        """Catch up on anything missed while not running, then fill the wheel"""
+        self._wheel = HierarchicalTimerWheel(self.tick, _ts(now))
+        while await self._mark_no_shows(
+            db, {"end": {"$gt": now - self.recovery, "$lte": now - self.grace}}, now,
+            limit=self.batch_size
+        ) == self.batch_size:
+            pass
+        while await self._send_reminders(
+            db, {"start": {"$gt": now, "$lte": now + self.lead}}, now, limit=self.batch_size
+        ) == self.batch_size:
+            pass
+        self._loaded_until = now
+        await self._load(db, now, now + self.horizon)
+
+    async def _load(self, db, since: datetime, until: datetime):
+        """Add timers due in (since, until] to the wheel"""
+        async for appointment in db.appointments.find(
+            {
+                "status": {"$in": ACTIVE_STATUSES},
+                "reminder_sent_at": {"$exists": False},
+                "start": {"$gt": since + self.lead, "$lte": until + self.lead}
+            },
+            {"start": 1}
+        ):
+            self._wheel.add(_ts(appointment["start"] - self.lead), (REMINDER, appointment["_id"]))
+
+        async for appointment in db.appointments.find(
+            {
+                "status": AppointmentStatus.SCHEDULED.value,
+                "end": {"$gt": since - self.grace, "$lte": until - self.grace}
+            },
+            {"end": 1}
+        ):
+            self._wheel.add(_ts(appointment["end"] + self.grace), (NO_SHOW, appointment["_id"]))
+
+        self._loaded_until = until
+
+    async def _claim(self, db, appointments: List[Dict], guard: Dict, changes: Dict,
+                     projection: Dict) -> List[Dict]:
+        """
+        Set `changes` on the appointments still matching `guard` in one
+        update_many, stamping them with a claim token; returns exactly those
+        """
+        claim_id = str(uuid.uuid4())
+        ids = [appointment["_id"] for appointment in appointments]
+        await db.appointments.update_many(
+            {"_id": {"$in": ids}, **guard},
+            {"$set": {**changes, "claim_id": claim_id}}
+        )
+        return await db.appointments.find(
+            {"_id": {"$in": ids}, "claim_id": claim_id}, projection
+        ).to_list(None)
+
+    async def _send_reminders(self, db, query: Dict, now: datetime,
+                              limit: Optional[int] = None) -> int:
+        """
+        Record reminder notifications for matching unsent appointments.
+        Returns how many matched, so callers can page through a backlog.
+        """
+        guard = {"status": {"$in": ACTIVE_STATUSES}, "reminder_sent_at": {"$exists": False}}
+        projection = {"patient_id": 1, "doctor_name": 1, "appointment_date": 1, "start_time": 1}
+        cursor = db.appointments.find({**query, **guard}, projection)
+        if limit:
+            cursor = cursor.limit(limit)
+        appointments = await cursor.to_list(None)
+        if not appointments:
+            return 0
+
+        claimed = await self._claim(db, appointments, guard, {"reminder_sent_at": now}, projection)
+        if claimed:
+            await db.notifications.insert_many([
+                {
+                    "user_id": appointment["patient_id"],
+                    "type": "appointment_reminder",
+                    "appointment_id": str(appointment["_id"]),
+                    "message": (
+                        f"Reminder: appointment with {appointment['doctor_name']} on "
+                        f"{appointment['appointment_date']} at {appointment['start_time']}"
+                    ),
+                    "is_read": False,
+                    "created_at": now
+                }
+                for appointment in claimed
+            ])
+            print(f"🔔 Sent {len(claimed)} appointment reminders")
+        return len(appointments)
+
+    async def _mark_no_shows(self, db, query: Dict, now: datetime,
+                             limit: Optional[int] = None) -> int:
+        """
+        Mark matching still-unconfirmed appointments as no-shows.
+        Returns how many matched, so callers can page through a backlog.
+        """
+        guard = {"status": AppointmentStatus.SCHEDULED.value}
+        projection = {"doctor_id": 1, "appointment_date": 1}
+        cursor = db.appointments.find({**query, **guard}, projection)
+        if limit:
+            cursor = cursor.limit(limit)
+        appointments = await cursor.to_list(None)
+        if not appointments:
+            return 0
+
+        claimed = await self._claim(
+            db, appointments, guard,
+            {"status": AppointmentStatus.NO_SHOW.value, "updated_at": now}, projection
+        )
+        if claimed:
+            await calendar_counters.bulk_status_changed(
+                db,
+                Counter((a["doctor_id"], a["appointment_date"]) for a in claimed),
+                AppointmentStatus.SCHEDULED.value,
+                AppointmentStatus.NO_SHOW.value
+            )
+            print(f"🚫 Marked {len(claimed)} appointments as no-show")
+        return len(appointments)
+
+# Global appointment scheduler instance
+appointment_scheduler = AppointmentScheduler()
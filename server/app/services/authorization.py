@@ -0,0 +1,306 @@
+# app/services/authorization.py
+from bisect import bisect_left
+from bson import ObjectId
+from cachetools import TTLCache
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.services.consent_cache import ConsentCache
+from app.services.emergency import EMERGENCY_RECORD_TYPES
+
+_MISSING = object()
+_ALL_RECORDS = "*"
+
+# A break-glass grant exposes the critical record types only
+EMERGENCY_RECORD_FILTER = {"record_type": {"$in": EMERGENCY_RECORD_TYPES}}
+
+def _consent_scope(consent: Dict) -> Optional[List[ObjectId]]:
+    """Sorted record ObjectIds a consent covers, or None for all records"""
+    if "resolved_record_ids" in consent:
+        return consent["resolved_record_ids"]
+    record_ids = consent.get("record_ids")
+    if not record_ids:
+        return None
+    return sorted(ObjectId(r) for r in record_ids if ObjectId.is_valid(r))
+
+def _scope_contains(scope: List[ObjectId], record_id: str) -> bool:
+    if not ObjectId.is_valid(record_id):
+        return False
+    oid = ObjectId(record_id)
+    index = bisect_left(scope, oid)
+    return index < len(scope) and scope[index] == oid
+
+class AuthorizationService:
+    """
+    Care-relationship index answering "may this doctor see this patient".
+
+    One document per (doctor_id, patient_id) pair in `care_relationships`,
+    maintained incrementally by booking and consent changes, with an
+    in-process TTL cache in front of it.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            maxsize=settings.AUTHZ_CACHE_MAX_SIZE,
+            ttl=settings.AUTHZ_CACHE_TTL_SECONDS
+        )
+        self.consent_cache = ConsentCache(max_size=settings.CONSENT_CACHE_MAX_SIZE)
+
+    def invalidate(self, patient_id: str, doctor_id: str):
+        """Drop cached relationship and consent decisions for a doctor/patient pair"""
+        self._cache.pop((patient_id, doctor_id), None)
+        self.consent_cache.invalidate_pair(patient_id, doctor_id)
+
+    async def get_relationship(self, db, patient_id: str, doctor_id: str) -> Optional[Dict]:
+        """Get the care relationship for a pair (cached, misses included)"""
+        key = (patient_id, doctor_id)
+        relationship = self._cache.get(key, _MISSING)
+        if relationship is not _MISSING:
+            return relationship
+
+        relationship = await db.care_relationships.find_one(
+            {"doctor_id": doctor_id, "patient_id": patient_id},
+            {"_id": 0, "has_appointment": 1, "consent_expires_at": 1, "emergency_expires_at": 1}
+        )
+        self._cache[key] = relationship
+        return relationship
+
+    async def is_treating_doctor(self, db, patient_id: str, doctor_id: str) -> bool:
+        """Check if doctor has had an appointment with the patient"""
+        relationship = await self.get_relationship(db, patient_id, doctor_id)
+        return bool(relationship and relationship.get("has_appointment"))
+
+    async def has_active_consent(self, db, patient_id: str, doctor_id: str) -> bool:
+        """Check if doctor holds an approved, unexpired consent"""
+        relationship = await self.get_relationship(db, patient_id, doctor_id)
+        if not relationship or not relationship.get("consent_expires_at"):
+            return False
+        return relationship["consent_expires_at"] > datetime.utcnow()
+
+    async def has_emergency_access(self, db, patient_id: str, doctor_id: str,
+                                   record: Optional[Dict] = None) -> bool:
+        """
+        Check if doctor holds an unexpired break-glass grant (that covers
+        `record`, when given: only EMERGENCY_RECORD_TYPES are covered)
+        """
+        if record is not None and record.get("record_type") not in EMERGENCY_RECORD_TYPES:
+            return False
+        relationship = await self.get_relationship(db, patient_id, doctor_id)
+        if not relationship or not relationship.get("emergency_expires_at"):
+            return False
+        return relationship["emergency_expires_at"] > datetime.utcnow()
+
+    async def has_record_consent(self, db, patient_id: str, doctor_id: str,
+                                 record_id: Optional[str] = None) -> bool:
+        """
+        Check if doctor holds an approved, unexpired consent covering record_id.
+        Consents with record_ids only cover those records. Grants are cached
+        until the consent expires, denials for CONSENT_CACHE_NEGATIVE_TTL_SECONDS.
+        """
+        key = (patient_id, doctor_id, record_id)
+        allowed = self.consent_cache.get(key)
+        if allowed is not None:
+            return allowed
+
+        now = datetime.utcnow()
+        expires_at = None
+        async for consent in self._active_consents(db, patient_id, doctor_id, now):
+            scope = _consent_scope(consent)
+            if record_id is None or scope is None or _scope_contains(scope, record_id):
+                if expires_at is None or consent["expires_at"] > expires_at:
+                    expires_at = consent["expires_at"]
+
+        if expires_at is not None:
+            self.consent_cache.put(key, True, expires_at)
+            return True
+
+        self.consent_cache.put(
+            key, False, now + timedelta(seconds=settings.CONSENT_CACHE_NEGATIVE_TTL_SECONDS)
+        )
+        return False
+
+    async def visible_records_filter(self, db, patient_id: str, doctor_id: str,
+                                     emergency: bool = False) -> Optional[Dict]:
+        """
+        Mongo filter restricting medical_records to those the doctor may see.
+        Returns {} for full access (treating doctor or an unscoped consent),
+        an `_id: {$in: [...]}` filter for record-scoped consents, or None
+        when the doctor has no access at all. With emergency, an active
+        break-glass grant adds the critical record types.
+        """
+        if await self.is_treating_doctor(db, patient_id, doctor_id):
+            return {}
+        record_filter = await self._consent_filter(db, patient_id, doctor_id)
+        if record_filter == {} or not emergency:
+            return record_filter
+        if not await self.has_emergency_access(db, patient_id, doctor_id):
+            return record_filter
+        if record_filter is None:
+            return EMERGENCY_RECORD_FILTER
+        return {"$or": [record_filter, EMERGENCY_RECORD_FILTER]}
+
+    async def _consent_filter(self, db, patient_id: str, doctor_id: str) -> Optional[Dict]:
+        """The records the doctor's active consents cover, as a filter (cached)"""
+        key = (patient_id, doctor_id, _ALL_RECORDS)
+        cached = self.consent_cache.get(key)
+        if cached is not None:
+            return cached
+
+        now = datetime.utcnow()
+        visible = set()
+        full_access = False
+        expires_at = None
+        async for consent in self._active_consents(db, patient_id, doctor_id, now):
+            scope = _consent_scope(consent)
+            if scope is None:
+                full_access = True
+            else:
+                visible.update(scope)
+            # The visible set changes as soon as any contributing consent expires
+            if expires_at is None or consent["expires_at"] < expires_at:
+                expires_at = consent["expires_at"]
+
+        if expires_at is None:
+            return None
+
+        record_filter = {} if full_access else {"_id": {"$in": sorted(visible)}}
+        self.consent_cache.put(key, record_filter, expires_at)
+        return record_filter
+
+    async def resolve_consent_scope(self, db, patient_id: str,
+                                    record_ids: Optional[List[str]]) -> Optional[List[ObjectId]]:
+        """Resolve requested record_ids to the patient's existing records, sorted"""
+        if not record_ids:
+            return None
+        requested = [ObjectId(r) for r in record_ids if ObjectId.is_valid(r)]
+        resolved = await db.medical_records.distinct("_id", {
+            "_id": {"$in": requested},
+            "patient_id": patient_id,
+            "deleted": {"$ne": True}
+        })
+        return sorted(resolved)
+
+    def _active_consents(self, db, patient_id: str, doctor_id: str, now: datetime):
+        return db.consent_logs.find(
+            {
+                "patient_id": patient_id,
+                "doctor_id": doctor_id,
+                "status": "approved",
+                "expires_at": {"$gt": now}
+            },
+            {"record_ids": 1, "resolved_record_ids": 1, "expires_at": 1}
+        )
+
+    async def can_access(self, db, patient_id: str, doctor_id: str) -> bool:
+        """Check if doctor is treating the patient or holds active consent"""
+        if await self.is_treating_doctor(db, patient_id, doctor_id):
+            return True
+        return await self.has_active_consent(db, patient_id, doctor_id)
+
+    async def record_appointment(self, db, patient_id: str, doctor_id: str):
+        """Mark the pair as having a treatment relationship"""
+        await db.care_relationships.update_one(
+            {"doctor_id": doctor_id, "patient_id": patient_id},
+            {
+                "$set": {"has_appointment": True, "updated_at": datetime.utcnow()},
+                "$setOnInsert": {"created_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+        self.invalidate(patient_id, doctor_id)
+
+    async def record_consent_granted(self, db, patient_id: str, doctor_id: str,
+                                     expires_at: datetime):
+        """Extend the pair's consent window to at least expires_at"""
+        await db.care_relationships.update_one(
+            {"doctor_id": doctor_id, "patient_id": patient_id},
+            {
+                "$max": {"consent_expires_at": expires_at},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$setOnInsert": {"created_at": datetime.utcnow(), "has_appointment": False}
+            },
+            upsert=True
+        )
+        self.invalidate(patient_id, doctor_id)
+
+    async def grant_emergency(self, db, patient_id: str, doctor_id: str,
+                              expires_at: datetime):
+        """Grant time-boxed break-glass access, skipping consent"""
+        await db.care_relationships.update_one(
+            {"doctor_id": doctor_id, "patient_id": patient_id},
+            {
+                "$max": {"emergency_expires_at": expires_at},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$setOnInsert": {"created_at": datetime.utcnow(), "has_appointment": False}
+            },
+            upsert=True
+        )
+        self.invalidate(patient_id, doctor_id)
+
+    async def refresh_consent(self, db, patient_id: str, doctor_id: str):
+        """Recompute the consent window from consent_logs (after revoke/expiry)"""
+        latest = await db.consent_logs.find_one(
+            {
+                "patient_id": patient_id,
+                "doctor_id": doctor_id,
+                "status": "approved",
+                "expires_at": {"$gt": datetime.utcnow()}
+            },
+            {"expires_at": 1},
+            sort=[("expires_at", -1)]
+        )
+        await db.care_relationships.update_one(
+            {"doctor_id": doctor_id, "patient_id": patient_id},
+            {
+                "$set": {
+                    "consent_expires_at": latest["expires_at"] if latest else None,
+                    "updated_at": datetime.utcnow()
+                }
+            }
+        )
+        self.invalidate(patient_id, doctor_id)
+
+    async def rebuild(self, db):
+        """Rebuild care_relationships from appointments and consent_logs"""
+        now = datetime.utcnow()
+        operations = []
+
+        async for pair in db.appointments.aggregate([
+            {"$group": {"_id": {"doctor_id": "$doctor_id", "patient_id": "$patient_id"}}}
+        ]):
+            operations.append(UpdateOne(
+                pair["_id"],
+                {
+                    "$set": {"has_appointment": True, "updated_at": now},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            ))
+
+        async for pair in db.consent_logs.aggregate([
+            {"$match": {"status": "approved", "expires_at": {"$gt": now}}},
+            {"$group": {
+                "_id": {"doctor_id": "$doctor_id", "patient_id": "$patient_id"},
+                "expires_at": {"$max": "$expires_at"}
+            }}
+        ]):
+            operations.append(UpdateOne(
+                pair["_id"],
+                {
+                    "$max": {"consent_expires_at": pair["expires_at"]},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"created_at": now, "has_appointment": False}
+                },
+                upsert=True
+            ))
+
+        if operations:
+            await db.care_relationships.bulk_write(operations, ordered=False)
+        self._cache.clear()
+        self.consent_cache.clear()
+
+        print(f"✅ Care relationship index rebuilt ({len(operations)} updates)")
+
+# Global authorization service instance
+authorization_service = AuthorizationService()
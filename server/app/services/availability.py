@@ -0,0 +1,153 @@
+# app/services/availability.py
+from bisect import bisect_left
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+from app.core.timeutils import to_instant
+from app.services.slot_index import slot_index
+from app.services.slot_search import free_slot_index
+
+SlotKey = Tuple[str, str, str]  # (date, start_time, end_time) as ISO strings
+
+# Slots never span more than a day, which bounds the overlap lookups
+MAX_SLOT_LENGTH = timedelta(days=1)
+
+def generate_template_slots(template: Dict) -> List[SlotKey]:
+    """Expand a recurring template into (date, start_time, end_time) slots"""
+    slots = []
+    step = timedelta(minutes=template["slot_minutes"])
+    day = template["start_date"]
+    while day <= template["end_date"]:
+        if day.weekday() in template["weekdays"]:
+            slot_start = datetime.combine(day, template["start_time"])
+            day_end = datetime.combine(day, template["end_time"])
+            while slot_start + step <= day_end:
+                slot_end = slot_start + step
+                slots.append((
+                    day.isoformat(),
+                    slot_start.time().isoformat(),
+                    slot_end.time().isoformat()
+                ))
+                slot_start = slot_end
+        day += timedelta(days=1)
+    return slots
+
+class AvailabilityService:
+    """
+    Slot overlap checks and bulk slot generation for recurring templates.
+
+    Mongo is the authority on overlaps: the per-process slot index cannot
+    see other workers' writes. New slots are checked against the doctor's
+    stored slots (open or booked) on the native `start`/`end` instants
+    before they are inserted and again afterwards; of two overlapping slots
+    the one with the smaller _id wins, so when workers race exactly the
+    later insert is removed.
+    """
+
+    async def find_conflicts(self, db, doctor_id: str, slots: List[Dict]) -> Set[ObjectId]:
+        """Ids of `slots` (with _id, start, end) overlapping an older slot of the doctor"""
+        if not slots:
+            return set()
+        stored = await db.doctor_availability.find(
+            {
+                "doctor_id": doctor_id,
+                "start": {
+                    "$gt": min(slot["start"] for slot in slots) - MAX_SLOT_LENGTH,
+                    "$lt": max(slot["end"] for slot in slots)
+                }
+            },
+            {"start": 1, "end": 1}
+        ).sort("start", 1).to_list(None)
+        starts = [slot["start"] for slot in stored]
+
+        conflicts = set()
+        for slot in slots:
+            # Only slots starting within MAX_SLOT_LENGTH before this one can reach into it
+            index = bisect_left(starts, slot["end"]) - 1
+            while index >= 0 and starts[index] > slot["start"] - MAX_SLOT_LENGTH:
+                other = stored[index]
+                if other["_id"] < slot["_id"] and other["end"] > slot["start"]:
+                    conflicts.add(slot["_id"])
+                    break
+                index -= 1
+        return conflicts
+
+    async def discard_conflicts(self, db, doctor_id: str, slots: List[Dict]) -> Set[ObjectId]:
+        """Delete inserted `slots` that lost an overlap race; returns their ids"""
+        conflicts = await self.find_conflicts(db, doctor_id, slots)
+        if conflicts:
+            await db.doctor_availability.delete_many(
+                {"_id": {"$in": list(conflicts)}, "is_available": True}
+            )
+        return conflicts
+
+    async def apply_template(self, db, doctor_id: str, template_id: ObjectId,
+                             template: Dict) -> Dict[str, int]:
+        """
+        Bring a template's slots in line with its definition.
+        Only open slots that are no longer wanted are deleted and only
+        missing slots are inserted; booked slots are never touched.
+        """
+        desired = generate_template_slots(template)
+        desired_keys = set(desired)
+
+        existing: Dict[SlotKey, Dict] = {}
+        async for slot in db.doctor_availability.find(
+            {"doctor_id": doctor_id, "template_id": template_id},
+            {"date": 1, "start_time": 1, "end_time": 1, "is_available": 1}
+        ):
+            existing[(slot["date"], slot["start_time"], slot["end_time"])] = slot
+
+        stale = [
+            (key, slot) for key, slot in existing.items()
+            if key not in desired_keys and slot["is_available"]
+        ]
+        if stale:
+            await db.doctor_availability.delete_many(
+                {"_id": {"$in": [slot["_id"] for _, slot in stale]}}
+            )
+            for (slot_date, start_time, _), slot in stale:
+                slot_index.remove_slot(doctor_id, slot_date, str(slot["_id"]), start_time)
+                free_slot_index.remove(str(slot["_id"]))
+
+        to_create = [key for key in desired if key not in existing]
+        now = datetime.utcnow()
+        new_slots = [
+            {
+                "_id": ObjectId(),
+                "doctor_id": doctor_id,
+                "template_id": template_id,
+                "date": slot_date,
+                "start_time": start_time,
+                "end_time": end_time,
+                "start": to_instant(slot_date, start_time),
+                "end": to_instant(slot_date, end_time),
+                "is_available": True,
+                "created_at": now,
+                "updated_at": now
+            }
+            for slot_date, start_time, end_time in to_create
+        ]
+        conflicts = await self.find_conflicts(db, doctor_id, new_slots)
+        new_slots = [slot for slot in new_slots if slot["_id"] not in conflicts]
+        skipped = len(conflicts)
+
+        if new_slots:
+            await db.doctor_availability.insert_many(new_slots, ordered=False)
+            lost = await self.discard_conflicts(db, doctor_id, new_slots)
+            new_slots = [slot for slot in new_slots if slot["_id"] not in lost]
+            skipped += len(lost)
+            for slot in new_slots:
+                slot_index.add_slot(
+                    doctor_id, slot["date"], slot["start_time"], slot["end_time"], str(slot["_id"])
+                )
+                free_slot_index.add(str(slot["_id"]), slot)
+
+        return {
+            "slots_created": len(new_slots),
+            "slots_removed": len(stale),
+            "slots_skipped": skipped
+        }
+
+# Global availability service instance
+availability_service = AvailabilityService()
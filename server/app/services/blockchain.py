@@ -2,7 +2,7 @@
 import hashlib
 import json
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import uuid
 
 class BlockchainService:
@@ -49,6 +49,10 @@ class BlockchainService:
         """Get the last block in the chain"""
         return self.chain[-1] if self.chain else None
     
+    def seal_pending(self) -> Dict:
+        """Commit all pending transactions into a new block"""
+        return self.create_block(proof=1, previous_hash=self.hash_block(self.get_last_block()))
+    
     async def record_medical_data(self, patient_id: str, record_hash: str, 
                                    ipfs_hash: str, metadata: Dict) -> str:
         """Record medical data transaction on blockchain"""
@@ -96,6 +100,11 @@ class BlockchainService:
         }
         tx_id = self.add_transaction(transaction_data)
         
+        # Emergency access is high priority: commit now instead of waiting
+        # for the next block
+        if is_emergency:
+            self.seal_pending()
+        
         # In production: Submit to Hyperledger Fabric
         # fabric_gateway.submit_transaction('RecordAccess', ...)
         
@@ -131,6 +140,26 @@ class BlockchainService:
         
         return tx_id
     
+    async def revoke_consents(self, revocations: List[Dict]) -> List[str]:
+        """Revoke many consents in one group commit (a single block)"""
+        tx_ids = []
+        for revocation in revocations:
+            tx_ids.append(self.add_transaction({
+                'type': 'consent_revocation',
+                'patient_id': revocation['patient_id'],
+                'doctor_id': revocation['doctor_id'],
+                'consent_id': revocation.get('consent_id'),
+                'reason': revocation.get('reason', 'revoked'),
+                'timestamp': datetime.utcnow().isoformat()
+            }))
+        
+        if tx_ids:
+            self.seal_pending()
+        
+        # In production: Submit as one Hyperledger Fabric transaction batch
+        
+        return tx_ids
+    
     def get_transaction_history(self, patient_id: str) -> list:
         """Get all transactions for a patient"""
         history = []
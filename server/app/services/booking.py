@@ -0,0 +1,150 @@
+# app/services/booking.py
+import asyncio
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, Optional
+from pymongo import ReturnDocument
+from app.models.schemas import AppointmentStatus, UserRole
+from app.services.authorization import authorization_service
+from app.services.calendar_counters import calendar_counters
+from app.services.patient_panel import patient_panel_service
+from app.services.appointment_scheduler import appointment_scheduler
+from app.services.slot_index import slot_index
+from app.services.slot_search import free_slot_index
+
+class BookingError(Exception):
+    """Raised when an appointment cannot be booked"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class BookingService:
+    """
+    Appointment booking engine.
+
+    A slot is claimed with one conditional find_one_and_update on
+    `is_available`, so concurrent requests for the same slot cannot both
+    succeed. The appointment is built from in-memory data and the
+    remaining side-effect writes run concurrently.
+    """
+
+    async def book(self, db, patient: Dict, doctor_id: str, slot_id: str,
+                   reason: str, notes: Optional[str] = None,
+                   hold_id: Optional[str] = None) -> Dict:
+        """
+        Book slot_id for patient; returns the inserted appointment document.
+        With hold_id, the slot must instead be held for that waitlist offer.
+        """
+        patient_id = str(patient["_id"])
+        now = datetime.utcnow()
+
+        # Slots without an instant (tagged instant_error) cannot be booked
+        claim = {
+            "_id": ObjectId(slot_id),
+            "doctor_id": doctor_id,
+            "is_available": True,
+            "start": {"$exists": True}
+        }
+        if hold_id:
+            claim.update({
+                "is_available": False,
+                "held_for": hold_id,
+                "hold_expires_at": {"$gt": now}
+            })
+
+        doctor, slot = await asyncio.gather(
+            db.users.find_one(
+                {"_id": ObjectId(doctor_id), "role": UserRole.DOCTOR.value},
+                {"full_name": 1}
+            ),
+            db.doctor_availability.find_one_and_update(
+                claim,
+                {
+                    "$set": {"is_available": False, "booked_by": patient_id, "updated_at": now},
+                    "$unset": {"held_for": "", "hold_expires_at": ""}
+                },
+                return_document=ReturnDocument.AFTER
+            )
+        )
+
+        if not doctor:
+            if slot:
+                await self.release_slot(db, slot_id)
+            raise BookingError(404, "Doctor not found")
+
+        if not slot:
+            raise BookingError(400, "Slot is not available")
+
+        slot_index.remove_slot(doctor_id, slot["date"], slot_id, slot["start_time"])
+        free_slot_index.remove(slot_id)
+
+        appointment = {
+            "patient_id": patient_id,
+            "patient_name": patient["full_name"],
+            "doctor_id": doctor_id,
+            "doctor_name": doctor["full_name"],
+            "slot_id": slot_id,
+            "appointment_date": slot["date"],
+            "start_time": slot["start_time"],
+            "end_time": slot["end_time"],
+            "start": slot["start"],
+            "end": slot["end"],
+            "reason": reason,
+            "notes": notes,
+            "status": AppointmentStatus.SCHEDULED.value,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        try:
+            await db.appointments.insert_one(appointment)
+        except Exception:
+            await self.release_slot(db, slot_id)
+            raise
+
+        appointment_scheduler.appointment_booked(appointment)
+
+        await asyncio.gather(
+            # Add patient to doctor's patient list if not already there
+            db.users.update_one(
+                {"_id": ObjectId(doctor_id)},
+                {"$addToSet": {"patient_list": patient_id}}
+            ),
+            # Index the doctor-patient relationship for authorization checks
+            authorization_service.record_appointment(db, patient_id, doctor_id),
+            # Month calendar counters
+            calendar_counters.appointment_booked(
+                db, doctor_id, appointment["appointment_date"], appointment["status"]
+            ),
+            # Doctor's patient panel
+            patient_panel_service.record_appointment(
+                db, doctor_id, patient, appointment["appointment_date"]
+            )
+        )
+
+        return appointment
+
+    async def release_slot(self, db, slot_id: str, hold_id: Optional[str] = None):
+        """
+        Make a claimed slot bookable again. With hold_id, only if it is
+        still held for that waitlist offer; otherwise only if it is not held.
+        """
+        slot = await db.doctor_availability.find_one_and_update(
+            {"_id": ObjectId(slot_id), "is_available": False, "held_for": hold_id},
+            {
+                "$set": {"is_available": True, "updated_at": datetime.utcnow()},
+                "$unset": {"booked_by": "", "held_for": "", "hold_expires_at": ""}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if slot:
+            slot_index.add_slot(
+                slot["doctor_id"], slot["date"], slot["start_time"], slot["end_time"], slot_id
+            )
+            free_slot_index.add(slot_id, slot)
+        return slot
+
+# Global booking service instance
+booking_service = BookingService()
@@ -0,0 +1,176 @@
+# app/services/calendar_counters.py
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_database
+
+class CalendarCounterService:
+    """
+    Per doctor-day appointment counts by status, in `doctor_day_counters`.
+
+    Maintained with $inc on booking and status changes so the month view
+    reads at most 31 small documents instead of aggregating appointments.
+    `reconcile` corrects drift against `appointments`.
+    """
+
+    async def _inc(self, db, doctor_id: str, day: str, deltas: Dict[str, int]):
+        await db.doctor_day_counters.update_one(
+            {"doctor_id": doctor_id, "date": day},
+            {
+                "$inc": {
+                    **{f"counts.{status}": delta for status, delta in deltas.items()},
+                    "total": sum(deltas.values())
+                },
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    async def appointment_booked(self, db, doctor_id: str, day: str, status: str):
+        """Count a newly booked appointment"""
+        await self._inc(db, doctor_id, day, {status: 1})
+
+    async def status_changed(self, db, doctor_id: str, day: str,
+                             old_status: str, new_status: str):
+        """Move an appointment between status buckets (cancellation included)"""
+        if old_status != new_status:
+            await self._inc(db, doctor_id, day, {old_status: -1, new_status: 1})
+
+    async def bulk_status_changed(self, db, moved: Dict[Tuple[str, str], int],
+                                  old_status: str, new_status: str):
+        """Move many appointments, counted per (doctor_id, date), between buckets"""
+        if not moved:
+            return
+        now = datetime.utcnow()
+        await db.doctor_day_counters.bulk_write([
+            UpdateOne(
+                {"doctor_id": doctor_id, "date": day},
+                {
+                    "$inc": {f"counts.{old_status}": -count, f"counts.{new_status}": count},
+                    "$set": {"updated_at": now}
+                },
+                upsert=True
+            )
+            for (doctor_id, day), count in moved.items()
+        ], ordered=False)
+
+    async def get_range(self, db, doctor_id: str, date_from: str, date_to: str) -> List[Dict]:
+        """Counters for days with appointments in [date_from, date_to]"""
+        cursor = db.doctor_day_counters.find(
+            {"doctor_id": doctor_id, "date": {"$gte": date_from, "$lte": date_to}, "total": {"$gt": 0}},
+            {"_id": 0, "date": 1, "total": 1, "counts": 1}
+        ).sort("date", 1)
+        return [
+            {
+                "date": doc["date"],
+                "count": doc["total"],
+                "by_status": {status: n for status, n in doc.get("counts", {}).items() if n}
+            }
+            async for doc in cursor
+        ]
+
+    async def reconcile(self, db, doctor_id: Optional[str] = None) -> int:
+        """
+        Correct counters that disagree with appointments; returns the number
+        of days corrected. Per-status counts and `total` are each corrected
+        to the aggregated counts. Corrections are applied as $inc deltas so they
+        compose with concurrent bookings, and days with an appointment
+        changed in the last CALENDAR_RECONCILE_SETTLE_SECONDS are left for
+        the next run (their own $inc may still be in flight).
+        """
+        match = {"doctor_id": doctor_id} if doctor_id else {}
+        settled_before = datetime.utcnow() - timedelta(seconds=settings.CALENDAR_RECONCILE_SETTLE_SECONDS)
+
+        expected: Dict[tuple, Dict[str, int]] = {}
+        unsettled = set()
+        async for group in db.appointments.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"doctor_id": "$doctor_id", "date": "$appointment_date", "status": "$status"},
+                "count": {"$sum": 1},
+                "changed_at": {"$max": "$updated_at"}
+            }}
+        ]):
+            key = (group["_id"]["doctor_id"], group["_id"]["date"])
+            expected.setdefault(key, {})[group["_id"]["status"]] = group["count"]
+            changed_at = group.get("changed_at")
+            if isinstance(changed_at, datetime) and changed_at >= settled_before:
+                unsettled.add(key)
+
+        stored: Dict[tuple, Dict[str, int]] = {}
+        stored_totals: Dict[tuple, int] = {}
+        async for doc in db.doctor_day_counters.find(match, {"doctor_id": 1, "date": 1, "counts": 1, "total": 1}):
+            key = (doc["doctor_id"], doc["date"])
+            stored[key] = doc.get("counts", {})
+            stored_totals[key] = doc.get("total", 0)
+
+        now = datetime.utcnow()
+        operations = []
+        for key in (expected.keys() | stored.keys()) - unsettled:
+            counts, current = expected.get(key, {}), stored.get(key, {})
+            deltas = {
+                status: counts.get(status, 0) - current.get(status, 0)
+                for status in counts.keys() | current.keys()
+            }
+            deltas = {status: delta for status, delta in deltas.items() if delta}
+            # total is checked on its own, so drift in total alone is corrected too
+            total_delta = sum(counts.values()) - stored_totals.get(key, 0)
+            if not deltas and not total_delta:
+                continue
+            operations.append(UpdateOne(
+                {"doctor_id": key[0], "date": key[1]},
+                {
+                    "$inc": {
+                        **{f"counts.{status}": delta for status, delta in deltas.items()},
+                        "total": total_delta
+                    },
+                    "$set": {"updated_at": now}
+                },
+                upsert=True
+            ))
+
+        if operations:
+            await db.doctor_day_counters.bulk_write(operations, ordered=False)
+            print(f"🔁 Reconciled {len(operations)} calendar counter days")
+        return len(operations)
+
+class CalendarReconciler:
+    """
+    Background task periodically reconciling calendar counters
+    """
+
+    def __init__(self):
+        self.interval = settings.CALENDAR_RECONCILE_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the reconcile loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the reconcile loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                db = await get_database()
+                await calendar_counters.reconcile(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Calendar reconcile error: {e}")
+            await asyncio.sleep(self.interval)
+
+# Global calendar counter instances
+calendar_counters = CalendarCounterService()
+calendar_reconciler = CalendarReconciler()
@@ -0,0 +1,78 @@
+# app/services/consent_cache.py
+import heapq
+import itertools
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+ConsentKey = Tuple[str, str, Optional[str]]
+
+class ConsentCache:
+    """
+    Consent decisions keyed by (patient_id, doctor_id, record_id).
+
+    Each entry lives until its own expiry (the consent's expires_at for
+    grants), tracked in a min-heap so expired entries are dropped in
+    expiry order without scanning the whole cache.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: Dict[ConsentKey, Tuple[Any, datetime]] = {}
+        self._heap: List[Tuple[datetime, int, ConsentKey]] = []
+        self._sequence = itertools.count()
+        self._by_pair: Dict[Tuple[str, str], Set[ConsentKey]] = {}
+
+    def get(self, key: ConsentKey) -> Optional[Any]:
+        """Get a cached decision, or None if absent or expired"""
+        self._evict(datetime.utcnow())
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def put(self, key: ConsentKey, value: Any, expires_at: datetime):
+        """Cache a decision until expires_at"""
+        now = datetime.utcnow()
+        if expires_at <= now:
+            return
+
+        self._entries[key] = (value, expires_at)
+        self._by_pair.setdefault(key[:2], set()).add(key)
+        heapq.heappush(self._heap, (expires_at, next(self._sequence), key))
+
+        # Stale heap nodes are skipped lazily; compact if they pile up
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [
+                (exp, next(self._sequence), k) for k, (_, exp) in self._entries.items()
+            ]
+            heapq.heapify(self._heap)
+
+        self._evict(now)
+        while len(self._entries) > self.max_size:
+            self._pop_earliest()
+
+    def invalidate_pair(self, patient_id: str, doctor_id: str):
+        """Drop every decision cached for a doctor/patient pair"""
+        for key in self._by_pair.pop((patient_id, doctor_id), ()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._heap.clear()
+        self._by_pair.clear()
+
+    def _evict(self, now: datetime):
+        """Drop entries whose expiry has passed"""
+        while self._heap and self._heap[0][0] <= now:
+            self._pop_earliest()
+
+    def _pop_earliest(self):
+        expires_at, _, key = heapq.heappop(self._heap)
+        entry = self._entries.get(key)
+        # Ignore heap nodes superseded by a later put()
+        if entry is None or entry[1] != expires_at:
+            return
+        del self._entries[key]
+        pair_keys = self._by_pair.get(key[:2])
+        if pair_keys is not None:
+            pair_keys.discard(key)
+            if not pair_keys:
+                del self._by_pair[key[:2]]
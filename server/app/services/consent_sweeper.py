@@ -0,0 +1,95 @@
+# app/services/consent_sweeper.py
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Optional
+from app.core.config import settings
+from app.core.database import get_database
+from app.models.schemas import ConsentStatus
+from app.services.authorization import authorization_service
+from app.services.blockchain import blockchain_service
+
+class ConsentExpirySweeper:
+    """
+    Background task moving approved consents past expires_at to EXPIRED.
+    Each batch is claimed with one guarded update_many that stamps the
+    consents it moves with this sweep's `sweep_id`; only the consents
+    carrying that stamp are revoked on the ledger, so a consent changed or
+    expired elsewhere meanwhile is never revoked twice.
+    """
+
+    def __init__(self):
+        self.interval = settings.CONSENT_SWEEP_INTERVAL_SECONDS
+        self.batch_size = settings.CONSENT_SWEEP_BATCH_SIZE
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the sweep loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the sweep loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                db = await get_database()
+                await self.sweep(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Consent sweep error: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self, db) -> int:
+        """Expire all overdue consents in bounded batches; returns count"""
+        revocations = []
+        while True:
+            now = datetime.utcnow()
+            batch = await db.consent_logs.find(
+                {"status": ConsentStatus.APPROVED, "expires_at": {"$lte": now}},
+                {"patient_id": 1, "doctor_id": 1}
+            ).sort("expires_at", 1).limit(self.batch_size).to_list(self.batch_size)
+
+            if not batch:
+                break
+
+            sweep_id = str(uuid.uuid4())
+            ids = [consent["_id"] for consent in batch]
+            await db.consent_logs.update_many(
+                {"_id": {"$in": ids}, "status": ConsentStatus.APPROVED},
+                {"$set": {"status": ConsentStatus.EXPIRED, "sweep_id": sweep_id, "updated_at": now}}
+            )
+            claimed = await db.consent_logs.find(
+                {"_id": {"$in": ids}, "sweep_id": sweep_id},
+                {"patient_id": 1, "doctor_id": 1}
+            ).to_list(None)
+
+            for consent in claimed:
+                authorization_service.invalidate(consent["patient_id"], consent["doctor_id"])
+                revocations.append({
+                    "patient_id": consent["patient_id"],
+                    "doctor_id": consent["doctor_id"],
+                    "consent_id": str(consent["_id"]),
+                    "reason": "expired"
+                })
+
+            if len(batch) < self.batch_size:
+                break
+
+        # One ledger group commit per sweep
+        if revocations:
+            await blockchain_service.revoke_consents(revocations)
+            print(f"⏱️ Expired {len(revocations)} consents")
+        return len(revocations)
+
+# Global consent sweeper instance
+consent_sweeper = ConsentExpirySweeper()
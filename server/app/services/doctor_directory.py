@@ -0,0 +1,189 @@
+# app/services/doctor_directory.py
+import asyncio
+import heapq
+import re
+import time
+from bisect import bisect_right, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.schemas import UserRole
+from app.services.slot_search import free_slot_index
+
+def _tokens(*texts: Optional[str]) -> Set[str]:
+    return {token for text in texts if text for token in re.findall(r"\w+", text.lower())}
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.ids: Set[str] = set()  # every doctor with a token under this prefix
+
+class PrefixTrie:
+    """Token prefix -> doctor ids; a lookup is one walk down the prefix"""
+
+    def __init__(self):
+        self._root = _TrieNode()
+
+    def add(self, token: str, doctor_id: str):
+        node = self._root
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+            node.ids.add(doctor_id)
+
+    def discard(self, token: str, doctor_id: str):
+        node = self._root
+        for char in token:
+            node = node.children.get(char)
+            if node is None:
+                return
+            node.ids.discard(doctor_id)
+
+    def lookup(self, prefix: str) -> Set[str]:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+class DoctorDirectory:
+    """
+    In-memory snapshot of active doctor cards.
+
+    Listing walks name-sorted keys (overall and per specialization) from a
+    keyset cursor; typeahead intersects trie lookups for each query term.
+    Neither touches Mongo once the snapshot is loaded. The snapshot is
+    updated in place on doctor profile changes and reloaded in the
+    background after DOCTOR_DIRECTORY_REFRESH_SECONDS so changes made by
+    other workers show up.
+    """
+
+    def __init__(self):
+        self.loaded_at: Optional[float] = None
+        self._cards: Dict[str, Dict] = {}
+        self._order: List[Tuple[str, str]] = []  # (full_name, id), sorted
+        self._by_specialization: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        self._trie = PrefixTrie()
+        self._reload_task: Optional[asyncio.Task] = None
+
+    async def load(self, db):
+        """(Re)build the snapshot from users"""
+        cards = {}
+        async for doctor in db.users.find(
+            {"role": UserRole.DOCTOR.value, "is_active": True},
+            {"full_name": 1, "email": 1, "specialization": 1, "phone": 1}
+        ):
+            cards[str(doctor["_id"])] = self._card(doctor)
+
+        order = sorted((card["full_name"], doctor_id) for doctor_id, card in cards.items())
+        by_specialization = defaultdict(list)
+        trie = PrefixTrie()
+        for full_name, doctor_id in order:
+            card = cards[doctor_id]
+            by_specialization[card["specialization"]].append((full_name, doctor_id))
+            for token in _tokens(card["full_name"], card["specialization"]):
+                trie.add(token, doctor_id)
+
+        self._cards, self._order = cards, order
+        self._by_specialization, self._trie = by_specialization, trie
+        self.loaded_at = time.monotonic()
+        print(f"✅ Doctor directory loaded ({len(cards)} doctors)")
+
+    def upsert(self, doctor: Dict):
+        """Apply a doctor profile change (or deactivation) to the snapshot"""
+        if self.loaded_at is None:
+            return
+        doctor_id = str(doctor["_id"])
+        self.remove(doctor_id)
+        if not doctor.get("is_active", True):
+            return
+
+        card = self._card(doctor)
+        key = (card["full_name"], doctor_id)
+        self._cards[doctor_id] = card
+        insort(self._order, key)
+        insort(self._by_specialization[card["specialization"]], key)
+        for token in _tokens(card["full_name"], card["specialization"]):
+            self._trie.add(token, doctor_id)
+        free_slot_index.update_doctor(doctor_id, {
+            "full_name": card["full_name"],
+            "specialization": card["specialization"]
+        })
+
+    def remove(self, doctor_id: str):
+        """Drop a doctor from the snapshot"""
+        card = self._cards.pop(doctor_id, None)
+        if card is None:
+            return
+        key = (card["full_name"], doctor_id)
+        for keys in (self._order, self._by_specialization[card["specialization"]]):
+            index = bisect_right(keys, key) - 1
+            if index >= 0 and keys[index] == key:
+                keys.pop(index)
+        for token in _tokens(card["full_name"], card["specialization"]):
+            self._trie.discard(token, doctor_id)
+
+    async def list_doctors(self, db, limit: Optional[int], specialization: Optional[str] = None,
+                           cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One name-ordered page of doctors and the cursor for the next page
+        (all remaining doctors when limit is None).
+        Raises ValueError on a malformed cursor.
+        """
+        await self._ensure_loaded(db)
+        keys = self._by_specialization.get(specialization, []) if specialization else self._order
+
+        start = 0
+        if cursor:
+            full_name, doctor_id = decode_cursor(cursor, 2)
+            start = bisect_right(keys, (full_name, doctor_id))
+
+        page = keys[start:] if limit is None else keys[start:start + limit]
+        next_cursor = None
+        if limit is not None and start + limit < len(keys):
+            next_cursor = encode_cursor(list(page[-1]))
+        return [self._cards[doctor_id] for _, doctor_id in page], next_cursor
+
+    async def search(self, db, query: str, limit: int) -> List[Dict]:
+        """Typeahead: doctors with a name/specialization word starting with every query term"""
+        await self._ensure_loaded(db)
+        terms = sorted(_tokens(query), key=len, reverse=True)  # longest (most selective) first
+        if not terms:
+            return []
+
+        matches = set(self._trie.lookup(terms[0]))
+        for term in terms[1:]:
+            if not matches:
+                break
+            matches &= self._trie.lookup(term)
+
+        best = heapq.nsmallest(limit, ((self._cards[d]["full_name"], d) for d in matches))
+        return [self._cards[doctor_id] for _, doctor_id in best]
+
+    async def _ensure_loaded(self, db):
+        if self.loaded_at is None:
+            await self.load(db)
+        elif (time.monotonic() - self.loaded_at > settings.DOCTOR_DIRECTORY_REFRESH_SECONDS
+              and (self._reload_task is None or self._reload_task.done())):
+            self._reload_task = asyncio.create_task(self._reload(db))
+
+    async def _reload(self, db):
+        try:
+            await self.load(db)
+        except Exception as e:
+            print(f"Doctor directory reload error: {e}")
+
+    def _card(self, doctor: Dict) -> Dict:
+        return {
+            "id": str(doctor["_id"]),
+            "full_name": doctor["full_name"],
+            "email": doctor["email"],
+            "specialization": doctor.get("specialization", "General Practitioner"),
+            "phone": doctor.get("phone")
+        }
+
+# Global doctor directory instance
+doctor_directory = DoctorDirectory()
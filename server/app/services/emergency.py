@@ -0,0 +1,84 @@
+# app/services/emergency.py
+from bson import ObjectId
+from cachetools import TTLCache
+from datetime import datetime
+from typing import Dict, Optional
+from app.core.config import settings
+from app.models.schemas import RecordType, UserRole
+
+# Record types served to clinicians under break-glass access
+EMERGENCY_RECORD_TYPES = [
+    RecordType.DIAGNOSIS.value,
+    RecordType.PRESCRIPTION.value,
+    RecordType.SURGERY.value,
+    RecordType.VACCINATION.value,
+]
+
+class EmergencySummaryService:
+    """
+    Precomputed per-patient summaries of critical records for emergency access.
+    Stored in `emergency_summaries`, rebuilt when critical records change,
+    with an in-process TTL cache in front.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            maxsize=1000,
+            ttl=settings.EMERGENCY_SUMMARY_CACHE_TTL_SECONDS
+        )
+
+    async def get_summary(self, db, patient_id: str) -> Optional[Dict]:
+        """Get a patient's emergency summary, building it on first use"""
+        summary = self._cache.get(patient_id)
+        if summary is not None:
+            return summary
+
+        summary = await db.emergency_summaries.find_one({"patient_id": patient_id}, {"_id": 0})
+        if summary is None:
+            return await self.refresh(db, patient_id)
+
+        self._cache[patient_id] = summary
+        return summary
+
+    async def refresh(self, db, patient_id: str) -> Optional[Dict]:
+        """Rebuild and store a patient's emergency summary"""
+        patient = await db.users.find_one(
+            {"_id": ObjectId(patient_id), "role": UserRole.PATIENT.value},
+            {"full_name": 1}
+        )
+        if not patient:
+            return None
+
+        records = []
+        cursor = db.medical_records.find(
+            {
+                "patient_id": patient_id,
+                "deleted": {"$ne": True},
+                "record_type": {"$in": EMERGENCY_RECORD_TYPES}
+            },
+            {"encrypted_file_data": 0}
+        ).sort("created_at", -1).limit(settings.EMERGENCY_SUMMARY_MAX_RECORDS)
+
+        async for record in cursor:
+            record["id"] = str(record.pop("_id"))
+            records.append(record)
+
+        summary = {
+            "patient_id": patient_id,
+            "patient_name": patient["full_name"],
+            "records": records,
+            "updated_at": datetime.utcnow()
+        }
+        await db.emergency_summaries.replace_one(
+            {"patient_id": patient_id}, summary, upsert=True
+        )
+        self._cache[patient_id] = summary
+        return summary
+
+    async def record_changed(self, db, patient_id: str, record_type: str):
+        """Refresh the summary if a critical record was added or removed"""
+        if record_type in EMERGENCY_RECORD_TYPES:
+            await self.refresh(db, patient_id)
+
+# Global emergency summary service instance
+emergency_summary_service = EmergencySummaryService()
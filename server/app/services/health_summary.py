@@ -0,0 +1,209 @@
+# app/services/health_summary.py
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.database import get_database
+from app.services.ai_service import ai_service
+from app.services.prompt_builder import RECORD_PROJECTION
+
+# Record fields the summaries are built from
+SUMMARY_PROJECTION = {**RECORD_PROJECTION, "record_hash": 1, "ai_summary": 1}
+
+# LLMClient admission key for background refreshes, so they never share a user's slots
+BACKGROUND_USER = "background:health-summary"
+
+class HealthSummaryService:
+    """
+    Hierarchical (map-reduce) summaries of a patient's medical history.
+
+    Each record is summarized once and the text stored on the record
+    (`ai_summary`). Record summaries are folded, a few at a time, into one
+    rolling summary per calendar year in `health_period_summaries`, which
+    remembers the record_hashes it covers. The final patient summary only
+    combines the yearly summaries, so its prompt stays small however long
+    the history is.
+
+    Uploads and deletions refresh a patient's summaries in the background,
+    so a new record is summarized when it is uploaded; records from before
+    this existed are backfilled at startup. Background refreshes run
+    AI_SUMMARY_BACKGROUND_REFRESHES patients at a time under their own
+    admission key. Every history() call keeps at most
+    AI_MAX_CONCURRENCY_PER_USER LLM calls in flight, and each record
+    summary is stored as soon as it is made.
+    """
+
+    def __init__(self):
+        self._running: Dict[str, asyncio.Task] = {}
+        self._dirty = set()
+        self._background = asyncio.Semaphore(settings.AI_SUMMARY_BACKGROUND_REFRESHES)
+        self._backfill: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Backfill record summaries missing from earlier uploads"""
+        if self._backfill is None and ai_service.llm is not None:
+            self._backfill = asyncio.create_task(self._run_backfill())
+
+    async def stop(self):
+        """Cancel the backfill and any running refreshes"""
+        tasks = list(self._running.values())
+        if self._backfill is not None:
+            tasks.append(self._backfill)
+            self._backfill = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def history(self, db, patient_id: str, records: List[Dict], scoped: bool = False,
+                      user_id: Optional[str] = None) -> List[str]:
+        """
+        One summary per period for the given records (SUMMARY_PROJECTION).
+        Scoped (consent-limited) views are folded on the fly and not stored.
+        """
+        if ai_service.llm is None:
+            return []
+
+        # Bounded fan-out: never more calls in flight than one user may have
+        limit = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY_PER_USER)
+        await self._summarize_records(db, records, user_id, limit)
+
+        periods: Dict[str, List[Dict]] = {}
+        for record in sorted(records, key=lambda r: r.get("created_at") or datetime.min):
+            periods.setdefault(self._period(record), []).append(record)
+        ordered = sorted(periods)
+
+        if scoped:
+            summaries = await asyncio.gather(*(
+                self._fold(None, periods[period], user_id, limit) for period in ordered
+            ))
+        else:
+            stored = {
+                doc["period"]: doc async for doc in db.health_period_summaries.find(
+                    {"patient_id": patient_id}
+                )
+            }
+            summaries = await asyncio.gather(*(
+                self._refresh_period(db, patient_id, period, periods[period],
+                                     stored.get(period), user_id, limit)
+                for period in ordered
+            ))
+            gone = [period for period in stored if period not in periods]
+            if gone:
+                await db.health_period_summaries.delete_many(
+                    {"patient_id": patient_id, "period": {"$in": gone}}
+                )
+
+        return [f"{period}: {summary}" for period, summary in zip(ordered, summaries)]
+
+    def record_changed(self, db, patient_id: str):
+        """Refresh a patient's summaries in the background after an upload or deletion"""
+        if ai_service.llm is None:
+            return
+        if patient_id in self._running:
+            self._dirty.add(patient_id)
+            return
+        self._running[patient_id] = asyncio.create_task(self._refresh(db, patient_id))
+
+    async def _run_backfill(self):
+        try:
+            db = await get_database()
+            patient_ids = await db.medical_records.distinct(
+                "patient_id", {"ai_summary": {"$exists": False}, "deleted": {"$ne": True}}
+            )
+            if patient_ids:
+                print(f"🧾 Backfilling health summaries for {len(patient_ids)} patients")
+            for patient_id in patient_ids:
+                if patient_id not in self._running:
+                    self.record_changed(db, patient_id)
+                task = self._running.get(patient_id)
+                if task is not None:
+                    await task
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Health summary backfill error: {e}")
+
+    async def _refresh(self, db, patient_id: str):
+        try:
+            async with self._background:
+                while True:
+                    records = await db.medical_records.find(
+                        {"patient_id": patient_id, "deleted": {"$ne": True}}, SUMMARY_PROJECTION
+                    ).to_list(None)
+                    await self.history(db, patient_id, records, user_id=BACKGROUND_USER)
+                    if patient_id not in self._dirty:
+                        break
+                    self._dirty.discard(patient_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Health summary refresh error for {patient_id}: {e}")
+        finally:
+            self._running.pop(patient_id, None)
+            self._dirty.discard(patient_id)
+
+    def _period(self, record: Dict) -> str:
+        created_at = record.get("created_at")
+        return str(created_at.year) if isinstance(created_at, datetime) else "Undated"
+
+    async def _summarize_records(self, db, records: List[Dict], user_id: Optional[str],
+                                 limit: asyncio.Semaphore):
+        """Map step: summarize records that do not have a stored summary yet"""
+        async def summarize(record: Dict):
+            async with limit:
+                summary = await ai_service.summarize_record(record, user_id)
+            record["ai_summary"] = summary
+            # Stored right away, so one failed record does not lose the others
+            await db.medical_records.update_one(
+                {"_id": record["_id"]}, {"$set": {"ai_summary": summary}}
+            )
+
+        missing = [record for record in records if not record.get("ai_summary")]
+        results = await asyncio.gather(*(summarize(record) for record in missing),
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    async def _refresh_period(self, db, patient_id: str, period: str, records: List[Dict],
+                              stored: Optional[Dict], user_id: Optional[str],
+                              limit: asyncio.Semaphore) -> str:
+        """Bring a stored period summary in line with the period's records"""
+        hashes = [record["record_hash"] for record in records]
+        covered = set(stored["record_hashes"]) if stored else set()
+
+        if stored and covered == set(hashes):
+            return stored["summary"]
+        if stored and covered.issubset(hashes):
+            # Only additions: fold the new records into the existing summary
+            new = [record for record in records if record["record_hash"] not in covered]
+            summary = await self._fold(stored["summary"], new, user_id, limit)
+        else:
+            summary = await self._fold(None, records, user_id, limit)
+
+        await db.health_period_summaries.update_one(
+            {"patient_id": patient_id, "period": period},
+            {"$set": {"summary": summary, "record_hashes": hashes, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        return summary
+
+    async def _fold(self, previous: Optional[str], records: List[Dict],
+                    user_id: Optional[str], limit: asyncio.Semaphore) -> str:
+        """Reduce step: fold record summaries into previous, a batch at a time"""
+        if previous is None and len(records) == 1:
+            return records[0]["ai_summary"]
+        batch = settings.AI_SUMMARY_FOLD_BATCH
+        for start in range(0, len(records), batch):
+            async with limit:
+                previous = await ai_service.fold_summaries(
+                    previous, [record["ai_summary"] for record in records[start:start + batch]], user_id
+                )
+        return previous
+
+# Global health summary service instance
+health_summary_service = HealthSummaryService()
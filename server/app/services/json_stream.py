@@ -0,0 +1,83 @@
+# app/services/json_stream.py
+import json
+from typing import Any, List, Tuple, Union
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a streamed JSON object or array.
+
+    feed() takes the next chunk of text and returns the top-level members
+    completed by it: (key, value) for an object, (index, value) for an
+    array. Text before the opening bracket (e.g. a ```json fence) and after
+    the closing one is ignored; a member that is not valid JSON is skipped.
+    """
+
+    def __init__(self):
+        self.root = None  # "{" or "[" once seen
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._token: List[str] = []
+        self._key = None
+        self._index = 0
+
+    def feed(self, text: str) -> List[Tuple[Union[str, int], Any]]:
+        """Consume a chunk; returns the members it completed"""
+        completed = []
+        for char in text:
+            if self.done:
+                break
+            if self.root is None:
+                if char in "{[":
+                    self.root = char
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                self._token.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 1:
+                if char in ",}]":
+                    self._end_member(completed)
+                    self.done = char != ","
+                    continue
+                if char == ":" and self.root == "{":
+                    self._key = self._load(self._token)
+                    self._token = []
+                    continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            self._token.append(char)
+        return completed
+
+    def _end_member(self, completed: List):
+        value = self._load(self._token)
+        had_value = bool("".join(self._token).strip())
+        self._token = []
+        if self.root == "{":
+            if self._key is not None and had_value and value is not None:
+                completed.append((self._key, value))
+            self._key = None
+        elif had_value:
+            if value is not None:
+                completed.append((self._index, value))
+            self._index += 1
+
+    def _load(self, chars: List[str]):
+        try:
+            return json.loads("".join(chars))
+        except ValueError:
+            return None
@@ -0,0 +1,141 @@
+# app/services/llm_backends.py
+import json
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from app.core.config import settings
+from app.services.llm_client import LLMError
+
+class LLMBackend(ABC):
+    """
+    A text-generation provider.
+
+    generate() returns the whole response text and stream() yields it in
+    chunks. Provider failures are raised as LLMError so callers handle every
+    backend the same way.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Return the whole response text"""
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the response text in chunks"""
+
+    async def close(self):
+        """Release connections held by the backend"""
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google-generativeai SDK"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str):
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_errors
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+        self.errors = google_errors
+
+    def _error(self, e: Exception) -> LLMError:
+        """The LLMError for an SDK exception, mapped like OpenAICompatibleBackend"""
+        if isinstance(e, (self.errors.ResourceExhausted, self.errors.TooManyRequests)):
+            return LLMError(429, "AI provider is rate limiting requests, please try again shortly")
+        if isinstance(e, self.errors.DeadlineExceeded):
+            return LLMError(504, "AI request timed out")
+        print(f"AI provider error: {e.__class__.__name__}: {str(e)[:200]}")
+        return LLMError(502, "AI provider error")
+
+    async def generate(self, prompt: str) -> str:
+        try:
+            response = await self.model.generate_content_async(prompt)
+        except self.errors.GoogleAPIError as e:
+            raise self._error(e)
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except self.errors.GoogleAPIError as e:
+            raise self._error(e)
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Any server speaking the OpenAI chat completions API (OpenAI, vLLM,
+    Ollama, LM Studio, benchmarks.llm_stub, ...) over one pooled HTTP client.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url: str, model: str, api_key: str = ""):
+        self.model = model
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            # The overall deadline is enforced by LLMClient
+            timeout=httpx.Timeout(None, connect=10),
+            limits=httpx.Limits(max_connections=settings.AI_MAX_CONCURRENCY * 2)
+        )
+
+    def _body(self, prompt: str, stream: bool = False) -> Dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream
+        }
+
+    def _check(self, response: httpx.Response):
+        if response.status_code == 429:
+            raise LLMError(429, "AI provider is rate limiting requests, please try again shortly")
+        if response.status_code >= 400:
+            print(f"AI provider error {response.status_code}: {response.text[:200]}")
+            raise LLMError(502, "AI provider error")
+
+    async def generate(self, prompt: str) -> str:
+        try:
+            response = await self.client.post("/chat/completions", json=self._body(prompt))
+        except httpx.HTTPError as e:
+            raise LLMError(502, f"AI provider unreachable: {e.__class__.__name__}")
+        self._check(response)
+        return response.json()["choices"][0]["message"].get("content") or ""
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        try:
+            async with self.client.stream(
+                "POST", "/chat/completions", json=self._body(prompt, stream=True)
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._check(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    choices = json.loads(data).get("choices") or [{}]
+                    text = (choices[0].get("delta") or {}).get("content")
+                    if text:
+                        yield text
+        except httpx.HTTPError as e:
+            raise LLMError(502, f"AI provider unreachable: {e.__class__.__name__}")
+
+    async def close(self):
+        await self.client.aclose()
+
+def create_backend() -> Optional[LLMBackend]:
+    """The backend selected by AI_BACKEND, or None when it is not configured"""
+    if settings.AI_BACKEND == "openai":
+        return OpenAICompatibleBackend(settings.AI_BASE_URL, settings.AI_MODEL, settings.AI_API_KEY)
+    if settings.AI_BACKEND == "gemini":
+        if not settings.GEMINI_API_KEY:
+            return None
+        return GeminiBackend(settings.GEMINI_API_KEY, settings.GEMINI_MODEL)
+    raise ValueError(f"Unknown AI_BACKEND: {settings.AI_BACKEND}")
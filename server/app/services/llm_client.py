@@ -0,0 +1,181 @@
+# app/services/llm_client.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from app.core.config import settings
+from app.services.llm_resilience import CircuitBreaker, LatencyTracker
+
+class LLMError(Exception):
+    """Raised when an LLM call is rejected or fails in a way the caller should surface"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class LLMClient:
+    """
+    Non-blocking LLM calls with admission control.
+
+    Wraps an LLMBackend (see llm_backends), whose calls are all async, so
+    a call never blocks the event loop. At
+    most AI_MAX_CONCURRENCY calls run at once, and at most
+    AI_MAX_CONCURRENCY_PER_USER per user. A call that cannot get a slot
+    within AI_QUEUE_TIMEOUT_SECONDS is rejected (429).
+
+    Calls also go through a circuit breaker (refused with 503 while the
+    provider is failing or slow), are abandoned (504) after an adaptive
+    timeout derived from recent latencies, and get one hedged duplicate
+    once they run past the recent p95. Hedges are limited to about
+    AI_HEDGE_BUDGET_RATIO of calls and share the original's slot.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._hedge_tokens = 1.0
+        self._global = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+        self._per_user: Dict[str, asyncio.Semaphore] = {}
+        self._users_waiting: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def _slot(self, user_id: Optional[str]):
+        key = user_id or "anonymous"
+        if key not in self._per_user:
+            self._per_user[key] = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY_PER_USER)
+            self._users_waiting[key] = 0
+        user_slots = self._per_user[key]
+        self._users_waiting[key] += 1
+        try:
+            try:
+                await asyncio.wait_for(self._acquire(user_slots), settings.AI_QUEUE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise LLMError(429, "Too many AI requests in progress, please try again shortly")
+            try:
+                yield
+            finally:
+                self._global.release()
+                user_slots.release()
+        finally:
+            self._users_waiting[key] -= 1
+            if not self._users_waiting[key]:
+                del self._users_waiting[key]
+                del self._per_user[key]
+
+    async def _acquire(self, user_slots: asyncio.Semaphore):
+        await user_slots.acquire()
+        try:
+            await self._global.acquire()
+        except BaseException:
+            user_slots.release()
+            raise
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            raise LLMError(
+                503, "AI provider is unavailable, please try again shortly",
+                retry_after=self.breaker.retry_after()
+            )
+
+    def _take_hedge_token(self) -> bool:
+        if self._hedge_tokens < 1:
+            return False
+        self._hedge_tokens -= 1
+        return True
+
+    async def _attempt(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        text = await self.backend.generate(prompt)
+        self.latency.record(loop.time() - started)
+        return text
+
+    async def _hedged(self, prompt: str) -> str:
+        """First successful response of the call and, if it runs long, one duplicate"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.latency.timeout()
+        hedge_at = self.latency.hedge_delay()
+        self._hedge_tokens = min(self._hedge_tokens + settings.AI_HEDGE_BUDGET_RATIO, 10)
+
+        pending = {asyncio.ensure_future(self._attempt(prompt))}
+        attempts = set(pending)
+        error = None
+        try:
+            while pending:
+                wake = deadline if hedge_at is None else min(deadline, started + hedge_at)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(wake - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if loop.time() >= deadline:
+                    raise LLMError(504, "AI request timed out")
+                if hedge_at is not None and loop.time() >= started + hedge_at:
+                    hedge_at = None
+                    if pending and self._take_hedge_token():
+                        hedge = asyncio.ensure_future(self._attempt(prompt))
+                        pending.add(hedge)
+                        attempts.add(hedge)
+            raise error
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    async def generate(self, prompt: str, user_id: Optional[str] = None) -> str:
+        """Run one prompt and return the response text"""
+        self._check_circuit()
+        async with self._slot(user_id):
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            try:
+                text = await self._hedged(prompt)
+            except Exception:
+                self.breaker.record(failed=True)
+                raise
+            self.breaker.record(failed=False, seconds=loop.time() - started)
+            return text
+
+    async def stream(self, prompt: str, user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Run one prompt and yield the response text as it is generated"""
+        loop = asyncio.get_running_loop()
+        self._check_circuit()
+        async with self._slot(user_id):
+            deadline = loop.time() + settings.AI_REQUEST_TIMEOUT_SECONDS
+            chunks = self.backend.stream(prompt)
+            failed = True
+            try:
+                while True:
+                    try:
+                        text = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        failed = False
+                        return
+                    if text:
+                        yield text
+            except asyncio.TimeoutError:
+                raise LLMError(504, "AI request timed out")
+            except (asyncio.CancelledError, GeneratorExit):
+                # The reader went away; says nothing about the provider
+                failed = None
+                raise
+            finally:
+                if failed is not None:
+                    self.breaker.record(failed=failed)
+                await chunks.aclose()
+
+    def status(self) -> Dict:
+        """Circuit state and current latency-derived limits"""
+        hedge_delay = self.latency.hedge_delay()
+        return {
+            "circuit": self.breaker.status(),
+            "hedge_delay_ms": round(hedge_delay * 1000) if hedge_delay is not None else None,
+            "timeout_s": round(self.latency.timeout(), 1)
+        }
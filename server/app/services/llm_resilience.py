@@ -0,0 +1,117 @@
+# app/services/llm_resilience.py
+import time
+from collections import deque
+from typing import Dict, Optional
+from app.core.config import settings
+
+class LatencyTracker:
+    """
+    Rolling window of successful LLM call durations.
+
+    Gives the hedging delay (AI_HEDGE_PERCENTILE of recent calls) and an
+    adaptive timeout (p99 times AI_TIMEOUT_MULTIPLIER, clamped between
+    AI_MIN_TIMEOUT_SECONDS and AI_REQUEST_TIMEOUT_SECONDS). Until
+    AI_LATENCY_MIN_SAMPLES calls have been seen there is no hedging and the
+    full timeout applies.
+    """
+
+    def __init__(self):
+        self._samples = deque(maxlen=settings.AI_LATENCY_WINDOW)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self._samples) < settings.AI_LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a duplicate request is sent, or None to not hedge"""
+        return self.percentile(settings.AI_HEDGE_PERCENTILE)
+
+    def timeout(self) -> float:
+        """Seconds a call may take before it is abandoned"""
+        p99 = self.percentile(99)
+        if p99 is None:
+            return settings.AI_REQUEST_TIMEOUT_SECONDS
+        return min(
+            max(p99 * settings.AI_TIMEOUT_MULTIPLIER, settings.AI_MIN_TIMEOUT_SECONDS),
+            settings.AI_REQUEST_TIMEOUT_SECONDS
+        )
+
+class CircuitBreaker:
+    """
+    Stops calling a failing or degraded LLM provider.
+
+    Over the last AI_BREAKER_WINDOW calls, the circuit opens when the share
+    of failures reaches AI_BREAKER_ERROR_RATE or the share of calls slower
+    than AI_BREAKER_SLOW_SECONDS reaches AI_BREAKER_SLOW_RATE (after at
+    least AI_BREAKER_MIN_CALLS). While open, calls are refused at once.
+    After AI_BREAKER_OPEN_SECONDS one probe call is let through: success
+    closes the circuit, failure re-opens it. A probe that never reports
+    back is replaced after another AI_BREAKER_OPEN_SECONDS.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=settings.AI_BREAKER_WINDOW)  # (failed, slow)
+        self._retry_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if now < self._retry_at:
+            return False
+        # Let this call through as the probe; others wait for its outcome
+        self.state = self.HALF_OPEN
+        self._retry_at = now + settings.AI_BREAKER_OPEN_SECONDS
+        return True
+
+    def retry_after(self) -> int:
+        """Seconds until the next probe may be sent"""
+        return max(1, int(self._retry_at - time.monotonic() + 0.999))
+
+    def record(self, failed: bool, seconds: Optional[float] = None):
+        """Report the outcome of a call that reached the provider"""
+        slow = seconds is not None and seconds >= settings.AI_BREAKER_SLOW_SECONDS
+        if self.state == self.HALF_OPEN:
+            if failed or slow:
+                self._open()
+            else:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                print("✅ AI circuit closed: provider recovered")
+            return
+        if self.state == self.OPEN:
+            return
+
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < settings.AI_BREAKER_MIN_CALLS:
+            return
+        failures = sum(1 for f, _ in self._outcomes if f)
+        slow_calls = sum(1 for _, s in self._outcomes if s)
+        if (failures / calls >= settings.AI_BREAKER_ERROR_RATE
+                or slow_calls / calls >= settings.AI_BREAKER_SLOW_RATE):
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._retry_at = time.monotonic() + settings.AI_BREAKER_OPEN_SECONDS
+        print(f"⚠️ AI circuit open: provider failing or slow, retrying in {settings.AI_BREAKER_OPEN_SECONDS}s")
+
+    def status(self) -> Dict:
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": sum(1 for f, _ in self._outcomes if f)
+        }
@@ -0,0 +1,45 @@
+# app/services/migrations.py
+from pymongo import UpdateOne
+from app.core.timeutils import to_instant
+
+BATCH_SIZE = 1000
+
+async def _backfill_instants(collection, date_field: str) -> int:
+    """
+    Add `start`/`end` instants to documents that only have the ISO strings.
+    Documents whose date or times cannot be parsed are logged and marked
+    with `instant_error` instead, so one bad row cannot block startup.
+    """
+    migrated = 0
+    while True:
+        batch = await collection.find(
+            {"start": {"$exists": False}, "instant_error": {"$exists": False}},
+            {date_field: 1, "start_time": 1, "end_time": 1}
+        ).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+        if not batch:
+            return migrated
+
+        operations = []
+        for doc in batch:
+            try:
+                update = {
+                    "start": to_instant(doc[date_field], doc["start_time"]),
+                    "end": to_instant(doc[date_field], doc["end_time"])
+                }
+                migrated += 1
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"⚠️ Skipping {collection.name} {doc['_id']}: unparseable date/time ({e})")
+                update = {"instant_error": str(e) or e.__class__.__name__}
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        await collection.bulk_write(operations, ordered=False)
+
+async def migrate_slot_instants(db) -> int:
+    """
+    One-off migration to native datetimes for slots and appointments.
+    Idempotent: documents that already carry `start` are skipped.
+    """
+    migrated = await _backfill_instants(db.doctor_availability, "date")
+    migrated += await _backfill_instants(db.appointments, "appointment_date")
+    if migrated:
+        print(f"✅ Migrated {migrated} slots/appointments to native datetimes")
+    return migrated
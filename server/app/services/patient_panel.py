@@ -0,0 +1,152 @@
+# app/services/patient_panel.py
+import re
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.schemas import UserRole
+
+class PatientPanelService:
+    """
+    Materialized doctor -> patient panel in `doctor_patients`.
+
+    One document per (doctor_id, patient_id) with the patient's name/email
+    denormalized and appointment stats updated at booking time. Listing is
+    keyset-paginated on indexed sort keys, so every page costs the same.
+    """
+
+    async def record_appointment(self, db, doctor_id: str, patient: Dict, day: str):
+        """Upsert the panel entry for a newly booked appointment"""
+        now = datetime.utcnow()
+        await db.doctor_patients.update_one(
+            {"doctor_id": doctor_id, "patient_id": str(patient["_id"])},
+            {
+                "$set": {
+                    "full_name": patient["full_name"],
+                    "name_lower": patient["full_name"].lower(),
+                    "email": patient["email"],
+                    "phone": patient.get("phone"),
+                    "updated_at": now
+                },
+                "$max": {"last_appointment": day},
+                "$inc": {"total_appointments": 1},
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
+
+    async def patient_ids(self, db, doctor_id: str) -> List[str]:
+        """Every patient id in a doctor's panel"""
+        return [
+            entry["patient_id"] async for entry in db.doctor_patients.find(
+                {"doctor_id": doctor_id}, {"patient_id": 1}
+            )
+        ]
+
+    async def list_patients(self, db, doctor_id: str, limit: Optional[int],
+                            cursor: Optional[str] = None,
+                            name_prefix: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One page of a doctor's panel and the cursor for the next page (the
+        whole rest of the panel when limit is None). Ordered by most recent
+        appointment, or by name when searching.
+        Raises ValueError on a malformed cursor.
+        """
+        query: Dict = {"doctor_id": doctor_id}
+        if name_prefix:
+            # Anchored prefix regex is an index range scan on name_lower
+            query["name_lower"] = {"$regex": "^" + re.escape(name_prefix.lower())}
+            sort = [("name_lower", 1), ("patient_id", 1)]
+            if cursor:
+                name, patient_id = decode_cursor(cursor, 2)
+                query["$or"] = [
+                    {"name_lower": {"$gt": name}},
+                    {"name_lower": name, "patient_id": {"$gt": patient_id}}
+                ]
+        else:
+            sort = [("last_appointment", -1), ("patient_id", -1)]
+            if cursor:
+                last_appointment, patient_id = decode_cursor(cursor, 2)
+                query["$or"] = [
+                    {"last_appointment": {"$lt": last_appointment}},
+                    {"last_appointment": last_appointment, "patient_id": {"$lt": patient_id}}
+                ]
+
+        if limit is None:
+            docs = await db.doctor_patients.find(query).sort(sort).to_list(None)
+        else:
+            docs = await db.doctor_patients.find(query).sort(sort).limit(limit + 1).to_list(limit + 1)
+
+        next_cursor = None
+        if limit is not None and len(docs) > limit:
+            docs = docs[:limit]
+            last = docs[-1]
+            next_cursor = encode_cursor([last[sort[0][0]], last["patient_id"]])
+
+        patients = [
+            {
+                "id": doc["patient_id"],
+                "full_name": doc["full_name"],
+                "email": doc["email"],
+                "phone": doc.get("phone"),
+                "last_appointment": doc["last_appointment"],
+                "total_appointments": doc["total_appointments"]
+            }
+            for doc in docs
+        ]
+        return patients, next_cursor
+
+    async def rebuild(self, db):
+        """Rebuild doctor_patients from appointments and users"""
+        now = datetime.utcnow()
+        pairs = [
+            pair async for pair in db.appointments.aggregate([
+                {"$group": {
+                    "_id": {"doctor_id": "$doctor_id", "patient_id": "$patient_id"},
+                    "last_appointment": {"$max": "$appointment_date"},
+                    "total_appointments": {"$sum": 1}
+                }}
+            ])
+        ]
+
+        patient_ids = {pair["_id"]["patient_id"] for pair in pairs}
+        patients = {}
+        async for patient in db.users.find(
+            {
+                "_id": {"$in": [ObjectId(pid) for pid in patient_ids if ObjectId.is_valid(pid)]},
+                "role": UserRole.PATIENT.value
+            },
+            {"full_name": 1, "email": 1, "phone": 1}
+        ):
+            patients[str(patient["_id"])] = patient
+
+        operations = []
+        for pair in pairs:
+            patient = patients.get(pair["_id"]["patient_id"])
+            if not patient:
+                continue
+            operations.append(UpdateOne(
+                pair["_id"],
+                {
+                    "$set": {
+                        "full_name": patient["full_name"],
+                        "name_lower": patient["full_name"].lower(),
+                        "email": patient["email"],
+                        "phone": patient.get("phone"),
+                        "last_appointment": pair["last_appointment"],
+                        "total_appointments": pair["total_appointments"],
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            ))
+
+        if operations:
+            await db.doctor_patients.bulk_write(operations, ordered=False)
+
+        print(f"✅ Doctor patient panels rebuilt ({len(operations)} entries)")
+
+# Global patient panel service instance
+patient_panel_service = PatientPanelService()
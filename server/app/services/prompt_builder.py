@@ -0,0 +1,122 @@
+# app/services/prompt_builder.py
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.models.schemas import RecordType
+
+# Record fields that may be sent to the model
+RECORD_FIELDS = ["record_type", "title", "description", "diagnosis", "medications", "created_at"]
+RECORD_PROJECTION = {field: 1 for field in RECORD_FIELDS}
+
+# Lower is more important; each year of age adds one to a record's rank
+TYPE_PRIORITY = {
+    RecordType.DIAGNOSIS.value: 0,
+    RecordType.PRESCRIPTION.value: 1,
+    RecordType.SURGERY.value: 2,
+    RecordType.LAB_REPORT.value: 3,
+    RecordType.IMAGING.value: 4,
+    RecordType.VACCINATION.value: 5,
+}
+
+UNDATED_AGE_YEARS = 10
+MAX_DESCRIPTION_CHARS = 300
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+def _as_list(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+def _dedupe(values: List[str]) -> List[str]:
+    seen = set()
+    unique = []
+    for value in values:
+        key = value.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(value.strip())
+    return unique
+
+class PromptBuilder:
+    """
+    Compact, token-budgeted patient context for AI prompts.
+
+    Only RECORD_FIELDS are used. Diagnoses and medications are collected
+    once across all records, and records are listed one line each, ranked
+    by type and age, until the token budget runs out.
+    """
+
+    def _rank(self, record: Dict, now: datetime) -> float:
+        created_at = record.get("created_at")
+        age = (now - created_at).days / 365 if isinstance(created_at, datetime) else UNDATED_AGE_YEARS
+        return TYPE_PRIORITY.get(record.get("record_type"), len(TYPE_PRIORITY)) + max(age, 0)
+
+    def format_record(self, record: Dict, with_clinical: bool = True) -> str:
+        """One line per record: date | type | title | description [| diagnosis | medications]"""
+        created_at = record.get("created_at")
+        parts = [
+            created_at.date().isoformat() if isinstance(created_at, datetime) else str(created_at or "undated")[:10],
+            record.get("record_type") or "unknown",
+            record.get("title") or "untitled"
+        ]
+        description = (record.get("description") or "").strip()
+        if description:
+            if len(description) > MAX_DESCRIPTION_CHARS:
+                description = description[:MAX_DESCRIPTION_CHARS].rstrip() + "..."
+            parts.append(" ".join(description.split()))
+        if with_clinical:
+            diagnoses = _dedupe(_as_list(record.get("diagnosis")))
+            if diagnoses:
+                parts.append("diagnosis: " + "; ".join(diagnoses))
+            medications = _dedupe(_as_list(record.get("medications")))
+            if medications:
+                parts.append("medications: " + "; ".join(medications))
+        return " | ".join(parts)
+
+    def patient_context(self, records: List[Dict], age=None, gender=None,
+                        budget: Optional[int] = None) -> str:
+        """Patient demographics, deduplicated conditions and prioritized records within budget tokens"""
+        budget = budget or settings.AI_PROMPT_TOKEN_BUDGET
+        now = datetime.utcnow()
+        ordered = sorted(records, key=lambda r: self._rank(r, now))
+
+        lines = [f"Patient: age {age or 'unknown'}, gender {gender or 'unknown'}"]
+        diagnoses = _dedupe([d for r in ordered for d in _as_list(r.get("diagnosis"))])
+        medications = _dedupe([m for r in ordered for m in _as_list(r.get("medications"))])
+        if diagnoses:
+            lines.append("Diagnoses: " + "; ".join(diagnoses))
+        if medications:
+            lines.append("Medications: " + "; ".join(medications))
+        lines.append(f"Records ({len(ordered)}, most relevant first):" if ordered else "Records: none")
+
+        used = sum(estimate_tokens(line) + 1 for line in lines)
+        if used > budget:
+            # Condition lists alone are over budget: keep what fits of each
+            lines = [self._truncate(line, budget // len(lines)) for line in lines]
+            used = sum(estimate_tokens(line) + 1 for line in lines)
+
+        included = 0
+        for record in ordered:
+            line = "- " + self.format_record(record, with_clinical=False)
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+            included += 1
+
+        if included < len(ordered):
+            lines.append(f"({len(ordered) - included} lower-priority records omitted)")
+        return "\n".join(lines)
+
+    def _truncate(self, line: str, tokens: int) -> str:
+        chars = max(tokens * 4 - 3, 0)
+        return line if len(line) <= chars else line[:chars] + "..."
+
+# Global prompt builder instance
+prompt_builder = PromptBuilder()
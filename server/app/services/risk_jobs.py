@@ -0,0 +1,285 @@
+# app/services/risk_jobs.py
+import asyncio
+import uuid
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.database import get_database
+from app.models.schemas import RiskJobStatus, UserRole
+from app.services.ai_service import ai_service
+from app.services.authorization import authorization_service
+from app.services.llm_client import LLMError
+from app.services.prompt_builder import RECORD_PROJECTION
+from app.services.risk_engine import risk_engine
+
+# Seconds a worker backs off before re-queueing a patient the LLM had no slot for
+BUSY_RETRY_SECONDS = 2
+
+class RiskJobService:
+    """
+    Batch risk predictions across many patients.
+
+    A job and its results live in one `risk_jobs` document. Each finished
+    patient is $push-ed onto `results` together with the progress counters
+    in one update, so readers can resume from any result index. A fixed
+    pool of workers drains an in-process queue of the jobs this process
+    holds a lease on (`owner`/`lease_expires_at`). Leases are renewed
+    every RISK_JOB_LEASE_SECONDS / 3; unowned or expired jobs (new ones
+    from other workers, or those of a worker that died) are claimed with
+    find_one_and_update and their unfinished patients queued, so each
+    patient is predicted by one worker process. A patient the LLM keeps
+    rate limiting is retried up to RISK_JOB_MAX_ATTEMPTS times, then
+    recorded as failed. Predictions go through AIService, so cached
+    results are reused. At creation the whole panel is also scored by the
+    local risk engine in one pass and stored as `preliminary`.
+    """
+
+    def __init__(self):
+        self.workers = settings.RISK_JOB_WORKERS
+        self.lease = timedelta(seconds=settings.RISK_JOB_LEASE_SECONDS)
+        self.owner = str(uuid.uuid4())
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, db):
+        """Claim unfinished jobs and start the worker pool and lease loop"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        await self._claim_jobs(db)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain_leases()))
+
+    async def stop(self):
+        """Cancel the worker pool (unfinished patients are claimed once the lease expires)"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def create_job(self, db, doctor_id: str, patient_ids: List[str]) -> Dict:
+        """Persist a job and queue one prediction per patient"""
+        now = datetime.utcnow()
+        job = {
+            "doctor_id": doctor_id,
+            "status": RiskJobStatus.QUEUED.value,
+            "patient_ids": patient_ids,
+            "total": len(patient_ids),
+            "completed": 0,
+            "failed": 0,
+            "results": [],
+            "preliminary": await self._preliminary(db, doctor_id, patient_ids),
+            # Owned by this process if it runs workers, otherwise left for one that does
+            "owner": self.owner if self._queue is not None else None,
+            "lease_expires_at": now + self.lease if self._queue is not None else None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None
+        }
+        result = await db.risk_jobs.insert_one(job)
+        job_id = str(result.inserted_id)
+        if self._queue is not None:
+            for patient_id in patient_ids:
+                self._queue.put_nowait((job_id, doctor_id, patient_id, 1))
+        return job
+
+    async def _maintain_leases(self):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                db = await get_database()
+                await db.risk_jobs.update_many(
+                    {"owner": self.owner, "status": {"$ne": RiskJobStatus.COMPLETED.value}},
+                    {"$set": {"lease_expires_at": datetime.utcnow() + self.lease}}
+                )
+                await self._claim_jobs(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Risk job lease error: {e}")
+
+    async def _claim_jobs(self, db):
+        """Take over unfinished jobs nobody holds a live lease on and queue their patients"""
+        requeued = 0
+        while True:
+            now = datetime.utcnow()
+            job = await db.risk_jobs.find_one_and_update(
+                {
+                    "status": {"$ne": RiskJobStatus.COMPLETED.value},
+                    "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lte": now}}]
+                },
+                {"$set": {"owner": self.owner, "lease_expires_at": now + self.lease}},
+                projection={"doctor_id": 1, "patient_ids": 1, "results.patient_id": 1}
+            )
+            if not job:
+                break
+            done = {result["patient_id"] for result in job.get("results", [])}
+            for patient_id in job["patient_ids"]:
+                if patient_id not in done:
+                    self._queue.put_nowait((str(job["_id"]), job["doctor_id"], patient_id, 1))
+                    requeued += 1
+        if requeued:
+            print(f"🔁 Claimed {requeued} risk predictions from unfinished jobs")
+
+    async def get_job(self, db, job_id: str, doctor_id: str, after: int = 0) -> Optional[Dict]:
+        """A doctor's job with results from index `after` on"""
+        if not ObjectId.is_valid(job_id):
+            return None
+        projection = {"patient_ids": 0, "results": {"$slice": [after, settings.RISK_JOB_MAX_PATIENTS]}}
+        if after:
+            projection["preliminary"] = 0
+        return await db.risk_jobs.find_one({"_id": ObjectId(job_id), "doctor_id": doctor_id}, projection)
+
+    async def _preliminary(self, db, doctor_id: str, patient_ids: List[str]) -> List[Dict]:
+        """Local risk scores for every accessible patient, in one query and one scoring pass"""
+        patients = {
+            str(patient["_id"]): patient async for patient in db.users.find(
+                {
+                    "_id": {"$in": [ObjectId(p) for p in patient_ids if ObjectId.is_valid(p)]},
+                    "role": UserRole.PATIENT.value
+                },
+                {"full_name": 1, "age": 1, "gender": 1}
+            )
+        }
+        filters = await asyncio.gather(*(
+            authorization_service.visible_records_filter(db, patient_id, doctor_id)
+            for patient_id in patients
+        ))
+        visible = {
+            patient_id: record_filter
+            for patient_id, record_filter in zip(patients, filters) if record_filter is not None
+        }
+        if not visible:
+            return []
+
+        full_access = [patient_id for patient_id, record_filter in visible.items() if not record_filter]
+        clauses = [{"patient_id": {"$in": full_access}}] if full_access else []
+        clauses += [
+            {"patient_id": patient_id, **record_filter}
+            for patient_id, record_filter in visible.items() if record_filter
+        ]
+        records: Dict[str, List[Dict]] = {patient_id: [] for patient_id in visible}
+        async for record in db.medical_records.find(
+            {"$or": clauses, "deleted": {"$ne": True}},
+            {**RECORD_PROJECTION, "patient_id": 1}
+        ):
+            records[record["patient_id"]].append(record)
+
+        scores = risk_engine.score([
+            {
+                "age": patients[patient_id].get("age", "Unknown"),
+                "gender": patients[patient_id].get("gender", "Unknown"),
+                "medical_history": records[patient_id]
+            }
+            for patient_id in visible
+        ])
+        return [
+            {
+                "patient_id": patient_id,
+                "patient_name": patients[patient_id]["full_name"],
+                "result": score["risks"],
+                "confidence": score["confidence"],
+                "recommendations": score["recommendations"],
+                "source": score["source"]
+            }
+            for patient_id, score in zip(visible, scores)
+        ]
+
+    async def _work(self):
+        while True:
+            job_id, doctor_id, patient_id, attempt = await self._queue.get()
+            try:
+                db = await get_database()
+                await self._process(db, job_id, doctor_id, patient_id, attempt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Risk job {job_id} error for patient {patient_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, db, job_id: str, doctor_id: str, patient_id: str, attempt: int):
+        job_oid = ObjectId(job_id)
+        # Skip patients of jobs whose lease another process has taken over
+        owned = await db.risk_jobs.find_one_and_update(
+            {"_id": job_oid, "owner": self.owner, "status": {"$ne": RiskJobStatus.COMPLETED.value}},
+            {"$set": {"status": RiskJobStatus.RUNNING.value, "updated_at": datetime.utcnow()}},
+            projection={"_id": 1}
+        )
+        if not owned:
+            return
+
+        item = {"patient_id": patient_id}
+        try:
+            item.update(await self._predict(db, doctor_id, patient_id))
+        except LLMError as e:
+            if e.status_code == 429 and attempt < settings.RISK_JOB_MAX_ATTEMPTS:
+                # No LLM slot in time: back off and retry rather than fail the patient
+                await asyncio.sleep(BUSY_RETRY_SECONDS)
+                self._queue.put_nowait((job_id, doctor_id, patient_id, attempt + 1))
+                return
+            item["error"] = e.detail
+        except Exception as e:
+            print(f"Risk prediction error for patient {patient_id}: {e}")
+            item["error"] = "Prediction failed"
+
+        now = datetime.utcnow()
+        job = await db.risk_jobs.find_one_and_update(
+            {"_id": job_oid, "results.patient_id": {"$ne": patient_id}},
+            {
+                "$push": {"results": item},
+                "$inc": {"failed" if item.get("error") else "completed": 1},
+                "$set": {"updated_at": now}
+            },
+            projection={"total": 1, "completed": 1, "failed": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if job and job["completed"] + job["failed"] >= job["total"]:
+            await db.risk_jobs.update_one(
+                {"_id": job_oid},
+                {"$set": {"status": RiskJobStatus.COMPLETED.value, "finished_at": now}}
+            )
+
+    async def _predict(self, db, doctor_id: str, patient_id: str) -> Dict:
+        """One patient's prediction as a RiskJobResult-shaped dict"""
+        if not ObjectId.is_valid(patient_id):
+            return {"error": "Patient not found"}
+        patient = await db.users.find_one(
+            {"_id": ObjectId(patient_id), "role": UserRole.PATIENT.value},
+            {"full_name": 1, "age": 1, "gender": 1}
+        )
+        if not patient:
+            return {"error": "Patient not found"}
+
+        item = {"patient_name": patient["full_name"]}
+        record_filter = await authorization_service.visible_records_filter(db, patient_id, doctor_id)
+        if record_filter is None:
+            item["error"] = "You do not have permission to access this patient's data"
+            return item
+
+        try:
+            result = await ai_service.predict_for_patient(
+                db, patient, record_filter, user_id=doctor_id, fallback=False
+            )
+        except LLMError as e:
+            if e.status_code == 429:
+                raise
+            result = await ai_service.local_prediction(db, patient, record_filter)
+
+        recommendations = result.get("recommendations", [])
+        item.update({
+            "result": result.get("risks", {}),
+            "confidence": float(result.get("confidence", 0.0)),
+            "recommendations": recommendations if isinstance(recommendations, list) else [],
+            "source": result.get("source", "ai")
+        })
+        return item
+
+# Global risk job service instance
+risk_job_service = RiskJobService()
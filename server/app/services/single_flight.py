@@ -0,0 +1,52 @@
+# app/services/single_flight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class _Flight:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    Every caller receives the shared result or exception. A caller that is
+    cancelled only stops waiting; the shared call is cancelled once no
+    callers are left. Nothing is remembered after the call finishes, so a
+    failure is retried by the next caller.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await factory() for key, joining the call already in flight if any"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Last caller gave up: abandon the call and let the next one start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finished(self, key: str, flight: _Flight):
+        self._forget(key, flight)
+        if not flight.task.cancelled():
+            # Retrieve the exception so it is not reported as unhandled
+            flight.task.exception()
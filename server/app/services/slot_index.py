@@ -0,0 +1,159 @@
+# app/services/slot_index.py
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+class DayIntervals:
+    """
+    Sorted, non-overlapping [start, end) intervals for one doctor-day.
+
+    Intervals are kept sorted by start, so an overlap check is a single
+    bisect: the only interval that can overlap [start, end) is the last one
+    starting before `end`.
+    """
+
+    def __init__(self):
+        self._intervals: List[Tuple[Any, Any, str]] = []
+        self._windows: Optional[List[Tuple[Any, Any]]] = None
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def overlaps(self, start, end) -> bool:
+        """Check if [start, end) overlaps any stored interval"""
+        index = bisect_left(self._intervals, (end,))
+        return index > 0 and self._intervals[index - 1][1] > start
+
+    def add(self, start, end, slot_id: str):
+        """Insert an interval (caller guarantees it does not overlap)"""
+        insort(self._intervals, (start, end, slot_id))
+        self._windows = None
+
+    def remove(self, slot_id: str, start=None) -> Optional[Tuple[Any, Any, str]]:
+        """Remove the interval for slot_id, if present (bisect when start is known)"""
+        if start is not None:
+            index = bisect_left(self._intervals, (start,))
+            candidates = range(index, min(index + 1, len(self._intervals)))
+        else:
+            candidates = range(len(self._intervals))
+        for index in candidates:
+            if self._intervals[index][2] == slot_id:
+                self._windows = None
+                return self._intervals.pop(index)
+        return None
+
+    def intervals(self) -> List[Tuple[Any, Any, str]]:
+        return list(self._intervals)
+
+    def free_windows(self) -> List[Tuple[Any, Any]]:
+        """Open slots merged into contiguous windows (memoized until the next write)"""
+        if self._windows is None:
+            windows = []
+            for start, end, _ in self._intervals:
+                if windows and windows[-1][1] >= start:
+                    windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+                else:
+                    windows.append((start, end))
+            self._windows = windows
+        return self._windows
+
+class SlotIndex:
+    """
+    In-memory index of open slots per (doctor_id, date).
+
+    Days are loaded lazily from `doctor_availability` (one query per range
+    of missing days), evicted least-recently-used beyond
+    SLOT_INDEX_MAX_DAYS, and kept current by this process's slot write
+    paths. Other workers' writes show up once a day is reloaded after
+    SLOT_INDEX_TTL_SECONDS; until then they are not seen, so it is not the
+    authority on overlaps: slot creation checks Mongo
+    (AvailabilityService.find_conflicts).
+    """
+
+    def __init__(self, max_days: int = 20000, ttl: float = 60):
+        self.max_days = max_days
+        self.ttl = ttl
+        self._days: "OrderedDict[Tuple[str, str], DayIntervals]" = OrderedDict()
+
+    def _touch(self, key: Tuple[str, str], intervals: DayIntervals):
+        self._days[key] = intervals
+        self._days.move_to_end(key)
+        while len(self._days) > self.max_days:
+            self._days.popitem(last=False)
+
+    async def get_day(self, db, doctor_id: str, day: str) -> DayIntervals:
+        """Get the open-slot intervals for a doctor-day"""
+        days = await self.get_days(db, doctor_id, day, day)
+        return days[day]
+
+    async def get_days(self, db, doctor_id: str, date_from: str,
+                       date_to: str) -> Dict[str, DayIntervals]:
+        """Get intervals for every day in [date_from, date_to], loading missing or expired days at once"""
+        all_days = []
+        day = date.fromisoformat(date_from)
+        last = date.fromisoformat(date_to)
+        while day <= last:
+            all_days.append(day.isoformat())
+            day += timedelta(days=1)
+
+        stale_before = time.monotonic() - self.ttl
+        missing = [
+            d for d in all_days
+            if (doctor_id, d) not in self._days or self._days[(doctor_id, d)].loaded_at < stale_before
+        ]
+        loaded: Dict[str, DayIntervals] = {}
+        if missing:
+            fetched = await self.fetch_days(db, doctor_id, missing[0], missing[-1])
+            loaded = {d: fetched.get(d) or DayIntervals() for d in missing}
+
+        result = {}
+        for d in all_days:
+            intervals = loaded[d] if d in loaded else self._days[(doctor_id, d)]
+            self._touch((doctor_id, d), intervals)
+            result[d] = intervals
+        return result
+
+    async def fetch_days(self, db, doctor_id: str, date_from: str,
+                         date_to: str) -> Dict[str, DayIntervals]:
+        """
+        Read open-slot intervals for [date_from, date_to] straight from
+        Mongo, bypassing the cache. Days without slots are left out.
+        """
+        days: Dict[str, DayIntervals] = {}
+        cursor = db.doctor_availability.find(
+            {
+                "doctor_id": doctor_id,
+                "date": {"$gte": date_from, "$lte": date_to},
+                "is_available": True
+            },
+            {"date": 1, "start_time": 1, "end_time": 1}
+        )
+        async for slot in cursor:
+            days.setdefault(slot["date"], DayIntervals()).add(
+                slot["start_time"], slot["end_time"], str(slot["_id"])
+            )
+        return days
+
+    def add_slot(self, doctor_id: str, day: str, start, end, slot_id: str):
+        """Record a newly open slot (no-op if the day is not loaded)"""
+        intervals = self._days.get((doctor_id, day))
+        if intervals is not None:
+            intervals.add(start, end, slot_id)
+
+    def remove_slot(self, doctor_id: str, day: str, slot_id: str, start=None):
+        """Record that a slot is no longer open (no-op if the day is not loaded)"""
+        intervals = self._days.get((doctor_id, day))
+        if intervals is not None:
+            intervals.remove(slot_id, start)
+
+    def invalidate(self, doctor_id: str):
+        """Drop every loaded day for a doctor"""
+        for key in [key for key in self._days if key[0] == doctor_id]:
+            del self._days[key]
+
+# Global slot index instance
+slot_index = SlotIndex(max_days=settings.SLOT_INDEX_MAX_DAYS, ttl=settings.SLOT_INDEX_TTL_SECONDS)
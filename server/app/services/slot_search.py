@@ -0,0 +1,194 @@
+# app/services/slot_search.py
+import asyncio
+import time
+from bisect import bisect_left, insort
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.timeutils import to_instant, to_local
+from app.models.schemas import UserRole
+
+class FreeSlotIndex:
+    """
+    Global, time-ordered index of open slots across all doctors.
+
+    Loaded at startup with every open slot that has not started yet, then
+    kept current by slot creation, booking and release, and reloaded in the
+    background after SLOT_SEARCH_REFRESH_SECONDS so changes made by other
+    workers show up. Slots leave the index once they start. "Today" is the
+    clinic's date (CLINIC_TIMEZONE). Until it is loaded, searches fall back
+    to Mongo.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self._order: List[tuple] = []  # (date, start_time, slot_id), sorted
+        self._slots: Dict[str, Dict] = {}
+        self._doctors: Dict[str, Optional[Dict]] = {}  # None: not an active doctor
+        self._pending_doctors = set()
+
+    async def load(self, db):
+        """Load all open slots that have not started yet, plus doctor cards"""
+        order = []
+        slots = {}
+        cursor = db.doctor_availability.find(
+            {"is_available": True, "start": {"$gte": datetime.utcnow()}},
+            {"doctor_id": 1, "date": 1, "start_time": 1, "end_time": 1, "start": 1}
+        )
+        async for slot in cursor:
+            slot_id = str(slot.pop("_id"))
+            slots[slot_id] = slot
+            order.append((slot["date"], slot["start_time"], slot_id))
+        order.sort()
+
+        self._order = order
+        self._slots = slots
+        self._doctors = {}
+        self._pending_doctors = set()
+        await self._load_doctors(db, {slot["doctor_id"] for slot in slots.values()})
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        print(f"✅ Free slot index loaded ({len(order)} open slots)")
+
+    def add(self, slot_id: str, slot: Dict):
+        """Record an open slot"""
+        if not self.loaded or slot_id in self._slots:
+            return
+        self._slots[slot_id] = {
+            "doctor_id": slot["doctor_id"],
+            "date": slot["date"],
+            "start_time": slot["start_time"],
+            "end_time": slot["end_time"],
+            "start": slot.get("start") or to_instant(slot["date"], slot["start_time"])
+        }
+        insort(self._order, (slot["date"], slot["start_time"], slot_id))
+        if slot["doctor_id"] not in self._doctors:
+            self._pending_doctors.add(slot["doctor_id"])
+
+    def remove(self, slot_id: str):
+        """Record that a slot is no longer open"""
+        slot = self._slots.pop(slot_id, None)
+        if slot is None:
+            return
+        key = (slot["date"], slot["start_time"], slot_id)
+        index = bisect_left(self._order, key)
+        if index < len(self._order) and self._order[index] == key:
+            self._order.pop(index)
+
+    def update_doctor(self, doctor_id: str, card: Dict):
+        """Refresh a doctor's name/specialization"""
+        self._doctors[doctor_id] = card
+
+    async def search(self, db, limit: int, specialization: Optional[str] = None,
+                     date_from: Optional[str] = None,
+                     date_to: Optional[str] = None) -> List[Dict]:
+        """Earliest `limit` open slots across doctors, optionally filtered"""
+        now = datetime.utcnow()
+        today = to_local(now).date().isoformat()
+        date_from = max(date_from or today, today)
+
+        if not self.loaded:
+            return await self._search_mongo(db, limit, specialization, now, date_from, date_to)
+        self._ensure_fresh(db)
+
+        # Drop slots that have already started off the head of the index
+        stale = 0
+        while stale < len(self._order) and self._slots[self._order[stale][2]]["start"] < now:
+            stale += 1
+        if stale:
+            for _, _, slot_id in self._order[:stale]:
+                self._slots.pop(slot_id, None)
+            del self._order[:stale]
+
+        if self._pending_doctors:
+            pending, self._pending_doctors = self._pending_doctors, set()
+            await self._load_doctors(db, pending)
+
+        results = []
+        for slot_date, _, slot_id in self._order[bisect_left(self._order, (date_from,)):]:
+            if date_to and slot_date > date_to:
+                break
+            slot = self._slots[slot_id]
+            if slot["start"] < now:
+                continue
+            doctor = self._doctors.get(slot["doctor_id"])
+            if doctor is None:
+                continue
+            if specialization and doctor["specialization"] != specialization:
+                continue
+            results.append(self._to_result(slot_id, slot, doctor))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _ensure_fresh(self, db):
+        if (time.monotonic() - self.loaded_at > settings.SLOT_SEARCH_REFRESH_SECONDS
+                and (self._reload_task is None or self._reload_task.done())):
+            self._reload_task = asyncio.create_task(self._reload(db))
+
+    async def _reload(self, db):
+        try:
+            await self.load(db)
+        except Exception as e:
+            print(f"Free slot index reload error: {e}")
+
+    async def _search_mongo(self, db, limit, specialization, now, date_from, date_to) -> List[Dict]:
+        query = {"is_available": True, "start": {"$gte": now}, "date": {"$gte": date_from}}
+        if date_to:
+            query["date"]["$lte"] = date_to
+        if specialization:
+            doctor_ids = [
+                str(doctor["_id"]) async for doctor in db.users.find(
+                    {"role": UserRole.DOCTOR.value, "specialization": specialization},
+                    {"_id": 1}
+                )
+            ]
+            query["doctor_id"] = {"$in": doctor_ids}
+
+        slots = await db.doctor_availability.find(
+            query, {"doctor_id": 1, "date": 1, "start_time": 1, "end_time": 1}
+        ).sort([("date", 1), ("start_time", 1)]).limit(limit).to_list(limit)
+
+        await self._load_doctors(db, {
+            slot["doctor_id"] for slot in slots if slot["doctor_id"] not in self._doctors
+        })
+        return [
+            self._to_result(str(slot["_id"]), slot, self._doctors[slot["doctor_id"]])
+            for slot in slots if self._doctors.get(slot["doctor_id"])
+        ]
+
+    async def _load_doctors(self, db, doctor_ids):
+        if not doctor_ids:
+            return
+        for doctor_id in doctor_ids:
+            self._doctors[doctor_id] = None
+        cursor = db.users.find(
+            {
+                "_id": {"$in": [ObjectId(d) for d in doctor_ids if ObjectId.is_valid(d)]},
+                "role": UserRole.DOCTOR.value,
+                "is_active": True
+            },
+            {"full_name": 1, "specialization": 1}
+        )
+        async for doctor in cursor:
+            self._doctors[str(doctor["_id"])] = {
+                "full_name": doctor["full_name"],
+                "specialization": doctor.get("specialization", "General Practitioner")
+            }
+
+    def _to_result(self, slot_id: str, slot: Dict, doctor: Dict) -> Dict:
+        return {
+            "slot_id": slot_id,
+            "doctor_id": slot["doctor_id"],
+            "doctor_name": doctor["full_name"],
+            "specialization": doctor["specialization"],
+            "date": slot["date"],
+            "start_time": slot["start_time"],
+            "end_time": slot["end_time"]
+        }
+
+# Global free slot index instance
+free_slot_index = FreeSlotIndex()
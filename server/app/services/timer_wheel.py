@@ -0,0 +1,80 @@
+# app/services/timer_wheel.py
+import math
+from typing import Any, List
+
+class HierarchicalTimerWheel:
+    """
+    Hashed hierarchical timer wheel.
+
+    Level 0 has `wheel_size` buckets of one tick each; every level above
+    covers `wheel_size` times the span of the one below. A timer lands on
+    the lowest level whose span covers its delay and is cascaded down a
+    level when its bucket comes round, so adding is O(1) and advancing is
+    O(ticks elapsed + timers due), independent of how many are pending.
+    """
+
+    def __init__(self, tick: float, now: float, wheel_size: int = 64, levels: int = 4):
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self.levels = levels
+        self.current_tick = math.floor(now / tick)
+        self._wheels = [[[] for _ in range(wheel_size)] for _ in range(levels)]
+        self._ready: List[Any] = []  # already due when added
+        self._overflow: List[tuple] = []  # beyond the top level's span
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, when: float, item: Any):
+        """Schedule item at timestamp `when` (seconds)"""
+        self._count += 1
+        self._place(math.ceil(when / self.tick), item)
+
+    def _place(self, due_tick: int, item: Any):
+        delay = due_tick - self.current_tick
+        if delay <= 0:
+            self._ready.append(item)
+            return
+        span = self.wheel_size
+        for level in range(self.levels):
+            if delay < span:
+                bucket = (due_tick // (span // self.wheel_size)) % self.wheel_size
+                self._wheels[level][bucket].append((due_tick, item))
+                return
+            span *= self.wheel_size
+        self._overflow.append((due_tick, item))
+
+    def advance(self, now: float) -> List[Any]:
+        """Move the wheel to `now`; returns every item that came due"""
+        due = self._ready
+        self._ready = []
+        target = math.floor(now / self.tick)
+        while self.current_tick < target:
+            self.current_tick += 1
+            self._cascade()
+            bucket = self._wheels[0][self.current_tick % self.wheel_size]
+            if bucket:
+                due.extend(item for _, item in bucket)
+                bucket.clear()
+            due.extend(self._ready)
+            self._ready = []
+        self._count -= len(due)
+        return due
+
+    def _cascade(self):
+        # Timers beyond the top level are re-placed once per top-level bucket
+        if self._overflow and self.current_tick % self.wheel_size ** (self.levels - 1) == 0:
+            overflow, self._overflow = self._overflow, []
+            for due_tick, item in overflow:
+                self._place(due_tick, item)
+        # Highest level first, so timers can fall through several levels at once
+        for level in range(self.levels - 1, 0, -1):
+            span = self.wheel_size ** level
+            if self.current_tick % span:
+                continue
+            bucket = self._wheels[level][(self.current_tick // span) % self.wheel_size]
+            timers = list(bucket)
+            bucket.clear()
+            for due_tick, item in timers:
+                self._place(due_tick, item)
@@ -0,0 +1,206 @@
+# app/services/waitlist.py
+import asyncio
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.timeutils import to_local
+from app.models.schemas import WaitlistStatus
+from app.services.booking import booking_service
+
+class WaitlistService:
+    """
+    Event-driven slot backfill.
+
+    `waitlist_entries` sorted by created_at per doctor is the priority
+    queue. When a booked slot is freed, the first waiting entry whose date
+    window covers it is atomically claimed and offered the slot, which is
+    held (not publicly bookable) until the offer is accepted, declined or
+    expires after WAITLIST_HOLD_MINUTES; then it moves on to the next
+    entry. Only when nobody is waiting does the slot go back to open.
+    Offers are delivered as `notifications`, and entries still waiting
+    once their date window has passed expire.
+    """
+
+    def __init__(self):
+        self.hold = timedelta(minutes=settings.WAITLIST_HOLD_MINUTES)
+
+    async def slot_freed(self, db, slot_id: str, hold_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Offer a freed slot to the next waiting patient, or reopen it.
+        hold_id is the offer currently holding the slot, if any.
+        Returns the entry that received the offer.
+        """
+        now = datetime.utcnow()
+        slot = await db.doctor_availability.find_one(
+            {"_id": ObjectId(slot_id), "is_available": False, "held_for": hold_id},
+            {"doctor_id": 1, "date": 1, "start_time": 1, "start": 1}
+        )
+        if not slot:
+            return None
+        if slot.get("start") and slot["start"] <= now:
+            await booking_service.release_slot(db, slot_id, hold_id)
+            return None
+
+        expires_at = now + self.hold
+        entry = await db.waitlist_entries.find_one_and_update(
+            {
+                "doctor_id": slot["doctor_id"],
+                "status": WaitlistStatus.WAITING.value,
+                "date_from": {"$lte": slot["date"]},
+                "date_to": {"$gte": slot["date"]}
+            },
+            {"$set": {
+                "status": WaitlistStatus.OFFERED.value,
+                "offer_slot_id": slot_id,
+                "offer_expires_at": expires_at,
+                "updated_at": now
+            }},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if not entry:
+            await booking_service.release_slot(db, slot_id, hold_id)
+            return None
+
+        held = await db.doctor_availability.find_one_and_update(
+            {"_id": ObjectId(slot_id), "is_available": False, "held_for": hold_id},
+            {
+                "$set": {"held_for": str(entry["_id"]), "hold_expires_at": expires_at, "updated_at": now},
+                "$unset": {"booked_by": ""}
+            }
+        )
+        if not held:
+            # Slot changed hands in the meantime; put the entry back in line
+            await db.waitlist_entries.update_one(
+                {"_id": entry["_id"], "status": WaitlistStatus.OFFERED.value},
+                {
+                    "$set": {"status": WaitlistStatus.WAITING.value, "updated_at": now},
+                    "$unset": {"offer_slot_id": "", "offer_expires_at": ""}
+                }
+            )
+            return None
+
+        await db.notifications.insert_one({
+            "user_id": entry["patient_id"],
+            "type": "waitlist_offer",
+            "waitlist_entry_id": str(entry["_id"]),
+            "slot_id": slot_id,
+            "message": (
+                f"A slot with {entry['doctor_name']} opened up on {slot['date']} at "
+                f"{slot['start_time']}. It is held for you for {settings.WAITLIST_HOLD_MINUTES} minutes."
+            ),
+            "is_read": False,
+            "created_at": now
+        })
+        print(f"📨 Offered slot {slot_id} to waitlisted patient {entry['patient_id']}")
+        return entry
+
+    async def accept(self, db, entry: Dict, patient: Dict) -> Dict:
+        """Book the offered slot; raises BookingError if the offer lapsed"""
+        appointment = await booking_service.book(
+            db,
+            patient=patient,
+            doctor_id=entry["doctor_id"],
+            slot_id=entry["offer_slot_id"],
+            reason=entry["reason"],
+            hold_id=str(entry["_id"])
+        )
+        await db.waitlist_entries.update_one(
+            {"_id": entry["_id"]},
+            {"$set": {
+                "status": WaitlistStatus.BOOKED.value,
+                "appointment_id": str(appointment["_id"]),
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        return appointment
+
+    async def withdraw(self, db, entry_id: ObjectId, patient_id: str,
+                       new_status: WaitlistStatus) -> Optional[Dict]:
+        """Decline an offer (DECLINED) or leave the waitlist; a held slot moves on"""
+        active = [WaitlistStatus.OFFERED.value]
+        if new_status != WaitlistStatus.DECLINED:
+            active.append(WaitlistStatus.WAITING.value)
+        entry = await db.waitlist_entries.find_one_and_update(
+            {"_id": entry_id, "patient_id": patient_id, "status": {"$in": active}},
+            {"$set": {"status": new_status.value, "updated_at": datetime.utcnow()}}
+        )
+        if entry and entry["status"] == WaitlistStatus.OFFERED.value:
+            await self.slot_freed(db, entry["offer_slot_id"], str(entry["_id"]))
+        return entry
+
+    async def expire_offers(self, db) -> int:
+        """Expire lapsed offers and pass their slots on; returns count"""
+        expired = 0
+        while True:
+            entry = await db.waitlist_entries.find_one_and_update(
+                {
+                    "status": WaitlistStatus.OFFERED.value,
+                    "offer_expires_at": {"$lte": datetime.utcnow()}
+                },
+                {"$set": {"status": WaitlistStatus.EXPIRED.value, "updated_at": datetime.utcnow()}},
+                sort=[("offer_expires_at", 1)]
+            )
+            if not entry:
+                break
+            await self.slot_freed(db, entry["offer_slot_id"], str(entry["_id"]))
+            expired += 1
+
+        if expired:
+            print(f"⏱️ Expired {expired} waitlist offers")
+        return expired
+
+    async def expire_waiting(self, db) -> int:
+        """Expire waiting entries whose date window has passed; returns count"""
+        today = to_local(datetime.utcnow()).date().isoformat()
+        result = await db.waitlist_entries.update_many(
+            {"status": WaitlistStatus.WAITING.value, "date_to": {"$lt": today}},
+            {"$set": {"status": WaitlistStatus.EXPIRED.value, "updated_at": datetime.utcnow()}}
+        )
+        if result.modified_count:
+            print(f"⏱️ Expired {result.modified_count} waitlist entries past their window")
+        return result.modified_count
+
+class WaitlistSweeper:
+    """
+    Background task expiring waitlist offers past their hold period and
+    waiting entries past their date window
+    """
+
+    def __init__(self):
+        self.interval = settings.WAITLIST_SWEEP_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the sweep loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the sweep loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                db = await get_database()
+                await waitlist_service.expire_offers(db)
+                await waitlist_service.expire_waiting(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Waitlist sweep error: {e}")
+            await asyncio.sleep(self.interval)
+
+# Global waitlist instances
+waitlist_service = WaitlistService()
+waitlist_sweeper = WaitlistSweeper()
@@ -0,0 +1,210 @@
+# benchmarks/ai_endpoints.py - AI endpoint throughput and tail latency
+#
+# Drives an AI endpoint through the full app stack (auth, access checks,
+# cache, coalescing, admission control, prompt building, HTTP backend) with
+# many concurrent clients, against the local LLM stub instead of a paid
+# provider. The stub is started automatically unless --stub-url is given.
+# Each request targets patient i % --patients, so with the default of one
+# patient per request every call reaches the LLM. Uses a scratch database;
+# run from server/:
+#
+#   python -m benchmarks.ai_endpoints --endpoint predict --requests 200 --concurrency 20
+import argparse
+import asyncio
+import contextlib
+import io
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.core import database
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import app
+from app.models.schemas import RecordType, UserRole
+from app.services.ai_service import ai_service
+from app.services.llm_backends import OpenAICompatibleBackend
+from benchmarks.booking_contention import percentile
+
+RECORD_TEMPLATES = [
+    (RecordType.DIAGNOSIS, "Hypertension follow-up", ["Hypertension"], ["Lisinopril 10mg"]),
+    (RecordType.LAB_REPORT, "Lipid panel", [], []),
+    (RecordType.PRESCRIPTION, "Metformin refill", ["Type 2 diabetes"], ["Metformin 500mg"]),
+    (RecordType.VACCINATION, "Influenza vaccine", [], []),
+    (RecordType.IMAGING, "Chest X-ray", ["Mild bronchitis"], []),
+]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def start_stub(args) -> tuple:
+    """Launch benchmarks.llm_stub in a subprocess and wait until it answers"""
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.llm_stub", "--port", str(port),
+        "--latency-ms", str(args.latency_ms), "--latency-sigma", str(args.latency_sigma),
+        "--tail-rate", str(args.tail_rate), "--tail-ms", str(args.tail_ms),
+        "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+        "--seed", "1"
+    ])
+    url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return url, process
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("LLM stub did not start")
+
+async def seed(db, num_patients: int, records_per_patient: int) -> list:
+    """Create patients with a few records each; returns (patient_id, token) pairs"""
+    now = datetime.utcnow()
+    result = await db.users.insert_many([
+        {
+            "email": f"bench-patient-{i}@example.com",
+            "full_name": f"Bench Patient {i}",
+            "role": UserRole.PATIENT.value,
+            "is_active": True,
+            "age": 30 + i % 50,
+            "gender": "female" if i % 2 else "male",
+            "created_at": now
+        }
+        for i in range(num_patients)
+    ])
+    patient_ids = [str(patient_id) for patient_id in result.inserted_ids]
+
+    records = []
+    for patient_id in patient_ids:
+        for j in range(records_per_patient):
+            record_type, title, diagnosis, medications = RECORD_TEMPLATES[j % len(RECORD_TEMPLATES)]
+            records.append({
+                "patient_id": patient_id,
+                "record_type": record_type.value,
+                "title": title,
+                "description": f"{title} visit notes",
+                "diagnosis": diagnosis,
+                "medications": medications,
+                "record_hash": f"bench-{patient_id}-{j}",
+                "created_at": now - timedelta(days=90 * j)
+            })
+    if records:
+        await db.medical_records.insert_many(records)
+    return [(patient_id, create_access_token({"sub": patient_id})) for patient_id in patient_ids]
+
+def request_for(endpoint: str, patient_id: str) -> tuple:
+    """(method, path, json body) of one AI request for a patient"""
+    if endpoint == "predict":
+        return "POST", "/api/v1/ai/predict", {"patient_id": patient_id, "prediction_type": "disease_risk"}
+    if endpoint == "summary":
+        return "POST", "/api/v1/ai/health-summary", {"patient_id": patient_id}
+    return "GET", f"/api/v1/ai/recommendations/{patient_id}", None
+
+async def run(args, stub_url: str) -> bool:
+    """Run the endpoint benchmark and print results"""
+    db = await database.get_database()
+    patients = await seed(db, args.patients or args.requests, args.records)
+    latencies = []
+    statuses = Counter()
+    sources = Counter()
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+    ) as client:
+        async def call(i: int):
+            patient_id, token = patients[i % len(patients)]
+            method, path, body = request_for(args.endpoint, patient_id)
+            async with slots:
+                start = time.perf_counter()
+                response = await client.request(
+                    method, path, json=body, headers={"Authorization": f"Bearer {token}"}
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+            if args.endpoint == "predict" and response.status_code == 200:
+                sources[response.json().get("source", "ai")] += 1
+
+        # The AI service logs every prompt and response; keep the report readable
+        output = sys.stdout if args.verbose else io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            await asyncio.gather(*(call(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    async with httpx.AsyncClient() as stub:
+        upstream = (await stub.get(f"{stub_url}/stats")).json()
+
+    print("=" * 60)
+    print(f"Endpoint:        {args.endpoint}, {args.requests} requests, concurrency {args.concurrency}")
+    print(f"Patients:        {len(patients)} x {args.records} records")
+    print(f"Stub:            median {args.latency_ms:.0f} ms, sigma {args.latency_sigma}, "
+          f"tail {args.tail_rate:.1%} at {args.tail_ms:.0f} ms, "
+          f"errors {args.error_rate:.1%}, 429s {args.rate_limit_rate:.1%}")
+    print(f"Statuses:        {dict(sorted(statuses.items()))}")
+    if sources:
+        print(f"Sources:         {dict(sources)}")
+    print(f"Upstream calls:  {upstream.get('requests', 0)}")
+    print(f"Throughput:      {args.requests / elapsed:.1f} req/s")
+    print(f"Latency p50/p95/p99/max: {percentile(latencies, 50):.0f} / {percentile(latencies, 95):.0f} / "
+          f"{percentile(latencies, 99):.0f} / {max(latencies):.0f} ms")
+    print("=" * 60)
+
+    return statuses[200] > 0
+
+async def main():
+    parser = argparse.ArgumentParser(description="AI endpoint load benchmark")
+    parser.add_argument("--endpoint", choices=["predict", "summary", "recommendations"], default="predict")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=0, help="distinct patients (default: one per request)")
+    parser.add_argument("--records", type=int, default=10, help="records per patient")
+    parser.add_argument("--stub-url", help="use a running llm_stub instead of starting one")
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--tail-ms", type=float, default=10000)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--verbose", action="store_true", help="show the app's AI logging")
+    parser.add_argument("--mongodb-url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default=f"{settings.DATABASE_NAME}_bench")
+    args = parser.parse_args()
+
+    stub_process = None
+    if args.stub_url:
+        stub_url = args.stub_url.rstrip("/")
+    else:
+        stub_url, stub_process = await start_stub(args)
+    ai_service.use_backend(OpenAICompatibleBackend(f"{stub_url}/v1", "stub"))
+
+    settings.MONGODB_URL = args.mongodb_url
+    settings.DATABASE_NAME = args.database
+    with contextlib.redirect_stdout(io.StringIO()):
+        await database.init_db()
+        await database.db.client.drop_database(args.database)
+        await database.create_indexes()
+    try:
+        ok = await run(args, stub_url)
+    finally:
+        await database.db.client.drop_database(args.database)
+        database.db.client.close()
+        await ai_service.close()
+        if stub_process:
+            stub_process.terminate()
+            stub_process.wait()
+
+    print("PASS: AI endpoint served requests" if ok else "FAIL: no successful responses")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    exit(asyncio.run(main()))
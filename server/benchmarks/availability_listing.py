@@ -0,0 +1,145 @@
+# benchmarks/availability_listing.py - Availability listing: ISO strings vs native datetimes
+#
+# Seeds a doctor's schedule and times the availability listing both ways:
+#   before: string `date` range, sort on date/start_time, per-row ISO parsing
+#   after:  index-bounded `start` range, single sort, rows passed straight
+#           to the response model
+# Uses a scratch database; run from server/:
+#
+#   python -m benchmarks.availability_listing --days 365 --slots-per-day 32
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.timeutils import to_instant, day_range
+from app.models.schemas import DoctorAvailabilityResponse
+from benchmarks.booking_contention import percentile
+
+def parse_iso_fields(slot: dict) -> dict:
+    """The per-row conversion the listing endpoint used to do (prepare_for_response)"""
+    if isinstance(slot.get("date"), str):
+        try:
+            slot["date"] = date.fromisoformat(slot["date"])
+        except (ValueError, AttributeError):
+            pass
+    if isinstance(slot.get("start_time"), str):
+        try:
+            slot["start_time"] = time.fromisoformat(slot["start_time"])
+        except (ValueError, AttributeError):
+            pass
+    if isinstance(slot.get("end_time"), str):
+        try:
+            slot["end_time"] = time.fromisoformat(slot["end_time"])
+        except (ValueError, AttributeError):
+            pass
+    return slot
+
+async def seed(db, num_days: int, slots_per_day: int) -> str:
+    """Create one doctor's schedule (plus a second doctor as noise)"""
+    now = datetime.utcnow()
+    first_day = date(2030, 1, 1)
+    for doctor_id in ("bench-doctor", "other-doctor"):
+        slots = []
+        for d in range(num_days):
+            day = (first_day + timedelta(days=d)).isoformat()
+            for i in range(slots_per_day):
+                start = datetime(2030, 1, 1, 8) + timedelta(minutes=15 * i)
+                start_time = start.time().isoformat()
+                end_time = (start + timedelta(minutes=15)).time().isoformat()
+                slots.append({
+                    "doctor_id": doctor_id,
+                    "date": day,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "start": to_instant(day, start_time),
+                    "end": to_instant(day, end_time),
+                    "is_available": True,
+                    "created_at": now,
+                    "updated_at": now
+                })
+        await db.doctor_availability.insert_many(slots)
+
+    await db.doctor_availability.create_index([("doctor_id", 1), ("date", 1), ("is_available", 1)])
+    await db.doctor_availability.create_index([("doctor_id", 1), ("start", 1)])
+    return "bench-doctor"
+
+async def list_before(db, doctor_id: str, date_from: str, date_to: str):
+    query = {"doctor_id": doctor_id, "is_available": True,
+             "date": {"$gte": date_from, "$lte": date_to}}
+    cursor = db.doctor_availability.find(query).sort([("date", 1), ("start_time", 1)])
+    rows = []
+    async for slot in cursor:
+        slot["id"] = str(slot.pop("_id"))
+        rows.append(DoctorAvailabilityResponse(**parse_iso_fields(slot)))
+    return rows
+
+async def list_after(db, doctor_id: str, date_from: str, date_to: str):
+    lower, upper = day_range(date_from, date_to)
+    query = {"doctor_id": doctor_id, "is_available": True,
+             "start": {"$gte": lower, "$lt": upper}}
+    cursor = db.doctor_availability.find(query).sort("start", 1)
+    rows = []
+    async for slot in cursor:
+        slot["id"] = str(slot.pop("_id"))
+        rows.append(DoctorAvailabilityResponse(**slot))
+    return rows
+
+async def run(db, num_days: int, slots_per_day: int, window_days: int, iterations: int):
+    """Run the listing benchmark and print results"""
+    doctor_id = await seed(db, num_days, slots_per_day)
+    date_from = date(2030, 1, 1) + timedelta(days=num_days // 2)
+    date_to = date_from + timedelta(days=window_days - 1)
+    date_from, date_to = date_from.isoformat(), date_to.isoformat()
+
+    results = {}
+    for name, listing in (("before", list_before), ("after", list_after)):
+        await listing(db, doctor_id, date_from, date_to)  # warm up
+        latencies = []
+        for _ in range(iterations):
+            start = perf_counter()
+            rows = await listing(db, doctor_id, date_from, date_to)
+            latencies.append((perf_counter() - start) * 1000)
+        results[name] = (rows, latencies)
+
+    before_rows, before = results["before"]
+    after_rows, after = results["after"]
+    same = [r.id for r in before_rows] == [r.id for r in after_rows]
+
+    print("=" * 60)
+    print(f"Schedule:        {num_days} days x {slots_per_day} slots, listing {window_days} days")
+    print(f"Rows returned:   {len(after_rows)}")
+    for name, latencies in (("Before", before), ("After", after)):
+        print(f"{name + ':':<16} p50 {percentile(latencies, 50):.2f} ms, "
+              f"p95 {percentile(latencies, 95):.2f} ms")
+    print(f"Speedup (p50):   {percentile(before, 50) / percentile(after, 50):.2f}x")
+    print("=" * 60)
+
+    return same
+
+async def main():
+    parser = argparse.ArgumentParser(description="Availability listing benchmark")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--slots-per-day", type=int, default=32)
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--mongodb-url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default=f"{settings.DATABASE_NAME}_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.mongodb_url)
+    await client.drop_database(args.database)
+    try:
+        ok = await run(client[args.database], args.days, args.slots_per_day,
+                       args.window_days, args.iterations)
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+    print("PASS: both listings agree" if ok else "FAIL: listings differ")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    exit(asyncio.run(main()))
@@ -0,0 +1,139 @@
+# benchmarks/booking_contention.py - Slot booking contention benchmark
+#
+# Fires many concurrent bookings at a small set of slots and verifies that
+# no slot is booked twice. Uses a scratch database; run from server/:
+#
+#   python -m benchmarks.booking_contention --requests 500 --slots 10
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.timeutils import to_instant
+from app.models.schemas import UserRole
+from app.services.booking import booking_service, BookingError
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def seed(db, num_slots: int, num_patients: int):
+    """Create one doctor, its slots and a pool of patients"""
+    now = datetime.utcnow()
+    doctor = await db.users.insert_one({
+        "email": "bench-doctor@example.com",
+        "full_name": "Bench Doctor",
+        "role": UserRole.DOCTOR.value,
+        "is_active": True,
+        "created_at": now
+    })
+    doctor_id = str(doctor.inserted_id)
+
+    # Back-to-back 15 minute slots from 09:00, running on into the following days
+    first = datetime(2030, 1, 1, 9)
+    slot_length = timedelta(minutes=15)
+    slots = []
+    for i in range(num_slots):
+        slot_start = first + i * slot_length
+        slot_end = slot_start + slot_length
+        slots.append({
+            "doctor_id": doctor_id,
+            "date": slot_start.date().isoformat(),
+            "start_time": slot_start.time().isoformat(),
+            "end_time": slot_end.time().isoformat(),
+            "start": to_instant(slot_start.date(), slot_start.time()),
+            "end": to_instant(slot_end.date(), slot_end.time()),
+            "is_available": True,
+            "created_at": now,
+            "updated_at": now
+        })
+    slots = await db.doctor_availability.insert_many(slots)
+
+    patients = []
+    for i in range(num_patients):
+        patient = {
+            "email": f"bench-patient-{i}@example.com",
+            "full_name": f"Bench Patient {i}",
+            "role": UserRole.PATIENT.value,
+            "is_active": True,
+            "created_at": now
+        }
+        patient["_id"] = (await db.users.insert_one(patient)).inserted_id
+        patients.append(patient)
+
+    return doctor_id, [str(slot_id) for slot_id in slots.inserted_ids], patients
+
+async def run(db, num_requests: int, num_slots: int):
+    """Run the contention benchmark and print results"""
+    doctor_id, slot_ids, patients = await seed(db, num_slots, min(num_requests, 200))
+    latencies = []
+    outcomes = {"booked": 0, "rejected": 0, "error": 0}
+
+    async def attempt(i: int):
+        start = time.perf_counter()
+        try:
+            await booking_service.book(
+                db,
+                patient=patients[i % len(patients)],
+                doctor_id=doctor_id,
+                slot_id=slot_ids[i % len(slot_ids)],
+                reason="benchmark"
+            )
+            outcomes["booked"] += 1
+        except BookingError:
+            outcomes["rejected"] += 1
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            outcomes["error"] += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(attempt(i) for i in range(num_requests)))
+    elapsed = time.perf_counter() - started
+
+    # Every slot must have exactly one appointment
+    double_booked = 0
+    async for group in db.appointments.aggregate([
+        {"$group": {"_id": "$slot_id", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]):
+        double_booked += 1
+
+    print("=" * 60)
+    print(f"Requests:        {num_requests} over {num_slots} slots")
+    print(f"Booked:          {outcomes['booked']}")
+    print(f"Rejected:        {outcomes['rejected']}")
+    print(f"Errors:          {outcomes['error']}")
+    print(f"Double-booked:   {double_booked}")
+    print(f"Throughput:      {num_requests / elapsed:.1f} req/s")
+    print(f"Latency p50/p95/p99: {percentile(latencies, 50):.1f} / "
+          f"{percentile(latencies, 95):.1f} / {percentile(latencies, 99):.1f} ms")
+    print("=" * 60)
+
+    return double_booked == 0 and outcomes["booked"] == num_slots
+
+async def main():
+    parser = argparse.ArgumentParser(description="Slot booking contention benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=10)
+    parser.add_argument("--mongodb-url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default=f"{settings.DATABASE_NAME}_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.mongodb_url)
+    await client.drop_database(args.database)
+    try:
+        ok = await run(client[args.database], args.requests, args.slots)
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+    print("PASS: no double-booking" if ok else "FAIL: booking invariant violated")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    exit(asyncio.run(main()))
@@ -0,0 +1,197 @@
+# benchmarks/llm_stub.py - Local OpenAI-compatible LLM stub
+#
+# Replays canned responses for the prompts AIService sends, with a
+# configurable latency distribution (log-normal around a median, plus an
+# optional slow tail) and failure rates. Point the API at it with
+#
+#   AI_BACKEND=openai AI_BASE_URL=http://localhost:8100/v1
+#
+# and run it from server/:
+#
+#   python -m benchmarks.llm_stub --port 8100 --latency-ms 800 --error-rate 0.02
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# (prompt substring, response) pairs; the first match wins
+CANNED_RESPONSES: List[Tuple[str, str]] = [
+    ("predict potential disease risks", json.dumps({
+        "risks": {
+            "cardiovascular": {"risk_level": "medium", "confidence": 0.72, "probability": 38},
+            "diabetes": {"risk_level": "low", "confidence": 0.8, "probability": 18},
+            "respiratory": {"risk_level": "low", "confidence": 0.77, "probability": 12}
+        },
+        "confidence": 0.76,
+        "recommendations": [
+            "Check blood pressure every three months",
+            "Walk 30 minutes a day",
+            "Repeat the lipid panel within a year"
+        ]
+    })),
+    ("structured analysis", json.dumps({
+        "summary": "Stable patient with controlled hypertension and no recent acute events.",
+        "key_conditions": ["Hypertension"],
+        "medications": ["Lisinopril 10mg"],
+        "recommendations": ["Continue current medication", "Annual check-up"],
+        "risk_factors": ["Elevated blood pressure"]
+    })),
+    ("actionable health recommendations", json.dumps([
+        "Eat more vegetables and whole grains",
+        "Exercise at least 150 minutes per week",
+        "Take medications as prescribed",
+        "Sleep 7-8 hours a night",
+        "Schedule a yearly preventive check-up"
+    ])),
+    ("Summarize this medical record",
+     "Routine visit; blood pressure 138/86 on lisinopril, no changes to treatment."),
+    ("running summary",
+     "Hypertension managed with lisinopril since 2021; routine visits without complications."),
+]
+DEFAULT_RESPONSE = "OK"
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 800, latency_sigma: float = 0.3,
+                 tail_rate: float = 0.0, tail_ms: float = 10000,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 chunk_chars: int = 16, responses: Optional[Dict[str, str]] = None,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunk_chars = chunk_chars
+        self.responses = list((responses or {}).items()) + CANNED_RESPONSES
+        self.random = random.Random(seed)
+
+    def latency(self) -> float:
+        """Seconds for one response: log-normal around the median, or the slow tail"""
+        if self.random.random() < self.tail_rate:
+            return self.tail_ms / 1000
+        return self.latency_ms / 1000 * self.random.lognormvariate(0, self.latency_sigma)
+
+    def failure(self) -> Optional[int]:
+        """Status code of an injected failure, if this request should fail"""
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def response_for(self, prompt: str) -> str:
+        for needle, response in self.responses:
+            if needle.lower() in prompt.lower():
+                return response
+        return DEFAULT_RESPONSE
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+    stats = Counter()
+
+    def completion(model: str, text: str) -> Dict:
+        return {
+            "id": f"stub-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }]
+        }
+
+    def chunk(model: str, text: Optional[str]) -> str:
+        delta = {"content": text} if text is not None else {}
+        body = {
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None if text else "stop"}]
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        model = body.get("model", "stub")
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        latency = config.latency()
+
+        status_code = config.failure()
+        if status_code:
+            stats[f"status_{status_code}"] += 1
+            await asyncio.sleep(latency / 4)
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": {"message": "Injected failure", "code": status_code}}
+            )
+
+        text = config.response_for(prompt)
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            stats["status_200"] += 1
+            return completion(model, text)
+
+        pieces = [text[i:i + config.chunk_chars] for i in range(0, len(text), config.chunk_chars)]
+
+        async def events():
+            # A third of the latency before the first token, the rest spread over the chunks
+            await asyncio.sleep(latency / 3)
+            for piece in pieces:
+                yield chunk(model, piece)
+                await asyncio.sleep(latency * 2 / 3 / len(pieces))
+            yield chunk(model, None)
+            yield "data: [DONE]\n\n"
+            stats["status_200"] += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats)
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=800, help="median response time")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="log-normal spread (0 = fixed)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of very slow responses")
+    parser.add_argument("--tail-ms", type=float, default=10000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--responses", help="JSON file of {prompt substring: response} tried first")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+    config = StubConfig(
+        latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+        tail_rate=args.tail_rate, tail_ms=args.tail_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        responses=responses, seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()